@@ -0,0 +1,207 @@
+"""
+Running aggregates over the buoy history.
+
+The panels carry 24 hour maxima (the biggest gust, the biggest wave, when and from where) and we used to OCR them,
+times and all, on every capture. We have the history ourselves so we can work them out instead. A RollingMax keeps
+the maximum (and whatever else we want from the moment of the maximum) over a sliding time window. It's updated
+one record at a time with a monotonic deque: each record goes in once and comes out once, however long the window.
+The deques are saved next to the capture state so a cron run picks up where the last one left off instead of
+going back through the whole history.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from dataBuffer import INDEX, NY_TZ
+
+BASE_DIR = Path(__file__).resolve().parent
+ROLLING_FILE = BASE_DIR.parent / "resources" / "tmp" / "rollingMax.json"
+
+WINDOW = pd.Timedelta(hours=24)
+COVERAGE = 0.8  # fraction of the captures in the window we need to have before we trust our own maximum
+
+
+class RollingMax:
+    """
+    Maximum (and argmax) of a series over a sliding time window.
+    The deque holds the records that could still become the maximum: their values decrease from front to back, so
+    the front is the maximum. A new record knocks every smaller (or equal) value off the back, old records fall
+    off the front as the window moves on.
+    :param window: length of the window (pd.Timedelta)
+    """
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.peaks = deque()  # (time, value, payload), values decreasing
+        self.times = deque()  # the time of every record in the window (to know how well the window is covered)
+        self.first = None     # time of the first record we ever saw
+
+    def push(self, time, value, payload=None):
+        """
+        Add a record. Records have to come in time order, anything not newer than the last one is ignored.
+        :param time: tz aware time of the record
+        :param value: the value to maximise (NaN is counted for coverage but can't be the maximum)
+        :param payload: anything to hand back with the maximum (the direction, period, ... at that moment)
+        :return: True if the record was taken
+        """
+        if self.times and time <= self.times[-1]:
+            return False
+        if self.first is None:
+            self.first = time
+        self.times.append(time)
+        if value == value:  # not NaN
+            while self.peaks and self.peaks[-1][1] <= value:
+                self.peaks.pop()
+            self.peaks.append((time, value, payload))
+        self.evict(time)
+        return True
+
+    def evict(self, now):
+        """Drop the records that have slid out of the window ending at now."""
+        cutoff = now - self.window
+        while self.peaks and self.peaks[0][0] <= cutoff:
+            self.peaks.popleft()
+        while self.times and self.times[0] <= cutoff:
+            self.times.popleft()
+
+    def peak(self):
+        """:return: (time, value, payload) of the maximum in the window, or None"""
+        return self.peaks[0] if self.peaks else None
+
+    def covers(self, now, period):
+        """
+        Do we have the whole window? We need history going back a full window and no big holes in it.
+        :param now: the end of the window
+        :param period: how often a record is expected (pd.Timedelta)
+        """
+        if self.first is None or self.first > now - self.window + period:
+            return False
+        return len(self.times) >= COVERAGE * (self.window / period)
+
+    def last(self):
+        """:return: time of the newest record taken, or None"""
+        return self.times[-1] if self.times else None
+
+    def toState(self):
+        """:return: the deques as something json can hold (times as epoch nanoseconds)"""
+        return {'window': self.window.value,
+                'first': _encodeValue(self.first),
+                'times': [_encodeValue(time) for time in self.times],
+                'peaks': [[_encodeValue(time), value, {column: _encodeValue(item) for column, item in payload.items()}]
+                          for time, value, payload in self.peaks]}
+
+    @classmethod
+    def fromState(cls, state):
+        """Rebuild an aggregate from toState()."""
+        rolling = cls(pd.Timedelta(state['window']))
+        rolling.first = _decodeValue(state['first'])
+        rolling.times = deque(_decodeValue(time) for time in state['times'])
+        rolling.peaks = deque((_decodeValue(time), value, {column: _decodeValue(item) for column, item in payload.items()})
+                              for time, value, payload in state['peaks'])
+        return rolling
+
+    @classmethod
+    def fromHistory(cls, df, rankedBy, payloadColumns, window=WINDOW):
+        """
+        Build the aggregate from stored records.
+        :param df: records indexed by time (DataBuffer.get_data())
+        :param rankedBy: the column to maximise
+        :param payloadColumns: columns to hand back with the maximum (INDEX for the time of it)
+        """
+        rolling = cls(window)
+        for record in df.sort_index().reset_index().to_dict('records'):
+            rolling.push(record[INDEX], record.get(rankedBy, float('nan')),
+                         {column: record.get(column) for column in payloadColumns})
+        return rolling
+
+
+def _encodeValue(value):
+    # the times (and the time of the maximum in a payload) go in as nanoseconds, the readings as plain floats
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return {'ns': pd.Timestamp(value).value}
+    return float(value)
+
+def _decodeValue(value):
+    if isinstance(value, dict) and 'ns' in value:
+        return pd.Timestamp(value['ns'], tz=NY_TZ)
+    return value
+
+
+# One aggregate per data store, buoy and ranked field, kept for the life of the process (so a --daemon only ever
+# reads the history once) and saved in ROLLING_FILE between runs.
+_rolling = {}
+_rollingLock = threading.Lock()
+_saved = None  # what was in ROLLING_FILE when we started
+
+def _stateKey(key):
+    # json only has string keys
+    return json.dumps([str(part) for part in key])
+
+def _loadSaved(rollingFile):
+    global _saved
+    if _saved is None:
+        _saved = {}
+        try:
+            with open(rollingFile) as f:
+                _saved = json.load(f)
+        except FileNotFoundError:
+            logging.info(f"No rolling maxima at {rollingFile}, they'll be built from the history")
+        except json.JSONDecodeError:
+            logging.warning(f"Rolling maxima {rollingFile} are corrupt, they'll be built from the history")
+    return _saved
+
+def getRollingMax(key, loader, rankedBy, payloadColumns, newest=None, rollingFile=ROLLING_FILE):
+    """
+    Fetch a rolling maximum: the one we already have, the one saved by the last run or (if there's neither) one
+    built from the history.
+    :param key: what identifies the aggregate, e.g. (store path, source, ranked field)
+    :param loader: function returning the history dataframe for this store and source
+    :param rankedBy: the column to maximise
+    :param payloadColumns: columns to hand back with the maximum
+    :param newest: function returning the time of the newest stored record (None if there are none). A saved
+                   aggregate that hasn't seen it missed some records and is built again from the history.
+    :param rollingFile: where the aggregates are saved
+    """
+    with _rollingLock:
+        if key not in _rolling:
+            state = _loadSaved(rollingFile).get(_stateKey(key))
+            if state is not None:
+                rolling = RollingMax.fromState(state)
+                stored = newest() if newest is not None else None
+                if stored is None or (rolling.last() is not None and rolling.last() >= stored):
+                    _rolling[key] = rolling
+                    logging.debug(f"Rolling max {key} picked up from {rollingFile}")
+                else:
+                    logging.info(f"Saved rolling max {key} stops at {rolling.last()}, the history goes to {stored}")
+        if key not in _rolling:
+            history = loader()
+            _rolling[key] = RollingMax.fromHistory(history, rankedBy, payloadColumns)
+            logging.info(f"Rolling max {key} built from {len(history)} records")
+        return _rolling[key]
+
+def saveRollingMax(rollingFile=ROLLING_FILE):
+    """
+    Persist the aggregates. Whatever another process (the wave capture while we did the wind) saved in the meantime
+    is kept, and the file is written to a temporary file first so a reader never sees half of it.
+    """
+    rollingFile = Path(rollingFile)
+    with _rollingLock:
+        if not _rolling:
+            return
+        try:
+            with open(rollingFile) as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        state.update({_stateKey(key): rolling.toState() for key, rolling in _rolling.items()})
+        tmpFile = rollingFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmpFile, rollingFile)
@@ -10,9 +10,20 @@ from zoneinfo import ZoneInfo
 # This is a workaround until we can upgrade the OS.  03/04/26 now supports ZoneInfo so we can remove the pytz dependency.
 import requests
 
-# OCR tools
-import pytesseract
-# Bridge to cli tool. Need to install tesseract-ocr CLI engine in the OS
+# OCR tools (pytesseract and the persistent tesseract API live in here)
+from ocrEngines import getOCREngine, closeOCREngines, engineTypes, DEFAULT_ENGINE, GlyphTemplateEngine
+from captureCache import PanelChangeDetector, contentHash, getRegionCache, getFetcher
+from concurrent.futures import ThreadPoolExecutor
+# Data storage (shared with the graph generators)
+from dataBuffer import DataBuffer, storePath
+# Running as a daemon rather than from cron
+from captureSchedule import CaptureDaemon, PublishCadence, CAPTURE_PERIODS, MAX_RSS_MB, MAX_UPTIME_HOURS
+# 24 hour maxima kept up to date from the history
+from aggregates import getRollingMax, saveRollingMax
+# The wind graph's series, from whichever buoys are working
+from windComposite import updateComposite
+# Keeping the field boxes on the fields if the panel layout moves
+from panelLayout import getLayoutRegistry
 
 # Managing images
 from PIL import Image
@@ -23,6 +34,11 @@ import pandas as pd
 
 import logging
 import os
+import json
+import random
+import re
+import threading
+import time
 
 import argparse
 
@@ -56,6 +72,15 @@ NY_TZ = ZoneInfo('America/New_York')
 NaN = float('nan')
 INDEX = 'TimeStamp' # standard index label for dataframes
 
+# How we decide a panel hasn't changed since the last capture (and skip the OCR)
+#   'image':     hash of the whole decoded panel
+#   'timestamp': hash of just the TimeStamp region
+#   'off':       always OCR
+CHANGE_DETECTION = 'image'
+
+# Check each panel's layout against a fingerprint of it and shift the bounds below if it has moved (see panelLayout.py)
+LAYOUT_REGISTRATION = True
+
 # image URIs for Wind information
 EXRX_WIND_URL = "https://clydebank.dms.uconn.edu/exrx_wx.png"  # Execution rocks
 WLIS_WIND_URL = "https://clydebank.dms.uconn.edu/wlis_wx.png"  # Western Long Island
@@ -126,8 +151,85 @@ waveSources = {
     'WaveTimeM24':        {'bounds':(169, 433, 360, 455), 'value': NaN, 'range':       None, 'decpts': None}, #dateString of 24Hr Max
     'Source':             {'bounds':(212,  25, 300,  52), 'value': NaN, 'range':       None, 'decpts': None}, #placeholder for source tag
 }
+
+# Fields that are just another unit of a field we already OCR. They aren't OCR'd, they're computed from the
+# canonical field:  derived = canonical * scale + offset  (rounded to the derived field's decpts).
+#   derived field:         (canonical field,      scale,      offset)
+derivedFields = {
+    'WindSpeedAvg [mph]': ('WindSpeedAvg [kts]', 1.150779,      0.0),
+    'WindSpeedGst [mph]': ('WindSpeedGst [kts]', 1.150779,      0.0),
+    'WindSpeedAvg [m/s]': ('WindSpeedAvg [kts]', 0.514444,      0.0),
+    'WindSpeedGst [m/s]': ('WindSpeedGst [kts]', 0.514444,      0.0),
+    'AirTemp [°C]':       ('AirTemp [°F]',       5.0 / 9.0, -160.0 / 9.0),
+    'DewPoint [°C]':      ('DewPoint [°F]',      5.0 / 9.0, -160.0 / 9.0),
+    'BaromPres [mB]':     ('BaromPres [mmHg]',   33.8639,       0.0),  # the panel says mmHg but it's inches of Hg
+    'WaveHgtSig [m]':     ('WaveHgtSig [ft]',    0.3048,        0.0),
+    'WaveHgtMax [m]':     ('WaveHgtMax [ft]',    0.3048,        0.0),
+}
+
+# When do we OCR the derived fields anyway?
+#   'off':    never, they're always computed
+#   'range':  when the canonical value fails its range check (the derived field is used to recover it)
+#   'sample': as 'range', and on a VERIFY_SAMPLE fraction of the captures (disagreements are logged)
+DERIVE_VERIFY = 'sample'
+VERIFY_SAMPLE = 0.05
+
+# The 24 hour maxima are worked out from our own history (see aggregates.py) instead of read off the panel. They
+# are only read while we don't have 24 hours of history for the buoy.
+#   M24 field:           (field whose maximum it is, field it's taken from at that maximum)
+rollingMaxFields = {
+    'WindSpeedM24 [kt]': ('WindSpeedGst [kts]', 'WindSpeedGst [kts]'),
+    'WindDirM24 [°]':    ('WindSpeedGst [kts]', 'WindDir [°]'),
+    'WindTimeM24':       ('WindSpeedGst [kts]', INDEX),
+    'WaveHgt24 [ft]':    ('WaveHgtMax [ft]',    'WaveHgtMax [ft]'),
+    'WaveDirM24 [°]':    ('WaveHgtMax [ft]',    'WaveDir [°]'),
+    'WavePerAvgM24 [s]': ('WaveHgtMax [ft]',    'WavPerAvg [s]'),
+    'WavePerDomM24 [s]': ('WaveHgtMax [ft]',    'WavPerDom [s]'),
+    'WaveTimeM24':       ('WaveHgtMax [ft]',    INDEX),
+}
+
+UPSCALE = 2  # tesseract needs clear, large characters
+
+# Two tier OCR
+#   tier 1: every field once, on the plain grayscale crop (no upscaling), the cheap pass
+#   tier 2: only the fields tier 1 didn't convince (failed their range/decpts check or the engine wasn't sure
+#           enough) get the preprocessed crop, with each of RETRY_PSMS in turn until one reads properly
+# On the fixture panels with tesserocr (`ocrBenchmark.py ocr`) it reads 100% of the fields against 99% for the single
+# pass on the preprocessed crop, at 83ms a panel (p50) against 113ms. tests/test_ocrTiers.py checks that an unsure
+# tier 1 read is taken over by tier 2. A misread in tier 1 that happens to pass its checks is never retried, so
+# keep an eye on the accuracy when recorded panels are added to the corpus. False for the single pass.
+OCR_TIERS = True
+MIN_CONFIDENCE = 60          # 0..100, below this a reading goes to tier 2
+RETRY_PSMS = (7, 6, 8, 13)   # tesseract page segmentation: single line, block, single word, raw line
 ######  ^^^^^^^^^^^^^  ###### USER CONFIGURABLE ######  ^^^^^^^^^^^^^  ######
 
+# Older Pillow (the Pi's for a while) only has Image.LANCZOS, newer ones moved it to Image.Resampling.
+LANCZOS = Image.Resampling.LANCZOS if hasattr(Image, 'Resampling') else Image.LANCZOS
+
+def withPsm(config, psm):
+    """The same tesseract config with another page segmentation mode."""
+    return re.sub(r'--psm \d+', f'--psm {psm}', config)
+
+# How each OCR tier is doing (fields tried, fields accepted, seconds spent), reported after every capture.
+tierStats = {'tier1': [0, 0, 0.0], 'tier2': [0, 0, 0.0]}
+_tierLock = threading.Lock()
+
+def _countTier(tier, tried, accepted, seconds):
+    with _tierLock:
+        stats = tierStats[tier]
+        stats[0] += tried
+        stats[1] += accepted
+        stats[2] += seconds
+
+def reportTierStats():
+    """Log (and reset) the per tier OCR numbers."""
+    with _tierLock:
+        for tier, (tried, accepted, seconds) in tierStats.items():
+            if tried:
+                logging.info(f"OCR {tier}: {accepted}/{tried} fields accepted in {seconds * 1000:.0f}ms "
+                             f"({seconds * 1000 / tried:.1f}ms per field)")
+            tierStats[tier] = [0, 0, 0.0]
+
 class BuoyDataCapture:
     """
     Class to capture data from NERACOOS weather buoys. NERACOOS (long acronym: https://neracoos.org/), capture data from
@@ -155,13 +257,15 @@ class BuoyDataCapture:
         'letterlike': r'--psm 6 -c tessedit_char_whitelist=-0123456789\ ABCDEFGHIJKLMNOPQRSTUVWXYZ', # for decoding the source tag,
     }
 
-    def __init__(self, sourceImageURL, dataExtraction, filename:None):
+    def __init__(self, sourceImageURL, dataExtraction, filename:None, ocrEngine=None):
         """
         Initialize the class
         :param sourceImageURL: Where we get the original image. The last part of the path will be a valid .png file name.
         :param dataExtraction: The structure (see above) that delineates the bounds we are trying to capture along with a place to store the result.
+        :param ocrEngine: Name of the OCR back end (see ocrEngines.engineTypes). The engine is built once and shared.
         """
-        dataExtraction = dataExtraction.copy()  # avoid mutating the input dictionary
+        # avoid mutating the input dictionary (each region too, several panels can be decoded at once)
+        dataExtraction = {key: dict(item) for key, item in dataExtraction.items()}
         self.sourceURL = sourceImageURL
         self.dataParts = dataExtraction
         if filename == None:
@@ -169,29 +273,77 @@ class BuoyDataCapture:
         else:
             self.filename = filename
 
+        self.ocrEngineName = ocrEngine if ocrEngine is not None else DEFAULT_ENGINE
+        # Regions whose pixels we have already decoded don't need to go to the engine again.
+        self.regionCache = getRegionCache()
+
         self.img = None  # placeholder for the image object in memory
+        self.modified = True  # False when the server told us the panel is the same as last time
+        self.guessedTimes = set()  # date fields that didn't read and were given the current time instead
         # self.df = pd.DataFrame(columns=dataExtraction.keys())
 
+    @property
+    def ocrEngine(self):
+        # One engine (and for tesserocr one loaded model) for every region and every capture in this process.
+        # Looked up when used since each OCR worker thread has its own.
+        return getOCREngine(self.ocrEngineName)
+
+    @staticmethod
+    def ocrKind(key):
+        """
+        Which of the `ocrLimits` applies to a region.
+        :param key: the region's key in the data extraction dictionary.
+        :return: 'datelike', 'letterlike' or 'numberlike'
+        """
+        if key.find("Time")>-1:
+            return 'datelike'
+        if key == "Source":
+            return 'letterlike'
+        return 'numberlike'
+
+    def load_image(self, path):
+        """
+        Use a panel already on disk (a recorded fixture for instance) instead of fetching one.
+        :param path: path to a .png panel
+        """
+        with Image.open(path) as img:
+            self.img = img.resize((640,480))
+
     def fetch_image(self):
         """
         retrieve the png and store to a file
         """
-        # 1. Retrieve the image  n.b. add a "?###" random number to sidestep local caching (which probably doesn't happen on a direct fetch)
-        response = requests.get(self.sourceURL + f"?{np.random.randint(1000)}")
+        # 1. Retrieve the image over the shared keep-alive session. We used to add a "?###" random number to sidestep
+        #    caching. Now we send a conditional GET instead and keep the last copy in self.filename for when the server
+        #    answers '304 Not Modified'. Raises requests.RequestException if the server doesn't cooperate.
+        content, self.modified = getFetcher().fetch(self.sourceURL, self.filename)
 
-        # 2. NOT Change the stored filename
-        # if filename != None:
-        #     self.filename = filename
+        # 2. Work from memory, the image is not large.
+        self.img = Image.open(BytesIO(content)).resize((640,480))  # resize to standard size for testing
 
-        # Check if the request was successful (HTTP 200)
-        if response.status_code == 200:
-            # 3. Store in memory maybe speeds up? the image is not large, maybe keep in memory?
-            self.img = Image.open(BytesIO(response.content)).resize((640,480))  # resize to standard size for testing
-            # with open(self.filename, "wb") as f:
-            #     f.write(response.content)
-            # # return filename  # Return path to the stored file
-        else:
-            raise requests.RequestException(f"Failed to retrieve image. Status code: {response.status_code}")
+    def register_layout(self):
+        """
+        Make sure the bounds are where the fields are on this panel. If the layout has moved they're shifted to match.
+        :return: the (dx, dy) applied
+        """
+        dx, dy = getLayoutRegistry().register(self.sourceURL, self.img,
+                                              [item['bounds'] for item in self.dataParts.values()])
+        if dx or dy:
+            for item in self.dataParts.values():
+                left, upper, right, lower = item['bounds']
+                item['bounds'] = (left + dx, upper + dy, right + dx, lower + dy)
+        return dx, dy
+
+    def fingerprint(self, mode=CHANGE_DETECTION):
+        """
+        Content hash of the fetched panel used to tell if anything changed since the last capture.
+        :param mode: 'image' hashes every pixel, 'timestamp' only the TimeStamp region.
+        :return: hex digest
+        """
+        img = self.img
+        if mode == 'timestamp':
+            img = img.crop(self.dataParts[INDEX]['bounds'])
+        return contentHash(img.mode, str(img.size), img.tobytes())
 
     def _preprocess_for_ocr(self, croppedImage):
         """
@@ -205,19 +357,23 @@ class BuoyDataCapture:
         # 2. Resize: Tesseract needs clear, large characters.
         # Upscaling by 2x or 3x often fixes issues with small regions.
         w, h = gray_crop.size
-
-        if os.uname().nodename == "raspberrypi":
-            # For RaspPi
-            upscaledImage = gray_crop.resize((w * 2, h * 2), Image.LANCZOS)
-        else:
-            # For high end
-            upscaledImage = gray_crop.resize((w * 2, h * 2), Image.Resampling.LANCZOS)
+        upscaledImage = gray_crop.resize((w * UPSCALE, h * UPSCALE), LANCZOS)
 
         # 3. Optional: Invert if text is light on a dark background
         # Tesseract expects dark text on a light background.
         # upscaled = ImageOps.invert(upscaled)
         return upscaledImage
 
+    def preprocess_regions(self, keys):
+        """
+        Ready the regions for OCR (see _preprocess_for_ocr).
+        :param keys: the regions wanted
+        :return: {key: image ready for the OCR engine}
+        """
+        # (a panel is RGB already, no need to copy the whole of it every time)
+        img = self.img if self.img.mode == 'RGB' else self.img.convert("RGB")
+        return {key: self._preprocess_for_ocr(img.crop(self.dataParts[key]['bounds'])) for key in keys}
+
     def _ocr_numbers_only(self, image_crop, valueLimits=None):
         """
         Processes a cropped image to extract only numbers and decimal points.
@@ -231,7 +387,15 @@ class BuoyDataCapture:
         # Perform OCR
         value_text = self._ocr_values(image_crop, self.ocrLimits['numberlike'])
         logging.debug(f"--NUMERALS ONLY-- >{value_text}<")
+        return self._parse_number(value_text, valueLimits)
 
+    def _parse_number(self, value_text, valueLimits):
+        """
+        Turn the text of a numeric field into its value.
+        :param value_text: what the OCR found
+        :param valueLimits: the field's entry in the data extraction dictionary (decpts)
+        :return: the value, NaN if it doesn't read as a number
+        """
         # Clean up whitespace/newlines
         value = np.nan
         try:
@@ -258,10 +422,11 @@ class BuoyDataCapture:
 
         return value
 
-    def _ocr_dates_only(self, image_crop):
+    def _ocr_dates_only(self, image_crop, key=None):
         """
         Processes image crops to extract only numbers and decimal points.
         :param image_crops: List of PIL Image objects (from previous step).
+        :param key: the field being read, remembered in guessedTimes if it doesn't read
         :return: List of extracted numeric strings.
         """
         logging.debug("--DATES ONLY--")
@@ -269,7 +434,21 @@ class BuoyDataCapture:
         # --psm 6: Assume a single uniform block of text (good for small crops)
         # tessedit_char_whitelist: Restrict characters to digits and dot
         # Perform OCR
-        value_text = self._ocr_values(image_crop, self.ocrLimits['datelike']) + f", {datetime.now().year}"
+        value_text = self._ocr_values(image_crop, self.ocrLimits['datelike'])
+        value = self._parse_date(value_text)
+        if value is None:
+            logging.critical(f"Can't decode date string use current time'{repr(value_text)}'")
+            value = datetime.now(tz=NY_TZ) + timedelta(minutes=4)
+            self.guessedTimes.add(key)
+        return value
+
+    def _parse_date(self, value_text):
+        """
+        Turn the text of a date field into a time.
+        :param value_text: what the OCR found
+        :return: tz aware datetime, None if it doesn't read as a date
+        """
+        value_text = value_text + f", {datetime.now().year}"
         logging.debug(f"--DATES ONLY-- >{value_text}<")
         # Clean up whitespace/newlines
         logging.debug(f"\t\tTime string [raw]: {repr(value_text)}")
@@ -289,8 +468,8 @@ class BuoyDataCapture:
                 try:
                     value = datetime.strptime(value_text, "%I:%M:%S %p, %b %d, %Y")
                 except ValueError:
-                    logging.critical(f"Can't decode date string use current time'{repr(value_text)}'")
-                    value = datetime.now(tz=NY_TZ)
+                    logging.debug(f"Can't decode date string '{repr(value_text)}'")
+                    return None
 
         value = value.replace(tzinfo=NY_TZ)
         logging.debug(f"\t\tTime string [decoded]: {repr(value)}")
@@ -305,33 +484,125 @@ class BuoyDataCapture:
         :param ocrCharacterLimit: A set of characters to use when trying to decode the image
         :return: The value for the image.
         """
-        # Perform OCR
-        text = pytesseract.image_to_string(image_crop, config=ocrCharacterLimit)
-        # Clean up whitespace/newlines
-        return text.strip()
+        return self._ocr_with_confidence(image_crop, ocrCharacterLimit)[0]
 
-    def extract_regions(self):
+    def _ocr_with_confidence(self, image_crop, ocrCharacterLimit):
+        """
+        OCR a crop (or remember what it said last time).
+        :return: (text stripped of whitespace/newlines, engine's confidence 0..100 or None)
+        """
+        # Seen these exact pixels before?
+        key = self.regionCache.key(image_crop, ocrCharacterLimit, self.ocrEngine.name)
+        cached = self.regionCache.get(key)
+        if cached is None:
+            # Perform OCR
+            cached = self.ocrEngine.recognize(image_crop, ocrCharacterLimit)
+            self.regionCache.put(key, list(cached))
+        elif isinstance(cached, str):
+            cached = (cached, None)  # cached before we kept confidences
+        text, confidence = cached
+        return text.strip(), confidence
+
+    def raw_regions(self, keys):
+        """
+        The regions as plain grayscale crops, for the cheap first OCR pass.
+        :return: {key: image}
+        """
+        gray = self.img.convert('L')
+        return {key: gray.crop(self.dataParts[key]['bounds']) for key in keys}
+
+    def _read_field(self, key, image, config):
+        """
+        OCR one field and check the result.
+        :return: (value, True if it passed its checks). The value is NaN (or None for a date) if unreadable.
+        """
+        item = self.dataParts[key]
+        text, confidence = self._ocr_with_confidence(image, config)
+        sure = confidence is None or confidence >= MIN_CONFIDENCE
+        kind = self.ocrKind(key)
+        if kind == 'datelike':
+            value = self._parse_date(text) if text else None
+            return value, sure and value is not None
+        if kind == 'letterlike':
+            return text, sure and text.isalnum()
+        value = self._parse_number(text, item)
+        decimalsRight = item.get('decpts') is None or (item['decpts'] > 0) == ('.' in text)
+        return value, sure and decimalsRight and self._in_range(value, item)
+
+    def read_tiered(self, keys):
+        """
+        Read fields with the two tier OCR (see OCR_TIERS).
+        :param keys: the fields to read
+        :return: {key: value}
+        """
+        start = time.perf_counter()
+        raw = self.raw_regions(keys)
+        values, retry = {}, []
+        for key in keys:
+            values[key], ok = self._read_field(key, raw[key], self.ocrLimits[self.ocrKind(key)])
+            if not ok:
+                retry.append(key)
+        _countTier('tier1', len(keys), len(keys) - len(retry), time.perf_counter() - start)
+
+        if retry:
+            start = time.perf_counter()
+            accepted = 0
+            ready = self.preprocess_regions(retry)
+            for key in retry:
+                for psm in RETRY_PSMS:
+                    value, ok = self._read_field(key, ready[key], withPsm(self.ocrLimits[self.ocrKind(key)], psm))
+                    if ok:
+                        values[key] = value
+                        accepted += 1
+                        break
+                else:
+                    logging.debug(f"{key} didn't read properly in either tier, keeping {values[key]}")
+            _countTier('tier2', len(retry), accepted, time.perf_counter() - start)
+
+        for key in keys:
+            if self.ocrKind(key) == 'datelike' and values[key] is None:
+                logging.critical(f"Can't decode date string for {key} use current time")
+                values[key] = datetime.now(tz=NY_TZ) + timedelta(minutes=4)  # as _ocr_dates_only
+                self.guessedTimes.add(key)
+        return values
+
+    def extract_regions(self, skip=(), only=None):
         """
         Extracts multiple rectangular regions from a PNG.  Again, we store the result
         on disk but maybe we can get away with keeping in memory?
         :param image_path: Path to the retrieved PNG file.
         :param regions: List of 4-tuples (left, upper, right, lower) coordinates.
+        :param skip: regions not to read (we'll get their values some other way)
+        :param only: read just these regions (a second pass for ones we skipped), None for all of them
         :return: List of cropped Image objects.
         """
         # extracted_images = []
 
         # with Image.open(self.filename) as img:
         if self.img is not None:
-            img = self.img
-            # Standardize for OCR: convert to RGB and remove transparency
-            img = img.convert("RGB") # needs to be over the whole image to avoid issues with cropping and OCR. We can do the cropping on the RGB image.
-
-            for key, item in self.dataParts.items():
+            # (preprocess_regions standardizes the panel for OCR, once for all the regions)
+
+            # Unit conversions of another field are computed, not read (unless this is a capture we verify).
+            verify = DERIVE_VERIFY == 'sample' and random.random() < VERIFY_SAMPLE
+            derived = self.derivable() if only is None else []
+
+            wanted = [key for key in self.dataParts
+                      if not ((key in derived and not verify) or key in skip or (only is not None and key not in only))]
+            # cheap pass first, the expensive one only for the fields that need it (or the single pass of old)
+            tiered = self.read_tiered(wanted) if OCR_TIERS else {}
+            ready = self.preprocess_regions([key for key in wanted if key not in tiered])
+
+            for key in wanted:
+                item = self.dataParts[key]
+                if key in tiered:
+                    item['value'] = tiered[key]
+                    continue
                 logging.debug(f"WRK: {key}: {item['bounds']} {key.find('Time')}")
-                croppedImage = self._preprocess_for_ocr(img.crop(item['bounds']))
-                if key.find("Time")>-1:
-                    data = self._ocr_dates_only(croppedImage)
-                elif key == "Source":
+                croppedImage = ready[key]
+                kind = self.ocrKind(key)
+                if kind == 'datelike':
+                    data = self._ocr_dates_only(croppedImage, key)
+                elif kind == 'letterlike':
                     data = self._ocr_values(croppedImage, self.ocrLimits['letterlike'])
                     logging.debug(f"--RAW TEXT ONLY-- >{data}<")
                 else:
@@ -361,8 +632,102 @@ class BuoyDataCapture:
                     # except:
                     #     data = np.nan
                 item['value'] = data
+
+            if only is None:
+                self.derive_fields(derived, verify)
         # self.df = pd.DataFrame([self.getDict()], index=self.getTime())
 
+    def derivable(self):
+        """:return: the fields of this panel we can compute from another field (see derivedFields)"""
+        return [key for key in self.dataParts
+                if key in derivedFields and derivedFields[key][0] in self.dataParts]
+
+    @staticmethod
+    def _in_range(value, item):
+        if value != value:  # NaN
+            return False
+        return item.get('range') is None or item['range'][0] <= value <= item['range'][1]
+
+    def derive_fields(self, derived, verified=False):
+        """
+        Compute the unit conversion fields from their canonical fields, all at once.
+        :param derived: the fields to compute (from derivable())
+        :param verified: True if the derived fields were OCR'd too, we compare rather than overwrite blindly
+        """
+        if not derived:
+            return
+        # A canonical value that is missing or out of range: read its other units after all and work back from one.
+        read = set(derived) if verified else set()
+        if verified or DERIVE_VERIFY in ('range', 'sample'):
+            for key in derived:
+                canonicalKey, keyScale, keyOffset = derivedFields[key]
+                canonicalItem = self.dataParts[canonicalKey]
+                if self._in_range(canonicalItem['value'], canonicalItem):
+                    continue
+                item = self.dataParts[key]
+                if key not in read:
+                    if OCR_TIERS:
+                        item['value'] = self.read_tiered([key])[key]
+                    else:
+                        item['value'] = self._ocr_numbers_only(self.preprocess_regions([key])[key], item)
+                    read.add(key)
+                logging.info(f"{canonicalKey} {canonicalItem['value']} failed its range check, read {key}: {item['value']}")
+                recovered = (item['value'] - keyOffset) / keyScale
+                if self._in_range(recovered, canonicalItem):
+                    canonicalItem['value'] = round(recovered, canonicalItem['decpts'] or 0)
+
+        canonical = np.array([self.dataParts[derivedFields[key][0]]['value'] for key in derived], dtype=np.float64)
+        scale = np.array([derivedFields[key][1] for key in derived])
+        offset = np.array([derivedFields[key][2] for key in derived])
+        places = 10.0 ** np.array([self.dataParts[key]['decpts'] or 0 for key in derived])
+        values = np.round((canonical * scale + offset) * places) / places
+
+        for key, value, step in zip(derived, values, 1.0 / places):
+            item = self.dataParts[key]
+            value = float(value)
+            if key not in read:
+                item['value'] = value
+                continue
+            canonicalKey, keyScale, _ = derivedFields[key]
+            canonicalItem = self.dataParts[canonicalKey]
+            if not self._in_range(canonicalItem['value'], canonicalItem):
+                continue  # the canonical is no good, the one we read is all we have
+            if verified and self._in_range(item['value'], item):
+                # The panel rounds from the raw reading, so allow a last digit's worth each way
+                tolerance = step + keyScale * 10.0 ** -(canonicalItem['decpts'] or 0)
+                if abs(item['value'] - value) > tolerance:
+                    logging.warning(f"{key} read {item['value']} but {canonicalKey} {canonicalItem['value']} makes it {value}")
+            item['value'] = value
+
+    def rolling_fields(self):
+        """:return: {field maximised: [M24 fields taken at its maximum]} for the ones this panel has"""
+        groups = {}
+        for key, (rankedBy, takenFrom) in rollingMaxFields.items():
+            if key in self.dataParts and rankedBy in self.dataParts and takenFrom in self.dataParts:
+                groups.setdefault(rankedBy, []).append(key)
+        return groups
+
+    def fill_from_history(self, rollingMax, rankedBy, keys, period):
+        """
+        Add this reading to the rolling maximum and fill in the M24 fields from it.
+        :param rollingMax: the aggregates.RollingMax for this buoy and field
+        :param rankedBy: the field maximised
+        :param keys: the M24 fields taken at the maximum
+        :param period: how often the panel is captured (pd.Timedelta)
+        :return: the fields we couldn't fill (not enough history yet), they have to be read off the panel
+        """
+        now = self.getTime()
+        # (a made up TimeStamp is ahead of the real ones that follow, it would keep them out of the window)
+        if not self.timeGuessed:
+            rollingMax.push(now, self.get(rankedBy), {rollingMaxFields[key][1]: self.get(rollingMaxFields[key][1]) for key in keys})
+        peak = rollingMax.peak()
+        if peak is None or not rollingMax.covers(now, period):
+            return keys
+        time, value, payload = peak
+        for key in keys:
+            self.dataParts[key]['value'] = time if rollingMaxFields[key][1] == INDEX else payload[rollingMaxFields[key][1]]
+        return []
+
     def getDict(self):
         # return all the OCR data without the time index
         # return {k: self[k] for k in self.dataParts if k != INDEX}
@@ -391,165 +756,218 @@ class BuoyDataCapture:
     def getTime(self):
         return self[INDEX]
 
+    @property
+    def timeGuessed(self):
+        """True if the panel's TimeStamp didn't read and is just the time of the capture (see _ocr_dates_only)"""
+        return INDEX in self.guessedTimes
+
     def __getitem__(self, key):
         return self.get(key)
 
     def get(self, key):
         return self.dataParts[key]['value']
 
-class DataBuffer:
+# The two panel types, where they come from, how to read them and where the results go.
+panelKinds = {
+    'wind': {'urls': windURLS, 'sources': windSources, 'store': storePath('wind')},
+    'wave': {'urls': waveURLS, 'sources': waveSources, 'store': storePath('wave')},
+}
+
+# The Pi has 4 cores. OCR for that many panels can run side by side (tesserocr lets go of the GIL while it works).
+OCR_WORKERS = min(4, os.cpu_count() or 1)
+
+# The OCR threads are kept from one capture to the next: the OCR engines live in them (one per thread) so a
+# long running capture (--daemon) doesn't build new engines every round.
+_ocrPool = None
+
+def _getOCRPool():
+    global _ocrPool
+    if _ocrPool is None:
+        _ocrPool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix='ocr')
+    return _ocrPool
+
+def closeCapture():
+    """Let go of the OCR threads and their engines."""
+    global _ocrPool
+    if _ocrPool is not None:
+        _ocrPool.shutdown()
+        _ocrPool = None
+    closeOCREngines()
+
+def _rollingMax(buffer, panel, rankedBy, keys):
+    # The running 24 hour maximum of a field for the buoy this panel is from (None if we can't tell which buoy).
+    # The buffer is the one the capture stores into, its history is only read if there's no saved maximum to go on
+    # and then just the once for all the buoys.
+    source = pd.to_numeric(panel['Source'], errors='coerce')
+    if source != source:
+        return None
+
+    def history():
+        df = buffer.get_data()
+        return df[df['Source'] == source]
+
+    return getRollingMax((str(buffer.filepath), source, rankedBy), history, rankedBy,
+                         [rollingMaxFields[key][1] for key in keys], newest=lambda: buffer.rollups.latest(source))
+
+def _fetchPanel(panel):
+    try:
+        panel.fetch_image()
+        return panel
+    except requests.RequestException as err:
+        logging.error(f"Couldn't fetch {panel.sourceURL}: {err}")
+        return None
+
+def capturePanels(wanted, engine=None, force=False):
     """
-    This class manages a ring buffer of data stored in a CSV file. The buffer retains data for the last 3 days (72 hours) only.
-    It uses pandas DataFrame for efficient data handling and storage. As with the OCR class above, this class is agnostic toward
-    the type of data being stored. It could be data from wind or wave panels. The user specifies the column labels and the class manages
-    the rest.
-    :param labels: List of strings for the column names. (usually just: `list[waveSources.keys()]` or `list[windSources.keys()]`)
-    :param filepath: Path to the CSV file.
+    Fetch, decode and store a set of panels. All the fetches go out at once over one keep-alive session, the OCR
+    is spread over a pool of OCR_WORKERS threads and the results are written to the data stores.
+    :param wanted: list of (kind, source tag) pairs, e.g. [('wind', 'exrx'), ('wave', 'exrx')]
+    :param engine: name of the OCR back end, None for the default.
+    :param force: OCR and store even if the panel hasn't changed.
+    :return: {(kind, source tag): epoch seconds of the panel's TimeStamp} for the panels that had new data (None if
+             the TimeStamp didn't read, the time we made up for it is no use to the schedule)
     """
-    def __init__(self, labels, filepath="sensor_data.csv"):
-        """
-        :param labels: List of strings for the column names.
-        :param filepath: Path to the CSV file.
-        """
-        self.filepath = filepath
-        self.columns = labels
-
-        if os.path.exists(self.filepath):
-            # Load existing data and ensure the index is parsed as datetime
-            self.df = pd.read_csv(self.filepath, index_col=0, parse_dates=True)
-            # self.df.index = pd.to_datetime(self.df.index, utc=True)
-            # df.index = df.index.tz_convert('America/New_York'
-            # Ensure index is timezone-aware (NY_TZ) to match new records
-            # if self.df.index.tz is None:
-            #     self.df.index = self.df.index.tz_localize(NY_TZ)
-            # Ensure existing columns match the provided labels
-            # self.df.columns = self.columns
-        else:
-            # Initialize empty DataFrame with custom labels and UTC timezone awareness
-            #    - 'data=[]' ensures it is empty
-            #    - 'tz="US/Eastern"' sets the timezone (you can use 'UTC', 'Asia/Tokyo', etc.)
-            tz_aware_index = pd.DatetimeIndex([], dtype='datetime64[ns, America/New_York]', name=INDEX)
-            self.df = pd.DataFrame(columns=self.columns, index=tz_aware_index)
-
-    def add_record(self, newRowDF):
-        """
-        Appends a dictionary to the dataframe in one step.
-        :param data_dict: Dictionary where keys match self.columns.
-        """
-        # 1. Create a timezone-aware timestamp for the current moment
-        # now = data_dict[INDEX]   #datetime.now(UTC)
-
-        # 2. Single-step append: loc automatically maps dictionary keys to columns
-        # self.df.loc[now] = data_dict
-        #self.df.set_index(INDEX, inplace=True)
-
-        if len(self.df)==0:
-            self.df = newRowDF
-        else:
-            self.df = pd.concat([self.df, newRowDF])
-
-        # 3. Maintain the 3-day ring buffer and save
-        self._truncate_and_save()
-
-    def _truncate_and_save(self):
-
-        if len(self.df) > 5:
-
-            """Truncates data older than 3 days and saves to CSV to persist through reboots."""
-            cutoff_time = pd.Timestamp.now(tz=NY_TZ) - pd.Timedelta(days=3)
-            logging.info(f"Truncating data older than {cutoff_time}")
-
-            # Keep only records from the last 72 hours
-            self.df = self.df[self.df.index > cutoff_time]
-        else:
-            logging.info("DataFrame is empty, skipping truncation.")
-
-        # Remove columns that are completely empty
-        df_filtered = self.df.dropna(axis=1, how='all')
-
-        # Export the cleaned DataFrame to CSV
-        df_filtered.to_csv(self.filepath)
-
-    def get_data(self):
-        """Access the dataframe for graphing or analysis."""
-        return self.df
+    panels = [(kind, tag, BuoyDataCapture(panelKinds[kind]['urls'][tag], panelKinds[kind]['sources'], None, ocrEngine=engine))
+              for kind, tag in wanted]
+    # one buffer per store for the whole capture (its history is read at most once)
+    buffers = {kind: DataBuffer(list(panelKinds[kind]['sources'].keys()), filepath=panelKinds[kind]['store'])
+               for kind, _ in wanted}
+
+    # 1. All the fetches at once, they spend their time waiting on the network. (The fetcher and its validators are
+    #    made here, before the threads go looking for them.)
+    getFetcher()
+    with ThreadPoolExecutor(max_workers=len(panels)) as pool:
+        fetched = list(pool.map(_fetchPanel, [panel for _, _, panel in panels]))
+
+    # 2. Nothing new on a panel? Then there's nothing to read and nothing to write.
+    detector = PanelChangeDetector()
+    changed = []
+    for (kind, tag, panel), ok in zip(panels, fetched):
+        if ok is None:
+            continue
+        if LAYOUT_REGISTRATION:
+            panel.register_layout()
+        # (a '304 Not Modified' hands back our own copy which hashes the same as last time)
+        fingerprint = panel.fingerprint()
+        if CHANGE_DETECTION != 'off' and not force and detector.unchanged(panel.sourceURL, fingerprint):
+            continue
+        changed.append((kind, tag, panel, fingerprint))
+
+    # 3. OCR the panels that changed, side by side.
+    def decode(job):
+        kind, tag, panel, fingerprint = job
+        logging.info(f"--- {kind.capitalize()} Data Read: {tag}")
+        # The 24 hour maxima come from our own history, they're only read if we don't have enough of it yet.
+        rolling = panel.rolling_fields()
+        panel.extract_regions(skip=[key for keys in rolling.values() for key in keys])
+        unread = []
+        for rankedBy, keys in rolling.items():
+            rollingMax = _rollingMax(buffers[kind], panel, rankedBy, keys)
+            if rollingMax is None:
+                unread += keys
+            else:
+                unread += panel.fill_from_history(rollingMax, rankedBy, keys, pd.Timedelta(seconds=CAPTURE_PERIODS[kind]))
+        if unread:
+            logging.info(f"Not enough history for the 24hr maxima yet, reading {unread}")
+            panel.extract_regions(only=unread)
+        logging.debug("time: %s @%s", panel[INDEX].strftime('%Y-%m-%d %I:%M:%S %P %Z'), panel[INDEX])
+        return job
+
+    decoded = list(_getOCRPool().map(decode, changed))
+
+    # 4. Now we want to store this data in a CSV file or a database. Every source of a kind goes into its store
+    #    in one write.
+    records, guessed = {}, {}
+    for kind, tag, panel, fingerprint in decoded:
+        logging.info("dataframe:  %s", panel.getNewDFRecord())
+        records.setdefault(kind, []).append(panel.getNewDFRecord())
+        guessed.setdefault(kind, []).append(panel.timeGuessed)
+    for kind, newRecords in records.items():
+        # Add the new records (automatically handles truncation and saving)
+        buffers[kind].add_records(newRecords, timeGuessed=guessed[kind])
+    for kind, tag, panel, fingerprint in decoded:
+        detector.remember(panel.sourceURL, fingerprint, panel.getDict())
+
+    # 5. Line up the buoys (and the NDBC's Kings Point readings) for the wind graph. Kings Point may have moved on
+    #    even when no panel changed, updateComposite finds out. The history is the wind buffer's, the frame the
+    #    24 hour maxima were worked out from with this capture's records added (only read now if it wasn't then).
+    if any(kind == 'wind' for kind, _ in wanted):
+        try:
+            updateComposite(buffers['wind'].get_data, panelsChanged=any(kind == 'wind' for kind, *_ in decoded))
+        except Exception as err:
+            logging.error(f"Couldn't update the composite wind series: {err}")
+
+    detector.save()
+    saveRollingMax()
+    getRegionCache().save()
+    getFetcher().save()
+    reportTierStats()
+
+    return {(kind, tag): None if panel.timeGuessed else panel.getTime().timestamp() for kind, tag, panel, _ in decoded}
+
+def _sourceTags(kind, srcTag):
+    # 'all' or a single source, anything we don't know about defaults to Execution Rocks
+    urls = panelKinds[kind]['urls']
+    if srcTag == 'all':
+        return list(urls)
+    if srcTag not in urls:
+        logging.warning(f"Source tag '{srcTag}' not recognized. Defaulting to 'exrx'.")
+        return ['exrx']
+    return [srcTag]
 
-def captureWindData(srcTag='exrx'):
+def captureWindData(srcTag='exrx', engine=None, force=False):
     """
     Docstring for captureWindData
     Capture information from the wind buoy graphical image
     and store it into a database.
+    :param srcTag: which buoy ('exrx', 'wlis', 'clis' or 'all')
+    :param engine: name of the OCR back end, None for the default.
+    :param force: OCR and store even if the panel hasn't changed.
     """
     logging.info(f"Capturing wind data for source: {srcTag}")
+    capturePanels([('wind', tag) for tag in _sourceTags('wind', srcTag)], engine=engine, force=force)
 
-    if srcTag in windURLS:
-        srcURL = windURLS[srcTag]
-
-    elif srcTag == 'all':
-        # Handle the case where all sources are to be fetched
-        for tag, url in windURLS.items():
-            captureWindData(srcTag=tag)
-        return  # Exit after processing all sources
-
-    else:
-        logging.warning(f"Source tag '{srcTag}' not recognized. Defaulting to 'exrx'.")
-        srcURL = windURLS['exrx']
-
-    logging.info("-----------------------------------------")
-    logging.info("--- Wind Data Read:")
-
-    wind = BuoyDataCapture(srcURL, windSources, BASE_DIR.parent / "resources" / "tmp" / "wind_panel.png")
-    wind.fetch_image()
-    wind.extract_regions()
-
-    logging.debug("time: %s @%s  ", wind[INDEX].strftime('%Y-%m-%d %I:%M:%S %P %Z'), wind[INDEX])
-
-    # # I think this early problem was a one off.
-    # if datetime.now(NY_TZ) < wind[INDEX]:
-    #     logging.warning("Why is the time wrong?")
-
-    logging.info("dataframe:  %s", wind.getNewDFRecord())
-    ## Now we want to store this data in a CSV file or a database.
-    #
-    wind_buffer = DataBuffer(list(windSources.keys()), filepath=BASE_DIR.parent / "resources" / "wind_data.csv")
-    # Add the new record (automatically handles truncation and saving)
-    wind_buffer.add_record(wind.getNewDFRecord())
-
-def captureWaveData(srcTag='exrx'):
+def captureWaveData(srcTag='exrx', engine=None, force=False):
     """
     Docstring for captureWaveData
-    Capture information from the wind buoy graphical image
+    Capture information from the wave buoy graphical image
     and store it into a database.
+    :param srcTag: which buoy ('exrx', 'wlis', 'clis' or 'all')
+    :param engine: name of the OCR back end, None for the default.
+    :param force: OCR and store even if the panel hasn't changed.
     """
     logging.info(f"Capturing wave data for source: {srcTag}")
+    capturePanels([('wave', tag) for tag in _sourceTags('wave', srcTag)], engine=engine, force=force)
 
-    if srcTag in waveURLS:
-        srcURL = waveURLS[srcTag]
-
-    elif srcTag == 'all':
-    #     # Handle the case where all sources are to be fetched
-        for tag, url in waveURLS.items():
-            captureWaveData(srcTag=tag)
-        return  # Exit after processing all sources
-
-    else:
-        logging.warning(f"Source tag '{srcTag}' not recognized. Defaulting to 'exrx'.")
-        srcURL = windURLS['exrx']
-
-    logging.info("----------------------------------------")
-    logging.info("--- Wave Data Read:")
-    wave = BuoyDataCapture(srcURL, waveSources, BASE_DIR.parent / "resources" / "tmp" / "wave_panel.png")
-    wave.fetch_image()
-    wave.extract_regions()
-
-    logging.debug("time: %s @%s", wave[INDEX].strftime('%Y-%m-%d %I:%M:%S %P %Z'), wave[INDEX])
-
-    logging.debug("dataframe:  %s", wave.getNewDFRecord())
-    ## Now we want to store this data in a CSV file or a database.
-    #
-    wave_buffer = DataBuffer(list(waveSources.keys()), filepath=BASE_DIR.parent / "resources" / "wave_data.csv")
-    # Add the new record (automatically handles truncation and saving)
-    wave_buffer.add_record(wave.getNewDFRecord())
+def learnGlyphs(labelsFile):
+    """
+    Build (or extend) the glyph atlas used by the template OCR engine from hand labelled panels.
+    The labels file is a json list of recorded panels with the true text of their numeric fields:
+        [{"image": "resources/fixtures/exrx_wx_01.png", "layout": "wind",
+          "values": {"WindSpeedAvg [kts]": "12.3", "WindDir [°]": "245", ...}}, ...]
+    Image paths are relative to the labels file.
+    :param labelsFile: path to the labels json
+    """
+    layouts = {'wind': windSources, 'wave': waveSources}
+    labelsFile = Path(labelsFile)
+    with open(labelsFile) as f:
+        labels = json.load(f)
+
+    atlas = GlyphTemplateEngine()
+    used = 0
+    for entry in labels:
+        panel = BuoyDataCapture(entry['image'], layouts[entry['layout']], None, ocrEngine='pytesseract')
+        panel.load_image(labelsFile.parent / entry['image'])
+        keys = [key for key in entry['values'] if key in panel.dataParts and panel.ocrKind(key) == 'numberlike']
+        # (the same preprocessing the capture uses, so the glyphs look the same)
+        ready = panel.preprocess_regions(keys)
+        for key in keys:
+            used += atlas.learn(ready[key], entry['values'][key])
+    logging.info(f"Learned glyphs from {used} labelled regions")
+    if not atlas.chars:
+        logging.warning(f"No usable numeric regions in {labelsFile}, the glyph atlas was not written")
+        return
+    atlas.save()
 
 def main():
     prog = "captureBuoyData   "
@@ -560,15 +978,44 @@ def main():
     parser.add_argument("-z", "--wind",   help="Gather wind information", action='store_true')
     parser.add_argument("-w", "--wave",   help="Gather wave information", action='store_true')
     parser.add_argument("-s", "--source", help="Select buoy to farm", choices=['exrx', 'wlis', 'clis', 'all'], default='exrx')
+    parser.add_argument("-e", "--engine", help="OCR back end", choices=list(engineTypes), default=DEFAULT_ENGINE)
+    parser.add_argument("-f", "--force",  help="OCR and store even if the panel hasn't changed", action='store_true')
+    parser.add_argument("--base-url", help="Fetch the panels from somewhere else (e.g. the panelServer.py stand-in)", metavar="URL")
+    parser.add_argument("--learn-glyphs", help="Build the glyph atlas from a json file of labelled panels", metavar="LABELS")
+    parser.add_argument("--daemon", help="Keep running and capture the panels on their own timers", action='store_true')
+    parser.add_argument("--adaptive", help="Daemon learns when each panel publishes and fetches just after", action='store_true')
+    parser.add_argument("--max-rss", help=f"Daemon recycles itself past this many MB (default {MAX_RSS_MB})", type=float, default=MAX_RSS_MB)
+    parser.add_argument("--max-uptime", help=f"Daemon recycles itself after this many hours (default {MAX_UPTIME_HOURS})", type=float, default=MAX_UPTIME_HOURS)
     args = parser.parse_args()
 
+    if args.learn_glyphs:
+        learnGlyphs(args.learn_glyphs)
+        return
+
+    if args.base_url:
+        for urls in (windURLS, waveURLS):
+            for tag, url in urls.items():
+                urls[tag] = args.base_url.rstrip('/') + '/' + url.split('/')[-1]
+
     args.wind = True #TEMP
 
+    # Everything asked for in one go so wind and wave panels are fetched and decoded together.
+    wanted = []
     if args.wind:
-        captureWindData(args.source)
-
+        wanted += [('wind', tag) for tag in _sourceTags('wind', args.source)]
     if args.wave:
-        captureWaveData(args.source)
+        wanted += [('wave', tag) for tag in _sourceTags('wave', args.source)]
+
+    if args.daemon:
+        daemon = CaptureDaemon(lambda jobs: capturePanels(jobs, engine=args.engine, force=args.force), wanted,
+                               close=closeCapture, maxRSS=args.max_rss, maxUptime=args.max_uptime,
+                               cadence=PublishCadence() if args.adaptive else None)
+        daemon.run()
+        return
+
+    capturePanels(wanted, engine=args.engine, force=args.force)
+
+    closeCapture()
 
 if __name__ == "__main__":
     logFile  = BASE_DIR.parent / "resources" / "logs" / "OCRDataCapture.log"
@@ -0,0 +1,271 @@
+"""
+Bookkeeping that lets the capture skip work it has already done.
+
+The buoy panels only change every 15 (wind) or 20 (wave) minutes but the capture is fired more often than that.
+Every time the panel hasn't changed we used to re-run all the OCR and append a duplicate record. The state kept
+here is small and lives in a json file next to the other mutable content so it survives from one cron run to the
+next (and is simply re-used by a long running process).
+"""
+import json
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_DIR = Path(__file__).resolve().parent
+STATE_FILE = BASE_DIR.parent / "resources" / "tmp" / "captureState.json"
+REGION_CACHE_FILE = BASE_DIR.parent / "resources" / "tmp" / "regionCache.json"
+VALIDATOR_FILE = BASE_DIR.parent / "resources" / "tmp" / "httpValidators.json"
+
+
+def contentHash(*parts):
+    """
+    Short content hash of some bytes (image pixels, a region crop, ...).
+    :param parts: bytes-like objects (str is encoded)
+    :return: hex digest
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+    return h.hexdigest()
+
+def _encode(value):
+    # datetimes don't survive json on their own
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    return value
+
+def _decode(value):
+    if isinstance(value, dict) and 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    return value
+
+
+class PanelChangeDetector:
+    """
+    Remembers a content hash and the last decoded record for each panel URL. If the next panel we fetch has the
+    same hash we already know everything it has to say so there is no reason to OCR it or write it down again.
+    Hits (unchanged) and misses (new data) are counted and logged.
+    :param stateFile: where the state is persisted between runs.
+    """
+    def __init__(self, stateFile=STATE_FILE):
+        self.stateFile = Path(stateFile)
+        self.state = {'panels': {}, 'counters': {'hits': 0, 'misses': 0}}
+        try:
+            with open(self.stateFile) as f:
+                self.state.update(json.load(f))
+        except FileNotFoundError:
+            logging.info(f"No capture state at {self.stateFile}, starting fresh")
+        except json.JSONDecodeError:
+            logging.warning(f"Capture state {self.stateFile} is corrupt, starting fresh")
+
+    def unchanged(self, url, fingerprint):
+        """
+        Test (and count) whether a panel is the same as the last one we decoded.
+        :param url: the panel's source URL
+        :param fingerprint: content hash of the freshly fetched panel
+        :return: True if we have seen exactly this panel before.
+        """
+        panel = self.state['panels'].get(url)
+        counters = self.state['counters']
+        if panel is not None and panel['hash'] == fingerprint:
+            counters['hits'] += 1
+            logging.info(f"Panel unchanged, skipping OCR  [hits: {counters['hits']}, misses: {counters['misses']}]")
+            return True
+        counters['misses'] += 1
+        logging.info(f"Panel changed  [hits: {counters['hits']}, misses: {counters['misses']}]")
+        return False
+
+    def remember(self, url, fingerprint, record):
+        """
+        Store the hash and decoded values of a panel we just processed.
+        :param url: the panel's source URL
+        :param fingerprint: content hash of the panel
+        :param record: dictionary of the decoded values (BuoyDataCapture.getDict())
+        """
+        self.state['panels'][url] = {'hash': fingerprint, 'record': {k: _encode(v) for k, v in record.items()}}
+
+    def lastRecord(self, url):
+        """
+        :return: the last decoded record for a panel (or None if we've never decoded it).
+        """
+        panel = self.state['panels'].get(url)
+        if panel is None:
+            return None
+        return {k: _decode(v) for k, v in panel['record'].items()}
+
+    def save(self):
+        """Persist the state. Written to a temporary file first so a reader never sees half a file."""
+        tmpFile = self.stateFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmpFile, self.stateFile)
+
+
+class RegionCache:
+    """
+    Small least-recently-used cache from the pixels of a preprocessed region crop to the text OCR found in it.
+    Lots of fields (the 24hr maxima, the source tag, temperatures overnight, ...) look exactly the same from one
+    capture to the next so only the regions whose pixels actually changed need to go to the OCR engine.
+    The cache is kept on disk so the savings hold with one process per capture.
+    :param cacheFile: where the cache is persisted.
+    :param maxEntries: oldest (least recently used) entries are evicted past this.
+    """
+    def __init__(self, cacheFile=REGION_CACHE_FILE, maxEntries=512):
+        self.cacheFile = Path(cacheFile)
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()  # the OCR for several panels can run at once
+        try:
+            with open(self.cacheFile) as f:
+                self.entries.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            logging.warning(f"Region cache {self.cacheFile} is corrupt, starting fresh")
+
+    @staticmethod
+    def key(image, *context):
+        """
+        Cache key for a crop.
+        :param image: the preprocessed PIL image handed to the OCR engine
+        :param context: anything else the answer depends on (OCR config, engine name)
+        """
+        return contentHash(*context, image.mode, str(image.size), image.tobytes())
+
+    def get(self, key):
+        """:return: the cached text or None"""
+        with self._lock:
+            text = self.entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self._dirty = True  # the order changed
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        """Persist the cache (only if something changed)."""
+        logging.info(f"Region cache hits: {self.hits}, misses: {self.misses}, entries: {len(self.entries)}")
+        if not self._dirty:
+            return
+        with self._lock:
+            tmpFile = self.cacheFile.with_suffix('.tmp')
+            with open(tmpFile, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmpFile, self.cacheFile)
+            self._dirty = False
+
+# One cache per process, shared by every capture it runs.
+# (The first callers can be the fetch and OCR threads of a capture, all at once. Without the lock each would build
+# its own and whatever the losers recorded would never be saved.)
+_regionCache = None
+_initLock = threading.Lock()
+
+def getRegionCache():
+    global _regionCache
+    if _regionCache is None:
+        with _initLock:
+            if _regionCache is None:
+                _regionCache = RegionCache()
+    return _regionCache
+
+
+# One keep-alive session for every panel fetch. Connections to the UConn server are pooled and re-used.
+_session = None
+
+def getSession():
+    global _session
+    if _session is None:
+        with _initLock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class ConditionalFetcher:
+    """
+    Fetches panels with conditional GETs. The ETag/Last-Modified the server gave us last time is sent back
+    (If-None-Match/If-Modified-Since) and a '304 Not Modified' means we can use the copy we kept on disk. This
+    replaces the random query string we used to add, which defeated every cache between us and the server.
+    :param validatorFile: where the validators are persisted between runs.
+    """
+    def __init__(self, validatorFile=VALIDATOR_FILE):
+        self.validatorFile = Path(validatorFile)
+        self.validators = {}
+        try:
+            with open(self.validatorFile) as f:
+                self.validators = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def fetch(self, url, localCopy, timeout=30):
+        """
+        Retrieve a panel.
+        :param url: where the panel lives
+        :param localCopy: path of the copy we keep of the last version we got
+        :return: (content bytes, modified) where modified is False when the server said nothing changed.
+        """
+        localCopy = Path(localCopy)
+        headers = {}
+        known = self.validators.get(url, {})
+        if localCopy.exists():
+            if 'etag' in known:
+                headers['If-None-Match'] = known['etag']
+            if 'lastModified' in known:
+                headers['If-Modified-Since'] = known['lastModified']
+
+        response = getSession().get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304:
+            logging.info(f"{url} not modified")
+            return localCopy.read_bytes(), False
+        if response.status_code != 200:
+            raise requests.RequestException(f"Failed to retrieve image. Status code: {response.status_code}")
+
+        validators = {}
+        if 'ETag' in response.headers:
+            validators['etag'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            validators['lastModified'] = response.headers['Last-Modified']
+        self.validators[url] = validators
+        localCopy.write_bytes(response.content)
+        return response.content, True
+
+    def save(self):
+        tmpFile = self.validatorFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(self.validators, f)
+        os.replace(tmpFile, self.validatorFile)
+
+_fetcher = None
+
+def getFetcher():
+    global _fetcher
+    if _fetcher is None:
+        with _initLock:
+            if _fetcher is None:
+                _fetcher = ConditionalFetcher()
+    return _fetcher
@@ -0,0 +1,264 @@
+"""
+Keeps the capture running instead of starting it from cron.
+
+Every cron run of captureBuoyData.py is a cold start: python, pandas, numpy, PIL and the OCR engine are all loaded
+again, which takes seconds on the Pi, for a couple of panels' worth of work. The daemon loads them once and keeps
+the OCR engines and the HTTP session warm between captures. Each panel (kind and source) has its own timer.
+
+The tide scripts worry (rightly) about a long running python slowly leaking memory. The daemon deals with that by
+recycling itself: past a resident memory or an uptime limit it re-executes itself with the same arguments and
+starts again clean. Nothing is lost, all the state lives on disk.
+
+With --adaptive the timers aren't fixed any more. The panels publish on a 15 or 20 minute cycle but not at any
+particular minute, so polling blindly either fetches a panel that hasn't changed or finds a new one up to 10
+minutes late. PublishCadence watches the TimeStamps we decode, learns each panel's period and phase (and how long
+after its TimeStamp a panel shows up) and sets the next fetch just after the next update is due. A late panel is
+looked at again after a while (RETRIES), until the next update is due or the buoy looks to have gone quiet.
+"""
+import heapq
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from statistics import median
+
+BASE_DIR = Path(__file__).resolve().parent
+CADENCE_FILE = BASE_DIR.parent / "resources" / "tmp" / "captureCadence.json"
+
+# How often each kind of panel is published (seconds)
+CAPTURE_PERIODS = {
+    'wind': 15 * 60,
+    'wave': 20 * 60,
+}
+
+MAX_RSS_MB = 300       # recycle when the process grows past this
+MAX_UPTIME_HOURS = 24  # ... or has been running this long
+
+# Adaptive cadence
+RETRIES = (60, 120, 240)  # seconds to wait before looking again at a late panel (the last one repeats)
+PROBE = 30                # seconds earlier we look next time when a panel was already up
+HISTORY = 24              # TimeStamps kept per panel to learn from
+
+
+def residentMB():
+    """:return: the resident memory of this process in MB (0 if we can't tell)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource  # the peak, better than nothing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0
+
+
+class PublishCadence:
+    """
+    Learns when each panel publishes from the TimeStamps decoded off it and says when to fetch it next.
+    The period is the median gap between successive TimeStamps (rounded to the minute) and the phase is the last
+    TimeStamp. The panel shows up some time after its TimeStamp (the lag). Finding the panel already up only says
+    the lag is shorter than when we looked, so each time that happens we try PROBE seconds earlier; when a look
+    comes up empty the retry that finds it sets the lag. Until there is enough history the nominal CAPTURE_PERIODS
+    are used.
+    :param stateFile: where the history is persisted between runs.
+    :param periods: nominal seconds between updates of each kind of panel
+    """
+    def __init__(self, stateFile=CADENCE_FILE, periods=None):
+        self.stateFile = Path(stateFile)
+        self.periods = periods or CAPTURE_PERIODS
+        self.panels = {}
+        try:
+            with open(self.stateFile) as f:
+                self.panels = json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            logging.warning(f"Capture cadence {self.stateFile} is corrupt, starting fresh")
+
+    def _panel(self, kind, tag):
+        return self.panels.setdefault(f"{kind}:{tag}", {'stamps': [], 'lag': None, 'missed': False, 'retry': 0,
+                                                         'fetches': 0, 'fresh': 0})
+
+    def period(self, kind, tag):
+        """:return: the learned (or nominal) seconds between updates of a panel"""
+        stamps = self._panel(kind, tag)['stamps']
+        gaps = [b - a for a, b in zip(stamps, stamps[1:]) if b > a]
+        if len(gaps) < 3:
+            return self.periods[kind]
+        # (a missed update makes a gap of two periods, the median doesn't care)
+        return max(60, round(median(gaps) / 60) * 60)
+
+    def observe(self, kind, tag, stamp, seen):
+        """
+        Record a fetch of a panel.
+        :param stamp: epoch seconds of the TimeStamp decoded off the panel, None if the panel hadn't changed (or its
+                      TimeStamp didn't read, a made up time would throw off the stamps we learn from)
+        :param seen: epoch seconds of the fetch
+        :return: True if this is a new TimeStamp
+        """
+        panel = self._panel(kind, tag)
+        panel['fetches'] += 1
+        stamps = panel['stamps']
+        if stamp is None or (stamps and stamp <= stamps[-1]) or stamp > seen + self.periods[kind]:
+            # nothing new (or a TimeStamp OCR made a mess of)
+            if stamps:
+                panel['missed'] = True
+            return False
+        lag = seen - stamp
+        # only when we were on schedule, otherwise it's how long we were away not how late the panel was
+        if stamps and 0 <= lag < self.period(kind, tag):
+            if panel['missed'] or panel['lag'] is None:
+                panel['lag'] = lag
+            else:
+                panel['lag'] = max(0, min(panel['lag'], lag) - PROBE)
+        panel['stamps'] = (stamps + [stamp])[-HISTORY:]
+        panel['missed'] = False
+        panel['fresh'] += 1
+        return True
+
+    def nextFetch(self, kind, tag, stamp, now=None):
+        """
+        When to fetch a panel again.
+        :param stamp: epoch seconds of the TimeStamp we just decoded, None if the panel hadn't changed
+        :param now: epoch seconds of the fetch (defaults to now)
+        :return: epoch seconds of the next fetch
+        """
+        now = time.time() if now is None else now
+        panel = self._panel(kind, tag)
+        fresh = self.observe(kind, tag, stamp, now)
+        period = self.period(kind, tag)
+        if not panel['stamps']:
+            return now + period  # nothing learned yet
+        expected = panel['stamps'][-1] + period + (panel['lag'] or 0)
+        if fresh or expected > now:
+            panel['retry'] = 0
+            if expected > now:
+                return expected
+        # skip the slots we've missed
+        nextSlot = expected + math.ceil((now - expected) / period + 1e-9) * period
+        if fresh or now - panel['stamps'][-1] > 2 * period:
+            return nextSlot  # we were away, or the buoy has gone quiet, no point hammering it
+        # the update is late, look again shortly (but not past when the one after is due)
+        panel['retry'] += 1
+        delay = RETRIES[min(panel['retry'], len(RETRIES)) - 1]
+        logging.info(f"{kind}:{tag} is late, retry {panel['retry']} in {delay}s")
+        return min(now + delay, nextSlot)
+
+    def save(self):
+        for key, panel in self.panels.items():
+            if panel['fetches']:
+                logging.info(f"{key}: period {self.period(*key.split(':'))}s, "
+                             f"{panel['fresh']} of {panel['fetches']} fetches found new data")
+        tmpFile = self.stateFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(self.panels, f)
+        os.replace(tmpFile, self.stateFile)
+
+
+class CaptureDaemon:
+    """
+    Runs the captures on their own timers. Panels that fall due together are captured together (one
+    capturePanels call) so their fetches and OCR still overlap.
+    :param capture: function taking a list of (kind, source tag) pairs, e.g. captureBuoyData.capturePanels. It
+                    returns {(kind, source tag): epoch seconds of the panel's TimeStamp} for the panels with new data.
+    :param wanted: the panels to keep up to date, list of (kind, source tag) pairs
+    :param close: function called before we exit or recycle (let go of the OCR engines)
+    :param periods: seconds between captures of each kind of panel
+    :param maxRSS: recycle past this resident memory (MB), None to never
+    :param maxUptime: recycle after this many hours, None to never
+    :param cadence: a PublishCadence to time the captures by, None for fixed periods
+    """
+    def __init__(self, capture, wanted, close=None, periods=None, maxRSS=MAX_RSS_MB, maxUptime=MAX_UPTIME_HOURS,
+                 cadence=None):
+        self.capture = capture
+        self.close = close
+        self.periods = periods or CAPTURE_PERIODS
+        self.cadence = cadence
+        self.maxRSS = maxRSS
+        self.maxUptime = maxUptime
+        self.started = time.monotonic()
+        self.stopping = threading.Event()
+        # (when it is due, kind, source tag), everything is due straight away
+        now = time.monotonic()
+        self.timers = [(now, kind, tag) for kind, tag in wanted]
+        heapq.heapify(self.timers)
+
+    def stop(self, *args):
+        logging.info("Capture daemon stopping")
+        self.stopping.set()
+
+    def due(self):
+        """:return: the panels that are due, taken off the timers as (when it was due, kind, source tag)"""
+        now = time.monotonic()
+        jobs = []
+        while self.timers and self.timers[0][0] <= now:
+            jobs.append(heapq.heappop(self.timers))
+        return jobs
+
+    def reschedule(self, jobs, results):
+        """
+        Set the next timer for each panel we just captured.
+        :param jobs: what due() handed out
+        :param results: what the capture returned
+        """
+        now = time.monotonic()
+        for when, kind, tag in jobs:
+            if self.cadence is not None:
+                when = now + self.cadence.nextFetch(kind, tag, results.get((kind, tag))) - time.time()
+            else:
+                # if we fell behind (a slow capture, the Pi was busy) skip the missed slots rather than bunch up
+                while when <= now:
+                    when += self.periods[kind]
+            heapq.heappush(self.timers, (when, kind, tag))
+        if self.cadence is not None:
+            self.cadence.save()
+
+    def needsRecycling(self):
+        rss = residentMB()
+        if self.maxRSS is not None and rss > self.maxRSS:
+            logging.info(f"Capture daemon at {rss:.0f}MB (limit {self.maxRSS}MB), recycling")
+            return True
+        hours = (time.monotonic() - self.started) / 3600
+        if self.maxUptime is not None and hours > self.maxUptime:
+            logging.info(f"Capture daemon up {hours:.1f} hours (limit {self.maxUptime}), recycling")
+            return True
+        return False
+
+    def recycle(self):
+        """Start over with a fresh interpreter (same pid, same arguments)."""
+        if self.close is not None:
+            self.close()
+        logging.shutdown()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logging.info(f"Capture daemon started for {[f'{kind}:{tag}' for _, kind, tag in self.timers]}")
+
+        while not self.stopping.is_set():
+            jobs = self.due()
+            if jobs:
+                results = {}
+                try:
+                    results = self.capture([(kind, tag) for _, kind, tag in jobs]) or {}
+                except Exception as err:
+                    # a bad capture mustn't take the daemon down, the next one will probably be fine
+                    logging.exception(f"Capture of {jobs} failed: {err}")
+                self.reschedule(jobs, results)
+                if self.needsRecycling():
+                    self.recycle()
+            # sleep until the next panel is due (or we're told to stop)
+            self.stopping.wait(max(0.0, self.timers[0][0] - time.monotonic()))
+
+        if self.close is not None:
+            self.close()
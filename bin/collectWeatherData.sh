@@ -8,6 +8,7 @@ cd /home/pi/WeatherKiosk/bin
 SOURCE="exrx"
 WAVE_ENABLED=false
 WIND_ENABLED=false
+DAEMON=false
 
 # Loop through all arguments provided to the script
 while [[ "$#" -gt 0 ]]; do
@@ -23,6 +24,12 @@ while [[ "$#" -gt 0 ]]; do
             WAVE_ENABLED=true
             shift # Move to the next argument
             ;;
+        # keep running and capture on our own timers (start it once, e.g. @reboot in the crontab)
+        -d|--daemon)
+            echo "Starting the capture daemon"
+            DAEMON=true
+            shift # Move to the next argument
+            ;;
 	exrx|wlis|clis|all)
             SOURCE=$1
             shift # Move to the next argument
@@ -39,6 +46,13 @@ if [ -n "$1" ]; then
     SOURCE="$1"
 fi
 
+if [ $DAEMON = true ]; then
+     FLAGS=""
+     if [ $WIND_ENABLED = true ]; then FLAGS="$FLAGS -z"; fi
+     if [ $WAVE_ENABLED = true ]; then FLAGS="$FLAGS -w"; fi
+     exec /bin/python3 captureBuoyData.py --daemon $FLAGS -s $SOURCE
+fi
+
 if [ $WAVE_ENABLED = true ]; then
      /bin/python3 captureBuoyData.py -w -s $SOURCE
 fi
@@ -0,0 +1,870 @@
+"""
+Storage for the decoded buoy data.
+
+DataBuffer used to live in captureBuoyData.py. It moved here so the graph generators in cgi-bin can read the
+data through the same code without pulling in the OCR machinery.
+
+The old buffer re-read the whole csv (with date parsing) on every capture, concatenated one row and rewrote the
+whole file. The cost grew with the 3 day window and the SD card got a full rewrite every 10 minutes. Now the csv
+is an append-only log: a capture adds one line. Every so often (when the oldest line is well past the 3 day
+retention) the log is compacted: old records are dropped and the file is rewritten in one atomic step.
+
+There is also a real ring buffer: a preallocated, memory-mapped NumPy structured array (epoch seconds and float32
+fields) with head/count pointers. A write is O(1) and a reader maps the file instead of parsing text.
+
+And a SQLite database (WAL mode) keyed on (Source, TimeStamp): a repeated reading is an upsert, readers ask for
+just the source and time window they want and the capture and the graph processes can't trip over each other.
+The store is picked by the file's suffix (see STORE_FORMAT and storePath).
+
+Beside whichever store there is a small SQLite file of rollups: the averages over 15 minutes, 45 minutes (what the
+wind graph shows) and an hour. They're kept as running sums and counts, so a new record only touches the bucket it
+falls in, and the graphs get their averages without resampling the raw records every time they're drawn.
+
+In memory a buffer is kept small (the Pi has 1 GB and Chromium wants most of it): readings are float32, Source is
+a categorical (one byte per record), times are datetime64 (int64 epoch underneath, the timezone is only a label)
+and columns nobody ever filled in aren't loaded at all. `python3 dataBuffer.py --profile` shows what that saves.
+"""
+import argparse
+import os
+import json
+import tempfile
+import time
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+# file locking keeps a compaction from racing an append (not available on the windows dev box)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+NY_TZ = ZoneInfo('America/New_York')
+INDEX = 'TimeStamp' # standard index label for dataframes
+
+RETENTION = pd.Timedelta(days=3)         # keep the last 72 hours
+COMPACT_SLACK = pd.Timedelta(hours=6)    # let the log run this far past the retention before compacting
+# Readings are float32 in memory, written with 7 significant digits they come back out as they went in (23.4 not
+# 23.399999618530273)
+FLOAT_FORMAT = '%.7g'
+
+# Averages kept up to date as records come in (name: seconds per bucket, buckets start on the epoch)
+ROLLUP_TIERS = {
+    '15min': 15 * 60,
+    '45min': 45 * 60,
+    '1h':    60 * 60,
+}
+
+# Where the data lives and in what form. 'csv' is the append-only log, 'ring' is the memory-mapped ring buffer,
+# 'sqlite' is the indexed database.
+BASE_DIR = Path(__file__).resolve().parent
+pathToResources = BASE_DIR.parent / 'resources'
+STORE_FORMAT = 'csv'
+
+def storePath(kind, storeFormat=None):
+    """
+    The data store for a kind of panel, e.g. storePath('wind') -> resources/wind_data.csv
+    :param kind: 'wind' or 'wave'
+    :param storeFormat: file type (suffix) of the store, defaults to STORE_FORMAT
+    """
+    return pathToResources / f"{kind}_data.{storeFormat or STORE_FORMAT}"
+
+
+@contextmanager
+def _locked(filepath, shared=False):
+    """
+    Hold an exclusive lock (on a side file) while the store is being changed.
+    :param shared: a reader's lock instead, any number of them can hold it but not while the store is changed
+    """
+    if fcntl is None:
+        yield
+        return
+    if shared:
+        # (a reader, the web server say, may not be allowed to write there so it only opens what the writer made)
+        try:
+            lock = open(f"{filepath}.lock", 'r')
+        except FileNotFoundError:
+            lock = None
+        if lock is None:
+            yield
+            return
+    else:
+        lock = open(f"{filepath}.lock", 'w')
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+MISSING = np.iinfo(np.int64).min  # no time
+NO_SOURCE = -1                    # no station number
+
+def _toEpoch(values):
+    # times (aware datetimes or strings) -> int64 epoch seconds, MISSING where there is no time
+    times = pd.to_datetime(pd.Series(values), utc=True, errors='coerce')
+    epoch = np.full(len(times), MISSING, dtype=np.int64)
+    valid = times.notna().to_numpy()
+    # (subtracting the epoch keeps us clear of whatever resolution pandas picked for the datetimes)
+    epoch[valid] = ((times[valid] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy()
+    return epoch
+
+def _fromEpoch(epoch):
+    # int64 epoch seconds -> New York DatetimeIndex
+    seconds = np.where(epoch == MISSING, np.nan, np.asarray(epoch, dtype=np.float64))
+    return pd.DatetimeIndex(pd.to_datetime(seconds, unit='s', utc=True)).tz_convert(NY_TZ)
+
+LOG_TIME_LENGTH = len('2026-03-02 10:15:00-05:00')  # how the log writes its times (to_csv of an aware time)
+
+def _parseTimes(values):
+    """
+    Times as the log writes them -> New York DatetimeIndex. NumPy reads that fixed layout straight to epoch
+    seconds in one go, several times quicker than pandas parsing the text (and the same on the Pi's older pandas).
+    Whatever isn't in that layout (blanks, fractions of a second, an older file) goes through pandas instead.
+    :param values: strings (NaN where there is no time)
+    """
+    text = np.asarray(values, dtype=str)
+    epoch = np.full(len(text), MISSING, dtype=np.int64)
+    # (each character as its code point, one row per time)
+    chars = text.astype(f'U{LOG_TIME_LENGTH}').view(np.uint32).reshape(len(text), LOG_TIME_LENGTH).astype(np.int64)
+    fixed = ((np.char.str_len(text) == LOG_TIME_LENGTH) & (chars[:, 10] == ord(' ')) & (chars[:, 22] == ord(':'))
+             & ((chars[:, 19] == ord('+')) | (chars[:, 19] == ord('-'))))
+    try:
+        local = text[fixed].astype('U19').astype('datetime64[s]').astype(np.int64)
+    except ValueError:
+        fixed[:] = False  # not what it looked like, pandas can sort it out
+    else:
+        digits = chars[fixed][:, [20, 21, 23, 24]] - ord('0')
+        offset = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 2] * 10 + digits[:, 3]) * 60
+        epoch[fixed] = local - np.where(chars[fixed][:, 19] == ord('-'), -offset, offset)
+    if not fixed.all():
+        epoch[~fixed] = _toEpoch(text[~fixed])
+    return _fromEpoch(epoch)
+
+def _toSource(values):
+    # OCR'd source tags ('44022') -> station numbers
+    return pd.to_numeric(pd.Series(values), errors='coerce').fillna(NO_SOURCE).astype(np.int32).to_numpy()
+
+def _isTimeColumn(column):
+    return column.find('Time') > -1
+
+def compactFrame(df):
+    """
+    The compact in-memory form of a buffer: float32 readings, Source as a categorical, times as datetime64 in New
+    York time, and no columns that are empty in every record.
+    :param df: records indexed by INDEX (as a store reads them)
+    :return: the compacted dataframe
+    """
+    df = df.dropna(axis='columns', how='all')
+    # (only what isn't in the right form already is converted, a store's read mostly is)
+    floats, converted = {}, {}
+    for column, dtype in df.dtypes.items():
+        if column == 'Source':
+            if not isinstance(dtype, pd.CategoricalDtype):
+                converted[column] = pd.Categorical(pd.to_numeric(df[column], errors='coerce'))
+        elif _isTimeColumn(column):
+            if getattr(dtype, 'tz', None) != NY_TZ:
+                converted[column] = pd.to_datetime(df[column], utc=True, errors='coerce').dt.tz_convert(NY_TZ)
+        elif dtype != np.float32:
+            if dtype.kind in 'biuf':
+                floats[column] = np.float32
+            else:
+                converted[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float32)
+    if floats:
+        df = df.astype(floats)
+    if converted:
+        df = df.assign(**converted)
+    if not isinstance(df.index, pd.DatetimeIndex) or df.index.tz != NY_TZ:
+        index = pd.DatetimeIndex(df.index)
+        df.index = (index.tz_localize('UTC') if index.tz is None else index).tz_convert(NY_TZ)
+    df.index.name = INDEX
+    return df
+
+def _isDirectionColumn(column):
+    # compass directions have to be averaged as vectors: the mean of 350° and 10° is 0° not 180°
+    return column.find('Dir') > -1 and column.find('[°]') > -1
+
+
+class AppendLogStore:
+    """
+    A csv file used as an append-only record log. The header is fixed (every label, populated or not) so a new
+    record is just one more line. Readers always see whole lines: a record is written with a single write() and
+    compaction swaps in a complete new file.
+    :param filepath: Path to the CSV file.
+    :param columns: the column labels (the INDEX label is the first column of the file).
+    """
+    def __init__(self, filepath, columns):
+        self.filepath = Path(filepath)
+        self.columns = [c for c in columns if c != INDEX]
+        self.header = ",".join([INDEX] + self.columns)
+
+    def _fileHeader(self):
+        try:
+            with open(self.filepath) as f:
+                return f.readline().rstrip("\n")
+        except FileNotFoundError:
+            return None
+
+    def append(self, newRowsDF):
+        """
+        Add records to the end of the log.
+        :param newRowsDF: dataframe indexed by INDEX
+        """
+        with _locked(self.filepath):
+            header = self._fileHeader()
+            if header is not None and header != self.header:
+                # an older file written without the empty columns; rewrite it once with the full header
+                logging.info(f"Upgrading {self.filepath} to the full header")
+                self._rewrite(self._read())
+                header = self.header
+            rows = newRowsDF.reindex(columns=self.columns).to_csv(header=(header is None), float_format=FLOAT_FORMAT)
+            with open(self.filepath, 'a') as f:
+                f.write(rows)
+
+    def _read(self):
+        if not self.filepath.exists():
+            return pd.DataFrame(columns=self.columns, index=pd.DatetimeIndex([], tz=NY_TZ, name=INDEX))
+        with open(self.filepath) as f:
+            header = f.readline().rstrip("\n").split(",")
+        # typed as it's parsed: readings straight to float32, times kept as text until they're parsed in one go
+        dtypes = {column: (str if _isTimeColumn(column) else np.float32) for column in header if column != 'Source'}
+        df = pd.read_csv(self.filepath, index_col=0, dtype=dtypes)
+        # EST and EDT offsets both show up in a file, they're worked out to epoch seconds (see _parseTimes)
+        df.index = _parseTimes(df.index)
+        df.index.name = INDEX
+        for column in df.columns:
+            if _isTimeColumn(column):
+                df[column] = pd.Series(_parseTimes(df[column]), index=df.index)
+        return df
+
+    def read(self):
+        """:return: every record in the log"""
+        return self._read()
+
+    def oldest(self):
+        """
+        Time of the first record without reading the whole file (the log is in time order).
+        :return: pd.Timestamp or None if the log is empty
+        """
+        try:
+            with open(self.filepath) as f:
+                f.readline()
+                first = f.readline()
+        except FileNotFoundError:
+            return None
+        if not first:
+            return None
+        return pd.Timestamp(first.split(",", 1)[0]).tz_convert(NY_TZ)
+
+    def _rewrite(self, df):
+        tmpFile = self.filepath.with_suffix('.tmp')
+        df.reindex(columns=self.columns).to_csv(tmpFile, float_format=FLOAT_FORMAT)
+        os.replace(tmpFile, self.filepath)
+
+    def compact(self, cutoff):
+        """
+        Drop records older than the cutoff (and any duplicates) and rewrite the log.
+        :param cutoff: tz aware pd.Timestamp
+        """
+        with _locked(self.filepath):
+            df = self._read()
+            df = df[df.index > cutoff]
+            # the same reading captured twice (a --force run for instance) only needs to be kept once
+            keys = [INDEX] + (['Source'] if 'Source' in df else [])
+            df = df[~df.reset_index().duplicated(subset=keys, keep='last').to_numpy()]
+            self._rewrite(df.sort_index(kind='stable'))
+
+
+class RingBufferStore:
+    """
+    Fixed size ring buffer of records in a memory-mapped file. Each record is a NumPy structured array row:
+    TimeStamp and the date fields as int64 epoch seconds, Source as an int32 station number and everything else
+    float32. The file starts with a small header (capacity, head, count) and the schema is kept in a json file
+    beside it so a reader can map the data without knowing the labels.
+    :param filepath: path of the ring file (e.g. resources/wind_data.ring)
+    :param columns: the column labels, only needed to create the file.
+    :param capacity: number of records before the oldest are overwritten (3 days x 3 buoys x 6/hr is ~1300)
+    :param readOnly: map the file read only (the graph CGI), it has to exist already and can't be appended to
+    """
+    HEADER = 4          # int64 slots: magic, capacity, head, count
+    MAGIC = 0x574B52494E473031  # 'WKRING01'
+
+    def __init__(self, filepath, columns=None, capacity=4096, readOnly=False):
+        self.filepath = Path(filepath)
+        self.readOnly = readOnly
+        self.schemaFile = Path(f"{filepath}.json")
+        fields = None
+        if self.schemaFile.exists() and self.filepath.exists():
+            with open(self.schemaFile) as f:
+                fields = [tuple(field) for field in json.load(f)]
+        wanted = self._fields(columns) if columns is not None else fields
+        if wanted is None:
+            raise FileNotFoundError(f"No ring buffer at {self.filepath}")
+        if fields != wanted:
+            if readOnly:
+                raise ValueError(f"Ring buffer {self.filepath} doesn't have the layout asked for")
+            if fields is not None:
+                logging.warning(f"Ring buffer {self.filepath} has a different layout, starting a new one")
+            self._create(wanted, capacity)
+        self.dtype = np.dtype(wanted)
+        self._map()
+
+    @staticmethod
+    def _fields(columns):
+        fields = [(INDEX, '<i8')]
+        for column in columns:
+            if column == INDEX:
+                continue
+            if column == 'Source':
+                fields.append((column, '<i4'))
+            elif _isTimeColumn(column):
+                fields.append((column, '<i8'))
+            else:
+                fields.append((column, '<f4'))
+        return fields
+
+    def _create(self, fields, capacity):
+        dtype = np.dtype(fields)
+        with open(self.filepath, 'wb') as f:
+            f.truncate(self.HEADER * 8 + capacity * dtype.itemsize)
+        header = np.memmap(self.filepath, dtype='<i8', mode='r+', shape=(self.HEADER,))
+        header[:] = (self.MAGIC, capacity, 0, 0)
+        header.flush()
+        with open(self.schemaFile, 'w') as f:
+            json.dump(fields, f)
+        # the readers only take a shared lock on it, they can't create it
+        open(f"{self.filepath}.lock", 'a').close()
+
+    def _map(self):
+        mode = 'r' if self.readOnly else 'r+'
+        self.header = np.memmap(self.filepath, dtype='<i8', mode=mode, shape=(self.HEADER,))
+        if self.header[0] != self.MAGIC:
+            raise ValueError(f"{self.filepath} is not a ring buffer")
+        self.capacity = int(self.header[1])
+        self.records = np.memmap(self.filepath, dtype=self.dtype, mode=mode, offset=self.HEADER * 8, shape=(self.capacity,))
+
+    def append(self, newRowsDF):
+        """
+        Write records at the head of the ring, overwriting the oldest once it is full. O(1) per record.
+        :param newRowsDF: dataframe indexed by INDEX
+        """
+        if self.readOnly:
+            raise PermissionError(f"Ring buffer {self.filepath} was opened read only")
+        with _locked(self.filepath):
+            rows = np.zeros(len(newRowsDF), dtype=self.dtype)
+            rows[INDEX] = _toEpoch(newRowsDF.index)
+            for name in self.dtype.names[1:]:
+                if name not in newRowsDF:
+                    rows[name] = np.nan if self.dtype[name].kind == 'f' else (NO_SOURCE if name == 'Source' else MISSING)
+                elif name == 'Source':
+                    rows[name] = _toSource(newRowsDF[name])
+                elif self.dtype[name].kind == 'i':
+                    rows[name] = _toEpoch(newRowsDF[name])
+                else:
+                    rows[name] = pd.to_numeric(newRowsDF[name], errors='coerce').to_numpy(dtype=np.float32)
+            # a batch bigger than the ring only leaves its newest records
+            rows = rows[-self.capacity:]
+            head, count = int(self.header[2]), int(self.header[3])
+            self.records[(head + np.arange(len(rows))) % self.capacity] = rows
+            head = (head + len(rows)) % self.capacity
+            count = min(count + len(rows), self.capacity)
+            self.records.flush()
+            self.header[2], self.header[3] = head, count
+            self.header.flush()
+
+    def views(self):
+        """
+        The stored records in time order without copying anything. An append can change them under the caller,
+        hold the shared lock while using them (see select).
+        :return: tuple of (older, newer) structured array views into the mapped file.
+        """
+        head, count = int(self.header[2]), int(self.header[3])
+        if count < self.capacity:
+            return self.records[:0], self.records[:count]
+        return self.records[head:], self.records[:head]
+
+    def select(self, source=None, start=None, columns=None):
+        """
+        Copy out just the records (and fields) a reader needs.
+        :param source: station number to keep (e.g. 44022), None for all
+        :param start: tz aware time, only records after this are returned
+        :param columns: the fields wanted, None for all
+        :return: dataframe indexed by INDEX in New York time
+        """
+        columns = [c for c in (columns or self.dtype.names[1:]) if c in self.dtype.names]
+        parts = []
+        # (copied out under the lock so we never see half an append)
+        with _locked(self.filepath, shared=True):
+            for part in self.views():
+                keep = part[INDEX] != MISSING
+                if source is not None:
+                    keep &= part['Source'] == source
+                if start is not None:
+                    keep &= part[INDEX] > int(pd.Timestamp(start).timestamp())
+                parts.append(part[[INDEX] + columns][keep])
+        rows = np.concatenate(parts)
+        data = {}
+        for name in columns:
+            if name == 'Source':
+                data[name] = np.where(rows[name] == NO_SOURCE, np.nan, rows[name])
+            elif self.dtype[name].kind == 'i':
+                data[name] = _fromEpoch(rows[name])
+            else:
+                data[name] = rows[name]
+        index = _fromEpoch(rows[INDEX])
+        index.name = INDEX
+        return pd.DataFrame(data, index=index)
+
+    def read(self):
+        """:return: every record in the ring"""
+        return self.select()
+
+    def oldest(self):
+        with _locked(self.filepath, shared=True):
+            older, newer = self.views()
+            first = older if len(older) else newer
+            if len(first) == 0:
+                return None
+            return _fromEpoch(first[INDEX][:1].copy())[0]
+
+    def compact(self, cutoff):
+        # Nothing to do, the ring overwrites the oldest records on its own and readers filter by time.
+        pass
+
+
+class SqliteStore:
+    """
+    Wind or wave observations from every buoy in one SQLite table. The primary key (Source, TimeStamp) is the
+    composite index every query uses and makes a repeated reading an upsert rather than a duplicate. The database
+    runs in WAL mode so the graph can read while the capture writes. Times are stored as epoch seconds.
+    :param filepath: path of the database (e.g. resources/wind_data.sqlite)
+    :param columns: the column labels, new ones are added to the table. None to use the table as it is.
+    """
+    TABLE = 'observations'
+
+    def __init__(self, filepath, columns=None):
+        self.filepath = Path(filepath)
+        # (a capture reads from its OCR threads, one at a time, and writes from the main thread)
+        self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(f'''CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                                "{INDEX}" INTEGER NOT NULL,
+                                "Source" INTEGER NOT NULL,
+                                PRIMARY KEY ("Source", "{INDEX}")) WITHOUT ROWID''')
+        # (for the retention, which doesn't care about the source)
+        self.db.execute(f'CREATE INDEX IF NOT EXISTS byTime ON {self.TABLE} ("{INDEX}")')
+        existing = [row[1] for row in self.db.execute(f"PRAGMA table_info({self.TABLE})")]
+        for column in (columns or []):
+            if column not in existing:
+                kind = 'INTEGER' if _isTimeColumn(column) else 'REAL'
+                self.db.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN "{column}" {kind}')
+                existing.append(column)
+        self.db.commit()
+        self.columns = [c for c in existing if c not in (INDEX, 'Source')]
+
+    def append(self, newRowsDF):
+        """
+        Insert records in one transaction. A record with the same source and time replaces the earlier one.
+        :param newRowsDF: dataframe indexed by INDEX
+        """
+        names = [INDEX, 'Source'] + self.columns
+        values = {INDEX: _toEpoch(newRowsDF.index),
+                  'Source': _toSource(newRowsDF['Source']) if 'Source' in newRowsDF else np.full(len(newRowsDF), NO_SOURCE)}
+        for column in self.columns:
+            if column not in newRowsDF:
+                values[column] = [None] * len(newRowsDF)
+            elif _isTimeColumn(column):
+                values[column] = [None if t == MISSING else int(t) for t in _toEpoch(newRowsDF[column])]
+            else:
+                values[column] = [None if v != v else float(v) for v in pd.to_numeric(newRowsDF[column], errors='coerce')]
+        rows = list(zip(*[[int(v) if name in (INDEX, 'Source') else v for v in values[name]] for name in names]))
+        quoted = ", ".join(f'"{name}"' for name in names)
+        updates = ", ".join(f'"{name}"=excluded."{name}"' for name in self.columns)
+        with self.db:
+            self.db.executemany(f'''INSERT INTO {self.TABLE} ({quoted}) VALUES ({", ".join("?" * len(names))})
+                                    ON CONFLICT("Source", "{INDEX}") DO UPDATE SET {updates}''', rows)
+
+    def select(self, source=None, start=None, end=None, columns=None):
+        """
+        Only the records (and fields) a reader needs, found through the (Source, TimeStamp) index.
+        :param source: station number to keep (e.g. 44022), None for all
+        :param start: tz aware time, only records after this are returned
+        :param end: tz aware time, only records up to this are returned
+        :param columns: the fields wanted, None for all
+        :return: dataframe indexed by INDEX in New York time
+        """
+        columns = [c for c in (columns or ['Source'] + self.columns) if c == 'Source' or c in self.columns]
+        where, args = [], []
+        if source is not None:
+            where.append('"Source" = ?'); args.append(int(source))
+        if start is not None:
+            where.append(f'"{INDEX}" > ?'); args.append(int(pd.Timestamp(start).timestamp()))
+        if end is not None:
+            where.append(f'"{INDEX}" <= ?'); args.append(int(pd.Timestamp(end).timestamp()))
+        query = f'SELECT "{INDEX}", ' + ", ".join(f'"{c}"' for c in columns) + f" FROM {self.TABLE}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f' ORDER BY "{INDEX}"'
+        rows = self.db.execute(query, args).fetchall()
+        table = np.array(rows, dtype=object).reshape(len(rows), len(columns) + 1)
+        data = {}
+        for i, column in enumerate(columns, start=1):
+            if column == 'Source':
+                data[column] = np.where(table[:, i] == NO_SOURCE, np.nan, table[:, i]).astype(np.float64)
+            elif _isTimeColumn(column):
+                data[column] = _fromEpoch(np.array([MISSING if t is None else t for t in table[:, i]], dtype=np.int64))
+            else:
+                data[column] = np.array([np.nan if v is None else v for v in table[:, i]], dtype=np.float64)
+        index = _fromEpoch(table[:, 0].astype(np.int64))
+        index.name = INDEX
+        return pd.DataFrame(data, index=index)
+
+    def latest(self, source=None):
+        """:return: time of the newest record (for one source), None if there are none"""
+        if source is None:
+            (last,) = self.db.execute(f'SELECT MAX("{INDEX}") FROM {self.TABLE}').fetchone()
+        else:
+            (last,) = self.db.execute(f'SELECT MAX("{INDEX}") FROM {self.TABLE} WHERE "Source" = ?', (int(source),)).fetchone()
+        return None if last is None else _fromEpoch(np.array([last]))[0]
+
+    def read(self):
+        """:return: every record in the database"""
+        return self.select()
+
+    def oldest(self):
+        (first,) = self.db.execute(f'SELECT MIN("{INDEX}") FROM {self.TABLE}').fetchone()
+        return None if first is None else _fromEpoch(np.array([first]))[0]
+
+    def compact(self, cutoff):
+        """Delete records older than the cutoff."""
+        with self.db:
+            self.db.execute(f'DELETE FROM {self.TABLE} WHERE "{INDEX}" <= ?', (int(pd.Timestamp(cutoff).timestamp()),))
+
+
+def rollupPath(filepath):
+    """The rollups kept beside a data store, e.g. resources/wind_data.csv -> resources/wind_data_rollup.sqlite"""
+    filepath = Path(filepath)
+    return filepath.with_name(f"{filepath.stem}_rollup.sqlite")
+
+class RollupStore:
+    """
+    Averages of each source's readings over the ROLLUP_TIERS, one table per tier. A bucket holds the sum and the
+    count of the readings of each field (directions as the sums of their sines and cosines) so adding a record is
+    an upsert of the bucket it falls in. The time of the last record taken from each source is kept too: a record
+    that isn't newer (the same reading stored again) is left out instead of being counted twice.
+    Time fields (e.g. WindTimeM24) aren't averaged.
+    :param filepath: path of the rollup database (see rollupPath)
+    :param columns: the column labels, new ones are added to the tables. None to use the tables as they are.
+    """
+    def __init__(self, filepath, columns=None):
+        self.filepath = Path(filepath)
+        # (a capture reads from its OCR threads, one at a time, and writes from the main thread)
+        self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(f'''CREATE TABLE IF NOT EXISTS latest (
+                                "Source" INTEGER PRIMARY KEY,
+                                "{INDEX}" INTEGER NOT NULL)''')
+        for tier in ROLLUP_TIERS:
+            self.db.execute(f'''CREATE TABLE IF NOT EXISTS "rollup_{tier}" (
+                                    "Source" INTEGER NOT NULL,
+                                    "Bucket" INTEGER NOT NULL,
+                                    PRIMARY KEY ("Source", "Bucket")) WITHOUT ROWID''')
+        existing = [row[1] for row in self.db.execute('PRAGMA table_info("rollup_1h")')]
+        for column in (columns or []):
+            if column in (INDEX, 'Source') or _isTimeColumn(column) or f"{column}|n" in existing:
+                continue
+            parts = ('sin', 'cos', 'n') if _isDirectionColumn(column) else ('sum', 'n')
+            for tier in ROLLUP_TIERS:
+                for part in parts:
+                    self.db.execute(f'ALTER TABLE "rollup_{tier}" ADD COLUMN "{column}|{part}" REAL NOT NULL DEFAULT 0')
+            existing += [f"{column}|{part}" for part in parts]
+        self.db.commit()
+        self.columns = [c[:-2] for c in existing if c.endswith('|n')]
+
+    def isEmpty(self):
+        return self.db.execute('SELECT COUNT(*) FROM latest').fetchone()[0] == 0
+
+    def add(self, newRowsDF):
+        """
+        Fold records into their buckets, one transaction for all of them.
+        :param newRowsDF: dataframe indexed by INDEX (with a Source column)
+        """
+        if not len(newRowsDF):
+            return
+        epoch = _toEpoch(newRowsDF.index)
+        sources = _toSource(newRowsDF['Source']) if 'Source' in newRowsDF else np.full(len(newRowsDF), NO_SOURCE)
+        latest = dict(self.db.execute(f'SELECT "Source", "{INDEX}" FROM latest').fetchall())
+        fresh = (epoch != MISSING) & (epoch > np.array([latest.get(int(s), MISSING) for s in sources], dtype=np.int64))
+        if not fresh.any():
+            return
+        df = pd.DataFrame({INDEX: epoch[fresh], 'Source': sources[fresh]})
+        parts = {}
+        for column in self.columns:
+            values = np.full(len(df), np.nan)
+            if column in newRowsDF:
+                values = pd.to_numeric(newRowsDF[column], errors='coerce').to_numpy(dtype=np.float64)[fresh]
+            valid = ~np.isnan(values)
+            parts[f"{column}|n"] = valid.astype(np.float64)
+            if _isDirectionColumn(column):
+                parts[f"{column}|sin"] = np.where(valid, np.sin(np.radians(values)), 0.0)
+                parts[f"{column}|cos"] = np.where(valid, np.cos(np.radians(values)), 0.0)
+            else:
+                parts[f"{column}|sum"] = np.where(valid, values, 0.0)
+        df = df.assign(**parts)
+        names = list(parts)
+        quoted = ", ".join(f'"{name}"' for name in names)
+        updates = ", ".join(f'"{name}"="{name}"+excluded."{name}"' for name in names)
+        with self.db:
+            for tier, width in ROLLUP_TIERS.items():
+                buckets = df.assign(Bucket=df[INDEX] // width * width).groupby(['Source', 'Bucket'])[names].sum()
+                rows = [(int(source), int(bucket), *map(float, sums))
+                        for (source, bucket), sums in zip(buckets.index, buckets.to_numpy())]
+                self.db.executemany(f'''INSERT INTO "rollup_{tier}" ("Source", "Bucket", {quoted})
+                                        VALUES ({", ".join("?" * (len(names) + 2))})
+                                        ON CONFLICT("Source", "Bucket") DO UPDATE SET {updates}''', rows)
+            self.db.executemany(f'''INSERT INTO latest ("Source", "{INDEX}") VALUES (?, ?)
+                                    ON CONFLICT("Source") DO UPDATE SET "{INDEX}"=excluded."{INDEX}"''',
+                                [(int(source), int(last)) for source, last in df.groupby('Source')[INDEX].max().items()])
+
+    def latest(self, source):
+        """:return: time of the newest record taken from a source, None if there are none"""
+        row = self.db.execute(f'SELECT "{INDEX}" FROM latest WHERE "Source" = ?', (int(source),)).fetchone()
+        return None if row is None else _fromEpoch(np.array(row))[0]
+
+    def window(self, source, start=None, end=None, resolution='1h', columns=None):
+        """
+        The averages of one source over a stretch of time.
+        :param source: station number (e.g. 44022)
+        :param start: tz aware time, buckets holding anything after this are returned
+        :param end: tz aware time, buckets starting after this are left out
+        :param resolution: one of the ROLLUP_TIERS
+        :param columns: the fields wanted, None for all
+        :return: dataframe indexed by the start of each bucket (New York time). Directions are the mean direction
+                 in degrees, with the mean sine and cosine in '<column> sin' and '<column> cos'.
+        """
+        width = ROLLUP_TIERS[resolution]
+        columns = [c for c in (columns or self.columns) if c in self.columns]
+        parts = [f"{column}|{part}" for column in columns
+                 for part in (('sin', 'cos', 'n') if _isDirectionColumn(column) else ('sum', 'n'))]
+        query = 'SELECT "Bucket", ' + ", ".join(f'"{part}"' for part in parts) + f' FROM "rollup_{resolution}" WHERE "Source" = ?'
+        args = [int(source)]
+        if start is not None:
+            query += ' AND "Bucket" > ?'; args.append(int(pd.Timestamp(start).timestamp()) - width)
+        if end is not None:
+            query += ' AND "Bucket" <= ?'; args.append(int(pd.Timestamp(end).timestamp()))
+        rows = np.array(self.db.execute(query + ' ORDER BY "Bucket"', args).fetchall(), dtype=np.float64)
+        rows = rows.reshape(len(rows), len(parts) + 1)
+        sums = dict(zip(parts, rows[:, 1:].T))
+        data = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for column in columns:
+                n = np.where(sums[f"{column}|n"] > 0, sums[f"{column}|n"], np.nan)
+                if _isDirectionColumn(column):
+                    sin, cos = sums[f"{column}|sin"] / n, sums[f"{column}|cos"] / n
+                    data[column] = np.degrees(np.arctan2(sin, cos)) % 360
+                    data[f"{column} sin"], data[f"{column} cos"] = sin, cos
+                else:
+                    data[column] = sums[f"{column}|sum"] / n
+        index = _fromEpoch(rows[:, 0].astype(np.int64))
+        index.name = INDEX
+        return pd.DataFrame(data, index=index)
+
+    def compact(self, cutoff):
+        """Delete the buckets that ended before the cutoff."""
+        cutoff = int(pd.Timestamp(cutoff).timestamp())
+        with self.db:
+            for tier, width in ROLLUP_TIERS.items():
+                self.db.execute(f'DELETE FROM "rollup_{tier}" WHERE "Bucket" + ? <= ?', (width, cutoff))
+
+
+storeTypes = {
+    'csv':    AppendLogStore,
+    'ring':   RingBufferStore,
+    'sqlite': SqliteStore,
+}
+
+def openStore(filepath, columns):
+    """
+    Open the right kind of store for a file.
+    :param filepath: path to the store, its suffix picks the type ('.csv', '.ring', '.sqlite')
+    :param columns: the column labels
+    """
+    return storeTypes[Path(filepath).suffix.lstrip('.')](filepath, columns)
+
+
+class DataBuffer:
+    """
+    This class manages a ring buffer of data stored in a CSV file. The buffer retains data for the last 3 days (72 hours) only.
+    It uses pandas DataFrame for efficient data handling and storage. As with the OCR class, this class is agnostic toward
+    the type of data being stored. It could be data from wind or wave panels. The user specifies the column labels and the class manages
+    the rest.  Records are appended to the file and the 3 day retention is applied by an occasional compaction.
+    The file can also be a memory-mapped ring buffer (.ring) or a SQLite database (.sqlite), it is picked by the
+    suffix of the file.
+    :param labels: List of strings for the column names. (usually just: `list[waveSources.keys()]` or `list[windSources.keys()]`)
+    :param filepath: Path to the CSV (or .ring, .sqlite) file.
+    """
+    def __init__(self, labels, filepath="sensor_data.csv"):
+        """
+        :param labels: List of strings for the column names.
+        :param filepath: Path to the CSV file.
+        """
+        self.filepath = filepath
+        self.columns = labels
+        self.store = openStore(filepath, labels)
+        self._rollups = None
+        self.df = None  # only read if someone asks for the data
+
+    @property
+    def rollups(self):
+        # opened when first needed, a reader of the raw records doesn't have to
+        if self._rollups is None:
+            self._rollups = RollupStore(rollupPath(self.filepath), self.columns)
+        return self._rollups
+
+    def add_record(self, newRowDF):
+        """
+        Appends a record (one row dataframe from BuoyDataCapture.getNewDFRecord) to the log.
+        :param newRowDF: dataframe indexed by the time of the reading.
+        """
+        self.add_records([newRowDF])
+
+    def add_records(self, newRowDFs, timeGuessed=None):
+        """
+        Appends the records of several panels (every source of a capture) in one go: one write (one transaction for
+        SQLite) and one look at the retention, however many records.
+        :param newRowDFs: list of dataframes indexed by the time of the reading.
+        :param timeGuessed: list of flags, one per dataframe, True where the time is made up (the panel's TimeStamp
+                            didn't read). Those are stored but not rolled up: the rollups take nothing older than
+                            the last record of a source, a made up time would keep the next real reading out.
+        """
+        if timeGuessed is None:
+            timeGuessed = [False] * len(newRowDFs)
+        kept = [(df, guess) for df, guess in zip(newRowDFs, timeGuessed) if len(df)]
+        if not kept:
+            return
+        newRowDFs = [df for df, _ in kept]
+        realRowDFs = [df for df, guess in kept if not guess]
+        # the log is kept in time order
+        newRowsDF = pd.concat(newRowDFs).sort_index(kind='stable')
+        self.store.append(newRowsDF)
+        if self.df is not None:
+            self.df = compactFrame(pd.concat([self.df, compactFrame(newRowsDF)]))
+        # only the buckets the new records fall in change (the first time, the history that's already stored is
+        # rolled up as well)
+        if realRowDFs:
+            self.rollups.add(self.store.read() if self.rollups.isEmpty() else pd.concat(realRowDFs))
+
+        # Maintain the 3-day ring buffer, but only once in a while.
+        oldest = self.store.oldest()
+        if oldest is not None and oldest < pd.Timestamp.now(tz=NY_TZ) - RETENTION - COMPACT_SLACK:
+            self.compact()
+
+    def compact(self):
+        """Truncates data older than 3 days and rewrites the file (persists through reboots)."""
+        cutoff_time = pd.Timestamp.now(tz=NY_TZ) - RETENTION
+        logging.info(f"Compacting {self.filepath}, dropping data older than {cutoff_time}")
+        self.store.compact(cutoff_time)
+        self.rollups.compact(cutoff_time)
+        self.df = None
+
+    def get_window(self, source, start=None, end=None, resolution='raw'):
+        """
+        One source's readings over a stretch of time.
+        :param source: station number (e.g. 44022)
+        :param start: tz aware time, only after this
+        :param end: tz aware time, only up to this
+        :param resolution: 'raw' for the records themselves or one of the ROLLUP_TIERS for their averages
+        :return: dataframe indexed by time (see RollupStore.window for the averages)
+        """
+        if resolution != 'raw':
+            return self.rollups.window(source, start, end, resolution)
+        df = self.get_data()
+        keep = df['Source'] == source
+        if start is not None:
+            keep &= df.index > start
+        if end is not None:
+            keep &= df.index <= end
+        return df[keep]
+
+    def get_data(self):
+        """Access the dataframe (the last 3 days, see compactFrame) for graphing or analysis."""
+        if self.df is None:
+            df = self.store.read()
+            self.df = compactFrame(df[df.index > pd.Timestamp.now(tz=NY_TZ) - RETENTION])
+        return self.df
+
+
+def _legacyLoad(filepath):
+    # how a csv buffer used to be loaded: float64 everywhere, Source and the times as python objects
+    df = pd.read_csv(filepath, index_col=0)
+    df.index = pd.to_datetime(df.index, utc=True).tz_convert(NY_TZ)
+    return df
+
+def _syntheticBuffer(filepath, labels, sources=(44022, 44040, 44039), period=pd.Timedelta(minutes=10)):
+    # a full buffer: every source captured every period for the whole retention (the 24hr max times filled in, they
+    # change every few hours like the real ones)
+    rng = np.random.default_rng(0)
+    times = pd.date_range(end=pd.Timestamp.now(tz=NY_TZ).floor('min'), periods=int(RETENTION / period), freq=period)
+    records = []
+    for source in sources:
+        df = pd.DataFrame({column: np.round(rng.uniform(0, 100, len(times)), 2) for column in labels
+                           if column not in (INDEX, 'Source') and not _isTimeColumn(column)}, index=times)
+        for column in labels:
+            if _isTimeColumn(column) and column != INDEX:
+                df[column] = times.floor('6h') - pd.Timedelta(hours=3)
+        df['Source'] = source
+        df.index.name = INDEX
+        records.append(df)
+    DataBuffer(labels, filepath).add_records(records)
+
+def profile(filepath, repeat=5):
+    """
+    Load a buffer the old way and the compact way and report the time and the memory each takes.
+    :param filepath: a csv store
+    """
+    def timed(load):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = load()
+            best = min(best, time.perf_counter() - start)
+        return df, best
+
+    with open(filepath) as f:
+        labels = f.readline().rstrip("\n").split(",")
+    before, beforeTime = timed(lambda: _legacyLoad(filepath))
+    after, afterTime = timed(lambda: DataBuffer(labels, filepath).get_data())
+    beforeMB = before.memory_usage(deep=True).sum() / 2**20
+    afterMB = after.memory_usage(deep=True).sum() / 2**20
+    print(f"{filepath}: {len(before)} records")
+    print(f"{'':>8} {'load ms':>9} {'memory MB':>10} {'columns':>8}")
+    print(f"{'before':>8} {beforeTime * 1000:9.1f} {beforeMB:10.3f} {before.shape[1]:8}")
+    print(f"{'after':>8} {afterTime * 1000:9.1f} {afterMB:10.3f} {after.shape[1]:8}")
+    print(f"memory {beforeMB / afterMB:.1f}x smaller, the load takes {afterTime / beforeTime:.2f}x the time")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="dataBuffer", description='Inspect the buoy data stores.')
+    parser.add_argument("--profile", help="Report the load time and memory of a csv store", action='store_true')
+    parser.add_argument("store", help=f"The store (default {storePath('wind', 'csv')})", nargs='?',
+                        default=storePath('wind', 'csv'))
+    parser.add_argument("--synthetic", help="Profile a full 3 day, 3 buoy buffer with the store's columns instead",
+                        action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.profile:
+        if args.synthetic:
+            with open(args.store) as f:
+                labels = f.readline().rstrip("\n").split(",")
+            with tempfile.TemporaryDirectory() as tmp:
+                _syntheticBuffer(Path(tmp) / "synthetic.csv", labels)
+                profile(Path(tmp) / "synthetic.csv")
+        else:
+            profile(args.store)
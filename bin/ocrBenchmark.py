@@ -0,0 +1,326 @@
+"""
+Benchmarks for the OCR pipeline, run against recorded panels.
+
+The panels are described by a json manifest (the same one `captureBuoyData.py --learn-glyphs` uses):
+    [{"image": "exrx_wx.png", "layout": "wind", "values": {"WindSpeedAvg [kts]": "12.3", ...}}, ...]
+Image paths are relative to the manifest.
+
+Every key of windSources/waveSources can be labelled (times as they're written on the panel, e.g.
+"10:15:00 AM, Mon Mar 2"), the ones left out aren't scored.
+
+    python3 ocrBenchmark.py preprocess [labels.json] [-n 50]
+        times readying the regions of a panel for OCR.
+    python3 ocrBenchmark.py ocr [labels.json] [-e glyph -e tesserocr] [--min-accuracy 0.98]
+        latency (p50/p95 per panel and per field), panels/sec and field accuracy for each OCR engine. Exits with
+        1 if an engine's accuracy is under --min-accuracy, so it can gate a change to the OCR.
+    python3 ocrBenchmark.py label panel.png [--layout wind] [--into labels.json]
+        OCRs a panel and prints a draft manifest entry to correct by hand (or, --into, copies the panel next to a
+        manifest and adds the draft to it marked "checked": false).
+    python3 ocrBenchmark.py synth [directory] [--seed 0]
+        renders synthetic panels with known values (and their manifest) into a directory.
+
+Two corpora:
+  resources/fixtures/recorded/  panels captured from the buoys with hand checked labels, the accuracy gate (the
+                                default corpus when it's there). Recording one: a live panel (the capture keeps
+                                the last one of each in resources/tmp/) is copied in and drafted with
+                                    python3 ocrBenchmark.py label ../resources/tmp/exrx_wx.png --layout wind --into ../resources/fixtures/recorded/labels.json
+                                and check every value in the new entry against the panel by eye. Entries still
+                                marked "checked": false are left out of the scoring, set it to true when they're
+                                right. Get a spread of buoys, times of day and values (calm, gusty, missing fields).
+  resources/fixtures/panels/    a small synthetic corpus (`synth`, seed 0), a smoke test that the runner, the
+                                engines and the layouts fit together. It's drawn with a font the panels don't use
+                                so its accuracy says little about the real thing.
+tests/test_ocrBenchmark.py runs both (the recorded one only if it's there).
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import captureBuoyData
+from captureBuoyData import BuoyDataCapture, windSources, waveSources
+from ocrEngines import engineTypes, closeOCREngines
+
+BASE_DIR = Path(__file__).resolve().parent
+FIXTURES = BASE_DIR.parent / "resources" / "fixtures" / "panels" / "labels.json"
+RECORDED = BASE_DIR.parent / "resources" / "fixtures" / "recorded" / "labels.json"
+# The 'sample' verification OCRs the derived fields on a random few captures, the runner always reads the same
+# fields so two runs over the same panels can be compared.
+DERIVE_VERIFY = 'range'
+
+layouts = {'wind': windSources, 'wave': waveSources}
+
+
+def loadCorpus(labelsFile):
+    """
+    Load the recorded panels. Drafts that haven't been checked by hand yet are left out.
+    :param labelsFile: path to the json manifest
+    :return: list of (manifest entry, BuoyDataCapture with the panel loaded)
+    """
+    labelsFile = Path(labelsFile)
+    with open(labelsFile) as f:
+        entries = json.load(f)
+    drafts = [entry['image'] for entry in entries if not entry.get('checked', True)]
+    if drafts:
+        logging.warning(f"{len(drafts)} panels in {labelsFile} aren't checked yet, leaving them out: {drafts}")
+    corpus = []
+    for entry in entries:
+        if not entry.get('checked', True):
+            continue
+        panel = BuoyDataCapture(entry['image'], layouts[entry['layout']], None)
+        panel.load_image(labelsFile.parent / entry['image'])
+        corpus.append((entry, panel))
+    return corpus
+
+def _timed(work, repeat):
+    # seconds per run of work(), best warm-up discarded
+    work()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        work()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+def benchPreprocess(corpus, repeat=50):
+    """
+    Time readying every region of every panel for OCR.
+    :return: array of seconds per panel
+    """
+    times = []
+    for entry, panel in corpus:
+        keys = list(panel.dataParts)
+        times.append(_timed(lambda: panel.preprocess_regions(keys), repeat))
+    ms = np.concatenate(times) * 1000
+    print(f"Preprocessing {len(corpus)} panels x {repeat} runs (ms per panel)")
+    print(f"{'p50':>8} {'p95':>8} {'mean':>8}")
+    print(f"{np.percentile(ms, 50):8.2f} {np.percentile(ms, 95):8.2f} {ms.mean():8.2f}")
+    return ms / 1000
+
+
+class _NoCache:
+    # stands in for the region cache, every read has to go to the engine
+    def key(self, *args):
+        return None
+    def get(self, key):
+        return None
+    def put(self, key, text):
+        pass
+
+def fieldCorrect(panel, key, label):
+    """
+    Does a decoded field match its label? Numbers to the label's last decimal, times to the minute.
+    """
+    value = panel[key]
+    kind = panel.ocrKind(key)
+    if kind == 'datelike':
+        expected = panel._parse_date(label)
+        return expected is not None and value is not None and abs((value - expected).total_seconds()) < 60
+    if kind == 'letterlike':
+        return str(value).strip() == label.strip()
+    decimals = len(label.split('.')[1]) if '.' in label else 0
+    return value == value and abs(value - float(label)) < 0.5 * 10.0 ** -decimals
+
+def _benchEngine(corpus, engine, repeat, kinds=None):
+    panelTimes, fieldTimes = [], []
+    right = scored = 0
+    wrong = {}
+    for _ in range(repeat):
+        for entry, recorded in corpus:
+            panel = BuoyDataCapture(recorded.sourceURL, recorded.dataParts, None, ocrEngine=engine)
+            panel.img = recorded.img
+            panel.regionCache = _NoCache()
+            keys = [key for key in entry['values'] if kinds is None or panel.ocrKind(key) in kinds]
+            start = time.perf_counter()
+            panel.extract_regions(only=keys if kinds is not None else None)
+            panelTimes.append(time.perf_counter() - start)
+            for key in keys:
+                label = entry['values'][key]
+                scored += 1
+                if fieldCorrect(panel, key, label):
+                    right += 1
+                else:
+                    wrong.setdefault(key, []).append((entry['image'], label, panel[key]))
+            # each field on its own too, for the per field latency
+            for key in keys:
+                start = time.perf_counter()
+                panel.extract_regions(only=[key])
+                fieldTimes.append(time.perf_counter() - start)
+    return {'panel': np.array(panelTimes), 'field': np.array(fieldTimes),
+            'accuracy': right / scored if scored else float('nan'), 'wrong': wrong}
+
+def benchOCR(corpus, engines, repeat=1, kinds=None):
+    """
+    Run every panel through the capture's OCR with each engine.
+    :param engines: engine names
+    :param kinds: only read and score these kinds of field ('numberlike', 'datelike', 'letterlike'), None for all
+    :return: {engine: {'panel': seconds per panel, 'field': seconds per field, 'accuracy': fraction, 'wrong': {...}}}
+             (None for an engine that couldn't run)
+    """
+    results = {}
+    configured = captureBuoyData.DERIVE_VERIFY
+    captureBuoyData.DERIVE_VERIFY = DERIVE_VERIFY
+    try:
+        for engine in engines:
+            try:
+                results[engine] = _benchEngine(corpus, engine, repeat, kinds)
+            except Exception as err:
+                print(f"{engine}: couldn't run ({err})")
+                results[engine] = None
+            closeOCREngines()
+    finally:
+        captureBuoyData.DERIVE_VERIFY = configured
+
+    print(f"OCR over {len(corpus)} panels x {repeat} runs")
+    print(f"{'engine':>12} {'panel p50':>10} {'panel p95':>10} {'field p50':>10} {'field p95':>10} {'panels/s':>9} {'accuracy':>9}")
+    for engine, r in results.items():
+        if r is None:
+            continue
+        panelMs, fieldMs = r['panel'] * 1000, r['field'] * 1000
+        print(f"{engine:>12} {np.percentile(panelMs, 50):10.1f} {np.percentile(panelMs, 95):10.1f} "
+              f"{np.percentile(fieldMs, 50):10.2f} {np.percentile(fieldMs, 95):10.2f} "
+              f"{len(panelMs) / r['panel'].sum():9.1f} {r['accuracy']:9.1%}")
+    return results
+
+def draftLabels(imagePath, layout, engine=None, into=None):
+    """
+    OCR a panel and print a manifest entry for it. Check every value against the panel by eye before using it!
+    :param into: a manifest to add the entry to (marked unchecked), the panel is copied next to it under a name
+                 with the time in it
+    """
+    imagePath = Path(imagePath)
+    if into is not None:
+        into = Path(into)
+        into.parent.mkdir(parents=True, exist_ok=True)
+        copy = into.parent / f"{imagePath.stem}_{time.strftime('%Y%m%d_%H%M%S')}{imagePath.suffix}"
+        shutil.copyfile(imagePath, copy)
+        imagePath = copy
+    panel = BuoyDataCapture(str(imagePath), layouts[layout], None, ocrEngine=engine)
+    panel.load_image(imagePath)
+    panel.extract_regions()
+    values = {}
+    for key, item in panel.dataParts.items():
+        value = item['value']
+        if panel.ocrKind(key) == 'datelike':
+            value = (value - captureBuoyData.timedelta(minutes=4)).strftime("%I:%M:%S %p, %a %b %d")
+        elif panel.ocrKind(key) == 'numberlike':
+            value = "" if value != value else f"{value:.{item['decpts'] or 0}f}"
+        values[key] = str(value)
+    entry = {'image': imagePath.name, 'layout': layout, 'values': values}
+    if into is not None:
+        entry['checked'] = False
+        entries = []
+        if into.exists():
+            with open(into) as f:
+                entries = json.load(f)
+        tmpFile = into.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(entries + [entry], f, indent=1, ensure_ascii=False)
+        os.replace(tmpFile, into)
+        print(f"Added {imagePath.name} to {into}, check its values and set \"checked\": true")
+    print(json.dumps(entry, indent=1, ensure_ascii=False))
+    closeOCREngines()
+
+def synthPanels(directory, seed=0):
+    """
+    Render a panel of each layout for each buoy with made up (but in range) values written in its fields, and the
+    manifest that goes with them. Derived fields are worked out from their canonical field like the real panels.
+    :param directory: where the panels and labels.json go
+    :param seed: for the values
+    :return: path of the manifest
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    font = ImageFont.truetype(str(Path(importlib.util.find_spec('matplotlib').origin).parent
+                                  / 'mpl-data' / 'fonts' / 'ttf' / 'DejaVuSans.ttf'), 13)
+    labels = []
+    for suffix, layout in (('wx', 'wind'), ('wav', 'wave')):
+        for tag, station in (('exrx', 44022), ('wlis', 44040), ('clis', 44039)):
+            image = Image.new('RGB', (640, 480), (230, 240, 255))
+            draw = ImageDraw.Draw(image)
+            values = {}
+            for key, item in layouts[layout].items():
+                kind = BuoyDataCapture.ocrKind(key)
+                decimals = item.get('decpts') or 0
+                if kind == 'datelike':
+                    text = f"{rng.randint(1, 12):02d}:{rng.randrange(0, 60, 10):02d}:00 AM, Mon Mar 2"
+                elif kind == 'letterlike':
+                    text = str(station)
+                elif key in captureBuoyData.derivedFields:
+                    canonicalKey, scale, offset = captureBuoyData.derivedFields[key]
+                    text = f"{float(values[canonicalKey]) * scale + offset:.{decimals}f}"
+                else:
+                    low, high = item.get('range') or (0, 30)
+                    text = f"{rng.uniform(max(low, 0), min(high, 99)):.{decimals}f}"
+                values[key] = text
+                left, upper = item['bounds'][:2]
+                draw.text((left + 2, upper + 2), text, fill=(0, 0, 0), font=font)
+            name = f"{tag}_{suffix}.png"
+            image.save(directory / name)
+            labels.append({'image': name, 'layout': layout, 'values': values})
+    labelsFile = directory / 'labels.json'
+    with open(labelsFile, 'w') as f:
+        json.dump(labels, f, indent=1, ensure_ascii=False)
+    return labelsFile
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="ocrBenchmark", description='Benchmarks for the buoy panel OCR.')
+    parser.add_argument("bench", help="What to benchmark (or 'label' a new panel, or 'synth' a corpus)",
+                        choices=['preprocess', 'ocr', 'label', 'synth'])
+    parser.add_argument("labels", help=f"Manifest of the panels (default {RECORDED} if it's there, else {FIXTURES}), "
+                                       "the panel for 'label', the directory for 'synth'", nargs='?')
+    parser.add_argument("-n", "--repeat", help="Runs per panel", type=int)
+    parser.add_argument("-e", "--engine", help="OCR engine to benchmark (repeat for several, default all)",
+                        choices=list(engineTypes), action='append')
+    parser.add_argument("--min-accuracy", help="Fail (exit 1) if an engine's field accuracy is below this (0..1)",
+                        type=float, default=0.0)
+    parser.add_argument("--layout", help="Panel layout for 'label'", choices=list(layouts), default='wind')
+    parser.add_argument("--into", help="Manifest for 'label' to add the panel to (unchecked)")
+    parser.add_argument("-v", "--verbose", help="List the fields read wrong", action='store_true')
+    parser.add_argument("--seed", help="Random seed for 'synth'", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench == 'label':
+        if args.labels is None:
+            parser.error("'label' needs the panel to draft")
+        draftLabels(args.labels, args.layout, (args.engine or [None])[0], args.into)
+        return 0
+    if args.bench == 'synth':
+        directory = Path(args.labels or FIXTURES)
+        print(f"Wrote {synthPanels(directory.parent if directory.suffix == '.json' else directory, args.seed)}")
+        return 0
+
+    corpus = loadCorpus(args.labels or (RECORDED if RECORDED.exists() else FIXTURES))
+    if args.bench == 'preprocess':
+        benchPreprocess(corpus, args.repeat or 50)
+        return 0
+
+    results = benchOCR(corpus, args.engine or list(engineTypes), args.repeat or 1)
+    failed = False
+    for engine, r in results.items():
+        if r is None:
+            failed = True
+            continue
+        if args.verbose:
+            for key, misses in r['wrong'].items():
+                for image, label, value in misses:
+                    print(f"  {engine}: {image} {key}: read {value!r}, label {label!r}")
+        if not r['accuracy'] >= args.min_accuracy:
+            print(f"{engine}: accuracy {r['accuracy']:.1%} is below {args.min_accuracy:.1%}")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+OCR back ends for the buoy panel capture.
+
+The original capture called `pytesseract.image_to_string` once per region. pytesseract is only a bridge to the
+tesseract CLI so every call launches a new process and reloads the language model. On the Pi that is most of the
+wall time for a capture (~19 launches for a wind panel). The engines here all answer the same question: "what text
+is in this little crop?" but differ in how they get there.
+
+    pytesseract -- the original path. One tesseract process per region. Kept for comparison.
+    tesserocr   -- one tesseract API handle (libtesseract via tesserocr) loaded once and reused for every region
+                   for the life of the process (a cron run or the daemon).
+    glyph       -- NumPy template matcher for the numeric fields. The UConn panels always use the same font at the
+                   same place so we can cut the digits apart and compare them against an atlas of known glyphs.
+                   Microseconds instead of tens of milliseconds. Anything it isn't sure of goes to tesseract.
+
+The per-region character whitelists still come from `BuoyDataCapture.ocrLimits` which are written as tesseract
+command line configs. The persistent engine translates them into API calls.
+"""
+import shlex
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# The bridge to the tesseract CLI. Need to install tesseract-ocr CLI engine in the OS
+import pytesseract
+
+# Direct binding to libtesseract. Optional, needs `apt install libtesseract-dev` then `pip install tesserocr` on the Pi.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Name of the engine used when nothing else is asked for.
+# (No atlas ships with the repo, until one is built the glyph engine hands every field to its tesserocr fallback.)
+DEFAULT_ENGINE = 'glyph'
+
+# Glyph atlas for the template engine (built with `captureBuoyData.py --learn-glyphs labels.json`)
+GLYPH_ATLAS = Path(__file__).resolve().parent.parent / "resources" / "glyphAtlas.npz"
+GLYPH_SIZE  = (16, 12)  # every glyph is scaled to this (rows, cols) before comparing
+NUMERIC_CHARACTERS = set('-0123456789.')
+
+
+def parseTesseractConfig(config):
+    """
+    Break a tesseract command line config (the style used in `ocrLimits`) into its parts.
+    :param config: string like r'--psm 6 -c tessedit_char_whitelist=-0123456789.'
+    :return: tuple of (page segmentation mode as int or None, dictionary of tesseract variables)
+    """
+    psm = None
+    variables = {}
+    # shlex takes care of the escaped spaces ('\ ') in the whitelists.
+    tokens = shlex.split(config)
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == '--psm' and i + 1 < len(tokens):
+            psm = int(tokens[i + 1])
+            i += 2
+        elif tokens[i] == '-c' and i + 1 < len(tokens):
+            name, _, value = tokens[i + 1].partition('=')
+            variables[name] = value
+            i += 2
+        else:
+            logging.warning(f"Ignoring unrecognized tesseract option '{tokens[i]}'")
+            i += 1
+    return psm, variables
+
+
+class OCREngine:
+    """
+    Base class for the OCR back ends. An engine turns a (preprocessed) image crop into text.
+    :param name: short tag used on the command line and in the logs.
+    """
+    name = 'base'
+
+    def image_to_string(self, image, config):
+        """
+        Decode the text in an image.
+        :param image: PIL image of a single region.
+        :param config: tesseract style config string (see `BuoyDataCapture.ocrLimits`).
+        :return: decoded text (not stripped).
+        """
+        raise NotImplementedError
+
+    def recognize(self, image, config):
+        """
+        Decode the text in an image and say how sure we are of it.
+        :return: (decoded text, confidence 0..100 or None if the engine can't tell)
+        """
+        return self.image_to_string(image, config), None
+
+    def close(self):
+        """Release anything the engine is holding on to."""
+        pass
+
+
+class PyTesseractEngine(OCREngine):
+    """
+    The original path: hand every crop to the tesseract CLI through pytesseract.
+    One process launch and model load per region.
+    """
+    name = 'pytesseract'
+
+    def image_to_string(self, image, config):
+        return pytesseract.image_to_string(image, config=config)
+
+    def recognize(self, image, config):
+        # the same single launch, but asking for the words with their confidences
+        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+        words = [(text, float(conf)) for text, conf in zip(data['text'], data['conf']) if float(conf) >= 0 and text.strip()]
+        if not words:
+            return "", 0.0
+        return " ".join(text for text, _ in words), min(conf for _, conf in words)
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Keeps a single tesseract API handle loaded and runs every region against it. The model is loaded once
+    when the engine is built so the per-region cost is just the recognition itself.
+    :param lang: tesseract language to load.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng'):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+        self._parsed = {}    # config string -> (psm, variables), the same handful of configs are used over and over
+        self._current = {}   # variables currently set on the handle so we don't reset them for every region
+
+    def _configure(self, config):
+        if config not in self._parsed:
+            self._parsed[config] = parseTesseractConfig(config)
+        psm, variables = self._parsed[config]
+        if psm is not None:
+            self.api.SetPageSegMode(psm)
+        for name, value in variables.items():
+            if self._current.get(name) != value:
+                self.api.SetVariable(name, value)
+                self._current[name] = value
+
+    def image_to_string(self, image, config):
+        self._configure(config)
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def recognize(self, image, config):
+        text = self.image_to_string(image, config)
+        return text, float(self.api.MeanTextConf())
+
+    def close(self):
+        self.api.End()
+
+
+def binarizeGlyphs(image):
+    """
+    Turn a crop into a boolean 'ink' mask. The threshold sits half way between the darkest and lightest pixel
+    which is plenty for these flat coloured panels. Text is whatever is in the minority.
+    :param image: PIL image of a single region.
+    :return: 2D boolean array, True where there is ink.
+    """
+    gray = np.asarray(image.convert('L'), dtype=np.int16)
+    lo, hi = gray.min(), gray.max()
+    if hi - lo < 32:
+        return np.zeros(gray.shape, dtype=bool)  # nothing written here
+    ink = gray < (lo + hi) // 2
+    if ink.mean() > 0.5:
+        ink = ~ink  # light text on a dark background
+    return ink
+
+def segmentGlyphs(ink):
+    """
+    Cut a line of text into characters by column projection: columns with no ink separate the glyphs.
+    :param ink: boolean mask from binarizeGlyphs
+    :return: list of (glyph mask trimmed to its ink, top row, bottom row) and the (top, bottom) of the whole line.
+    """
+    rows = np.flatnonzero(ink.any(axis=1))
+    if len(rows) == 0:
+        return [], (0, 0)
+    columns = np.r_[0, ink.any(axis=0).astype(np.int8), 0]
+    edges = np.flatnonzero(np.diff(columns))
+    glyphs = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        piece = ink[:, start:stop]
+        used = np.flatnonzero(piece.any(axis=1))
+        glyphs.append((piece[used[0]:used[-1] + 1], used[0], used[-1] + 1))
+    return glyphs, (rows[0], rows[-1] + 1)
+
+def normalizeGlyph(glyph):
+    """
+    Scale a glyph mask to GLYPH_SIZE (nearest neighbour, pure index arithmetic).
+    :return: float32 array of GLYPH_SIZE
+    """
+    h, w = glyph.shape
+    rows = (np.arange(GLYPH_SIZE[0]) * h // GLYPH_SIZE[0])
+    cols = (np.arange(GLYPH_SIZE[1]) * w // GLYPH_SIZE[1])
+    return glyph[np.ix_(rows, cols)].astype(np.float32)
+
+
+class GlyphTemplateEngine(OCREngine):
+    """
+    Template matching recognizer for the numeric (`numberlike`) fields. Each field is binarized, split into glyphs
+    by column projection and every glyph is compared against the atlas. The decimal point and minus sign are told
+    apart from the digits by their size and position on the line. If any glyph matches poorly (or the config isn't
+    numeric, or there is no atlas yet) the crop goes to the fallback engine instead.
+    :param atlasPath: where the glyph atlas is kept, GLYPH_ATLAS if None.
+    :param fallback: name of the engine used when we aren't confident.
+    :param minScore: lowest acceptable match score (0..1) for the worst glyph in a field.
+    """
+    name = 'glyph'
+
+    def __init__(self, atlasPath=None, fallback=TesserocrEngine.name, minScore=0.85):
+        self.atlasPath = Path(atlasPath if atlasPath is not None else GLYPH_ATLAS)
+        self.fallbackName = fallback
+        self.minScore = minScore
+        self._fallback = None   # only built if we ever need it, that keeps tesseract off the hot path
+        self._numeric = {}      # config string -> is it a numbers only whitelist?
+        self.hits = 0
+        self.misses = 0
+        # running sums so the atlas can keep learning from more labelled crops
+        self._sums = {}
+        self._counts = {}
+        self._aspects = {}
+        if self.atlasPath.exists():
+            with np.load(self.atlasPath) as atlas:
+                for char, total, count, aspect in zip(atlas['chars'], atlas['sums'], atlas['counts'], atlas['aspects']):
+                    self._sums[str(char)] = total
+                    self._counts[str(char)] = int(count)
+                    self._aspects[str(char)] = float(aspect)
+        else:
+            logging.info(f"No glyph atlas at {self.atlasPath}, every field goes to '{fallback}'")
+        self._buildTemplates()
+
+    def _buildTemplates(self):
+        self.chars = sorted(self._sums)
+        if self.chars:
+            self.templates = np.stack([self._sums[c] / self._counts[c] for c in self.chars])
+            self.aspects = np.array([self._aspects[c] / self._counts[c] for c in self.chars], dtype=np.float32)
+
+    @property
+    def fallback(self):
+        if self._fallback is None:
+            self._fallback = getOCREngine(self.fallbackName)
+        return self._fallback
+
+    def _isNumeric(self, config):
+        if config not in self._numeric:
+            _, variables = parseTesseractConfig(config)
+            whitelist = variables.get('tessedit_char_whitelist', '')
+            self._numeric[config] = bool(whitelist) and set(whitelist) <= NUMERIC_CHARACTERS
+        return self._numeric[config]
+
+    def _classify(self, glyph, top, bottom, line):
+        """
+        Identify a single glyph.
+        :return: (character, score)
+        """
+        lineTop, lineBottom = line
+        lineHeight = lineBottom - lineTop
+        h, w = glyph.shape
+        if h < 0.35 * lineHeight:
+            # too short to be a digit. Sitting on the baseline it's a decimal point, floating it's a minus.
+            if bottom >= lineBottom - 0.2 * lineHeight:
+                return '.', 1.0
+            if w > h:
+                return '-', 1.0
+            return '', 0.0
+        candidate = normalizeGlyph(glyph)
+        # mean absolute difference against every template in one go, then nudge by how well the shape's aspect fits
+        scores = 1.0 - np.abs(self.templates - candidate).mean(axis=(1, 2))
+        scores -= 0.25 * np.abs(np.log((w / h) / self.aspects))
+        best = int(np.argmax(scores))
+        return self.chars[best], float(scores[best])
+
+    def match(self, image):
+        """
+        Read a numeric field with the templates.
+        :param image: PIL image of a single region.
+        :return: (text, score of the worst glyph). Text is None if there was nothing to read.
+        """
+        glyphs, line = segmentGlyphs(binarizeGlyphs(image))
+        if not glyphs:
+            return None, 0.0
+        text = []
+        worst = 1.0
+        for glyph, top, bottom in glyphs:
+            char, score = self._classify(glyph, top, bottom, line)
+            text.append(char)
+            worst = min(worst, score)
+        return "".join(text), worst
+
+    def image_to_string(self, image, config):
+        if self.chars and self._isNumeric(config):
+            text, score = self.match(image)
+            if text is not None and score >= self.minScore:
+                self.hits += 1
+                return text
+            logging.debug(f"glyph match '{text}' score {score:0.3f} too low, asking '{self.fallbackName}'")
+        self.misses += 1
+        return self.fallback.image_to_string(image, config)
+
+    def recognize(self, image, config):
+        # the worst glyph's score is our confidence
+        if self.chars and self._isNumeric(config):
+            text, score = self.match(image)
+            if text is not None and score >= self.minScore:
+                self.hits += 1
+                return text, 100.0 * score
+        self.misses += 1
+        return self.fallback.recognize(image, config)
+
+    def learn(self, image, text):
+        """
+        Add a labelled crop to the atlas. The crop is only used if it splits into exactly as many glyphs as
+        there are characters in the label.
+        :param image: PIL image of a single region (preprocessed the same way it will be when reading).
+        :param text: the true contents of the region, e.g. '12.3'
+        :return: True if the crop was used.
+        """
+        glyphs, line = segmentGlyphs(binarizeGlyphs(image))
+        if len(glyphs) != len(text):
+            logging.warning(f"'{text}' split into {len(glyphs)} glyphs, skipping")
+            return False
+        for (glyph, top, bottom), char in zip(glyphs, text):
+            if not char.isdigit():
+                continue  # '.' and '-' are recognized by their geometry
+            h, w = glyph.shape
+            self._sums[char] = self._sums.get(char, 0.0) + normalizeGlyph(glyph)
+            self._counts[char] = self._counts.get(char, 0) + 1
+            self._aspects[char] = self._aspects.get(char, 0.0) + w / h
+        self._buildTemplates()
+        return True
+
+    def save(self, atlasPath=None):
+        """Write the atlas out so the next run can use it."""
+        if not self.chars:
+            raise ValueError("No glyphs learned, there is no atlas to save")
+        atlasPath = Path(atlasPath) if atlasPath is not None else self.atlasPath
+        np.savez(atlasPath,
+                 chars=np.array(self.chars),
+                 sums=np.stack([self._sums[c] for c in self.chars]),
+                 counts=np.array([self._counts[c] for c in self.chars]),
+                 aspects=np.array([self._aspects[c] for c in self.chars]))
+        logging.info(f"Glyph atlas with {len(self.chars)} characters saved to {atlasPath}")
+
+
+engineTypes = {
+    PyTesseractEngine.name:   PyTesseractEngine,
+    TesserocrEngine.name:     TesserocrEngine,
+    GlyphTemplateEngine.name: GlyphTemplateEngine,
+}
+
+# Engines are expensive to build (that's the point) so we keep one of each for the life of the process.
+# A tesseract handle can only work on one image at a time so each OCR worker thread gets its own set.
+_threadEngines = threading.local()
+_allEngines = []
+
+def getOCREngine(name=DEFAULT_ENGINE):
+    """
+    Fetch (building on first use) the calling thread's engine with the given name. If the persistent engine
+    can't be loaded we fall back to pytesseract so a capture still happens.
+    :param name: one of `engineTypes`.
+    :return: an OCREngine
+    """
+    if not hasattr(_threadEngines, 'engines'):
+        _threadEngines.engines = {}
+    _engines = _threadEngines.engines
+    if name not in _engines:
+        try:
+            _engines[name] = engineTypes[name]()
+            _allEngines.append(_engines[name])
+        except ImportError as err:
+            logging.warning(f"OCR engine '{name}' unavailable ({err}), falling back to '{PyTesseractEngine.name}'")
+            _engines[name] = getOCREngine(PyTesseractEngine.name)
+            return _engines[name]
+        logging.info(f"OCR engine '{name}' loaded")
+    return _engines[name]
+
+def closeOCREngines():
+    """Shut down every engine we built (in any thread)."""
+    for engine in _allEngines:
+        engine.close()
+    _allEngines.clear()
+    _threadEngines.engines = {}
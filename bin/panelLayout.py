@@ -0,0 +1,160 @@
+"""
+Keeps the field boxes lined up with the panel.
+
+The `bounds` in windSources/waveSources are pixel boxes on the 640x480 panel. If UConn moves things around every
+capture happily OCRs the wrong pixels. Here every panel gets a fingerprint of its static layout (labels, borders,
+everything except the data fields) and it is compared with the one we have on file: in the common case that is
+all it costs. When the fingerprint drifts the panel is aligned against a reference copy (phase correlation on the
+FFT finds the shift) and the shifted boxes are cached until the layout moves again.
+
+Only a shift of the whole layout is handled, a panel that is re-scaled or re-arranged needs new bounds by hand.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent
+LAYOUT_DIR = BASE_DIR.parent / "resources" / "tmp" / "layouts"
+
+HASH_SIZE = (60, 80)     # (rows, cols) of the difference hash, 8 pixel cells so a shift of a few pixels shows
+TOLERANCE = 0.08         # fraction of the hash bits allowed to differ before we call it a new layout
+MASK_MARGIN = 3          # pixels around each field box left out of the fingerprint
+MIN_PEAK = 0.05          # weakest phase correlation peak we believe
+
+
+def layoutHash(gray, boxes):
+    """
+    Difference hash of the static parts of a panel. The field boxes are blanked out first so the readings don't
+    change the hash, then the panel is shrunk to HASH_SIZE and each pixel compared with its right hand neighbour.
+    :param gray: the panel as a 2D uint8 array
+    :param boxes: (left, upper, right, lower) of the fields
+    :return: hash as a hex string
+    """
+    static = gray.copy()
+    for left, upper, right, lower in boxes:
+        static[max(upper - MASK_MARGIN, 0):max(lower + MASK_MARGIN, 0),
+               max(left - MASK_MARGIN, 0):max(right + MASK_MARGIN, 0)] = 255
+    small = np.asarray(Image.fromarray(static).resize((HASH_SIZE[1] + 1, HASH_SIZE[0]), Image.BOX), dtype=np.int16)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+
+def hashDistance(a, b):
+    """:return: fraction of the bits that differ between two hashes"""
+    bits = np.unpackbits(np.frombuffer(bytes.fromhex(a), dtype=np.uint8) ^ np.frombuffer(bytes.fromhex(b), dtype=np.uint8))
+    return bits.mean()
+
+def phaseShift(reference, panel):
+    """
+    Find how far the panel has moved relative to the reference with phase correlation: the normalized cross
+    power spectrum of the two images transforms back to a single peak at the shift.
+    :param reference: 2D array
+    :param panel: 2D array, same shape
+    :return: (dx, dy, peak strength 0..1)
+    """
+    def edges(image):
+        # the edges of the labels and borders line up better than the flat colours
+        image = image.astype(np.float32)
+        gy, gx = np.gradient(image)
+        magnitude = np.hypot(gx, gy)
+        window = np.outer(np.hanning(image.shape[0]), np.hanning(image.shape[1]))
+        return (magnitude - magnitude.mean()) * window
+
+    spectrum = np.fft.rfft2(edges(panel)) * np.conj(np.fft.rfft2(edges(reference)))
+    spectrum /= np.abs(spectrum) + 1e-9
+    correlation = np.fft.irfft2(spectrum, s=reference.shape)
+    dy, dx = np.unravel_index(np.argmax(correlation), correlation.shape)
+    peak = float(correlation[dy, dx])
+    # past half way round is a shift the other way
+    if dy > reference.shape[0] // 2:
+        dy -= reference.shape[0]
+    if dx > reference.shape[1] // 2:
+        dx -= reference.shape[1]
+    return int(dx), int(dy), peak
+
+
+class LayoutRegistry:
+    """
+    Fingerprints and reference copies of each panel's layout, and the shift found for it.
+    The first panel we see from a URL is taken as the reference (the hand made bounds are trusted for it).
+    :param layoutDir: where the state and the reference panels are kept.
+    """
+    def __init__(self, layoutDir=LAYOUT_DIR):
+        self.layoutDir = Path(layoutDir)
+        self.layoutDir.mkdir(parents=True, exist_ok=True)
+        self.stateFile = self.layoutDir / "layouts.json"
+        self.state = {}
+        try:
+            with open(self.stateFile) as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            logging.warning(f"Layout state {self.stateFile} is corrupt, starting fresh")
+
+    def _referenceFile(self, url):
+        return self.layoutDir / (url.rstrip('/').split('/')[-1].replace('.png', '') + "_reference.png")
+
+    def register(self, url, img, boxes):
+        """
+        Check a panel's layout and find the shift to apply to its field boxes.
+        :param url: the panel's source URL (each panel has its own reference)
+        :param img: the (640x480) panel
+        :param boxes: the hand made field boxes
+        :return: (dx, dy) to add to every box
+        """
+        gray = np.asarray(img.convert('L'))
+        known = self.state.get(url)
+        if known is None:
+            Image.fromarray(gray).save(self._referenceFile(url))
+            self.state[url] = {'offset': [0, 0], 'hash': layoutHash(gray, boxes)}
+            logging.info(f"Layout reference for {url} saved")
+            self.save()
+            return 0, 0
+
+        dx, dy = known['offset']
+        fingerprint = layoutHash(gray, _shifted(boxes, dx, dy))
+        drift = hashDistance(fingerprint, known['hash'])
+        if drift <= TOLERANCE:
+            return dx, dy
+
+        # The layout moved. Line the panel up with the reference.
+        logging.warning(f"Layout of {url} has changed ({drift:.0%} of the fingerprint), re-registering")
+        with Image.open(self._referenceFile(url)) as reference:
+            reference = np.asarray(reference.convert('L'))
+        if reference.shape != gray.shape:
+            logging.error(f"Panel {url} is {gray.shape}, the reference is {reference.shape}, can't register")
+            return dx, dy
+        shiftX, shiftY, peak = phaseShift(reference, gray)
+        if peak < MIN_PEAK:
+            logging.error(f"Couldn't line up {url} with its reference (peak {peak:.3f}), keeping the old boxes")
+            return dx, dy
+        # moved back by the shift the panel should look like the reference again
+        restored = np.roll(gray, (-shiftY, -shiftX), axis=(0, 1))
+        if hashDistance(layoutHash(restored, boxes), layoutHash(reference, boxes)) > TOLERANCE:
+            logging.error(f"{url} shifted by ({shiftX}, {shiftY}) still doesn't match its reference, keeping the old boxes")
+            return dx, dy
+        logging.info(f"{url} field boxes now shifted by ({shiftX}, {shiftY})")
+        self.state[url] = {'offset': [shiftX, shiftY], 'hash': layoutHash(gray, _shifted(boxes, shiftX, shiftY))}
+        self.save()
+        return shiftX, shiftY
+
+    def save(self):
+        tmpFile = self.stateFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmpFile, self.stateFile)
+
+
+def _shifted(boxes, dx, dy):
+    return [(left + dx, upper + dy, right + dx, lower + dy) for left, upper, right, lower in boxes]
+
+_registry = None
+
+def getLayoutRegistry():
+    global _registry
+    if _registry is None:
+        _registry = LayoutRegistry()
+    return _registry
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""
+A local stand-in for the UConn panel server (clydebank.dms.uconn.edu). Serves recorded panels out of a
+directory with ETag and Last-Modified headers and answers conditional GETs with '304 Not Modified' just
+like the real thing. Handy for exercising the capture without hammering (or depending on) their server:
+
+    python3 panelServer.py -d ../resources/fixtures/panels &
+    python3 captureBuoyData.py -z -w -s all --base-url http://localhost:8001
+
+The panels in the directory need the same names as on the real server (exrx_wx.png, wlis_wav.png, ...).
+Touch or replace a file to make it look like a new panel was published.
+"""
+import os
+import argparse
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class PanelRequestHandler(SimpleHTTPRequestHandler):
+    """
+    SimpleHTTPRequestHandler already does Last-Modified/If-Modified-Since. This adds ETag/If-None-Match.
+    """
+    _etag = None
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self._etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get('If-None-Match') == self._etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def end_headers(self):
+        if self._etag is not None:
+            self.send_header('ETag', self._etag)
+            self._etag = None
+        super().end_headers()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="panelServer", description='Serve recorded buoy panels like the UConn server does.')
+    parser.add_argument("-p", "--port", help="port to listen on", type=int, default=8001)
+    parser.add_argument("-d", "--directory", help="directory of recorded panels",
+                        default=BASE_DIR.parent / "resources" / "fixtures" / "panels")
+    args = parser.parse_args()
+
+    handler = partial(PanelRequestHandler, directory=str(args.directory))
+    with ThreadingHTTPServer(('localhost', args.port), handler) as server:
+        print(f"Serving panels from {args.directory} on http://localhost:{args.port}")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main()
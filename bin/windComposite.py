@@ -0,0 +1,167 @@
+"""
+The "best available" wind series the wind graph is drawn from.
+
+The graph used to show Execution Rocks only and, once that was more than 5 hours old, windGraph.py started a
+second process that went off to the NDBC for Kings Point (KPTN6) instead. Now every wind capture lines up what we
+have from all three buoys and from KPTN6 on one 15 minute grid: each grid point takes the freshest valid reading
+(no older than TOLERANCE) from any of them, and remembers where it came from (Origin) and when it was taken
+(ObservedAt). Readings taken within the last grid step all count as fresh, so that the series doesn't flit from
+buoy to buoy with every capture: of those the first of ORIGINS wins. The graph reads that one series, whichever
+buoys happen to be working.
+"""
+import logging
+import os
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dataBuffer import INDEX, NY_TZ, RETENTION, pathToResources
+
+COMPOSITE_FILE = pathToResources / "wind_composite.csv"
+
+# The NDBC's realtime feed for Kings Point, 6 minute readings, newest first (the same one windGraphNWS.py reads)
+NDBC_URL = 'https://www.ndbc.noaa.gov/data/realtime2/KPTN6.txt'
+NDBC_COPY = pathToResources / "tmp" / "KPTN6.txt"
+NDBC_ROWS = 800  # ~3 days of it
+
+GRID = '15min'                         # one composite reading per
+TOLERANCE = pd.Timedelta(minutes=30)   # a reading older than this doesn't count for a grid point
+
+# Where a reading can come from (the OCR'd buoys by station number) in order of preference when two are as fresh
+ORIGINS = {
+    'exrx':  44022,
+    'wlis':  44040,
+    'clis':  44039,
+    'KPTN6': None,
+}
+ORIGIN_NAMES = {'exrx': "Execution Rocks", 'wlis': "Western LI Sound", 'clis': "Central LI Sound",
+                'KPTN6': "Kings Point (NDBC)"}
+
+COLUMNS = ['WindSpeedAvg [kts]', 'WindSpeedGst [kts]', 'WindDir [°]', 'AirTemp [°F]']
+MS_TO_KTS = 1 / 0.514444
+
+
+def ndbcReadings(content):
+    """
+    The NDBC realtime text feed as our columns.
+    :param content: the feed (bytes)
+    :return: dataframe indexed by time (New York) with COLUMNS
+    """
+    df = pd.read_csv(BytesIO(content), sep=r"\s+", header=[0, 1], na_values='MM', nrows=NDBC_ROWS)
+    df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns={'#YY': 'YY'})
+    times = pd.to_datetime(df[['YY', 'MM', 'DD', 'hh', 'mm']].astype(str).agg('-'.join, axis=1), format='%Y-%m-%d-%H-%M')
+    readings = pd.DataFrame({
+        'WindSpeedAvg [kts]': df['WSPD'] * MS_TO_KTS,
+        'WindSpeedGst [kts]': df['GST'] * MS_TO_KTS,
+        'WindDir [°]':        df['WDIR'],
+        'AirTemp [°F]':       df['ATMP'] * 9 / 5 + 32,
+    })
+    readings.index = pd.DatetimeIndex(times).tz_localize('UTC').tz_convert(NY_TZ)
+    readings.index.name = INDEX
+    return readings.sort_index()
+
+def _fetchNDBC():
+    # (only the capture fetches, the graph just reads the composite and doesn't need requests loaded)
+    # :return: (the readings or None, True if the feed changed since the last fetch)
+    import requests
+    from captureCache import getFetcher
+    try:
+        content, modified = getFetcher().fetch(NDBC_URL, NDBC_COPY)
+        return ndbcReadings(content), modified
+    except (requests.RequestException, OSError, ValueError, KeyError) as err:
+        logging.warning(f"No {NDBC_URL} for the composite wind series: {err}")
+        return None, False
+
+def _nanoseconds(times):
+    # New York times at ns resolution, merge_asof wants both sides alike. pandas 2 keeps the seconds the epoch
+    # stores hand it, pandas 1.5 (the Pi's apt package) only has ns and no as_unit(), this works on either.
+    utc = np.asarray(pd.DatetimeIndex(times).tz_convert('UTC').tz_localize(None), dtype='datetime64[ns]')
+    return pd.DatetimeIndex(utc).tz_localize('UTC').tz_convert(NY_TZ)
+
+def fuse(readings, end, span=RETENTION):
+    """
+    Line the sources up on the GRID and take the freshest valid reading at each point (anything from the last grid
+    step is fresh, the preferred origin wins among those).
+    :param readings: {origin: dataframe of COLUMNS indexed by time} in order of preference
+    :param end: the last grid point is at or before this
+    :param span: how far back the grid goes
+    :return: dataframe indexed by grid time with COLUMNS, Origin and ObservedAt (grid points nobody covers are left out)
+    """
+    grid = pd.DataFrame(index=_nanoseconds(pd.date_range(end=end.floor(GRID), periods=int(span / pd.Timedelta(GRID)),
+                                                         freq=GRID)).rename(INDEX))
+    best = None
+    for origin, df in readings.items():
+        if df is None or not len(df):
+            continue
+        df = df.reindex(columns=COLUMNS).astype(np.float64)
+        # a reading without a speed and a direction is no use to the graph
+        df = df[df['WindSpeedAvg [kts]'].between(0, 100) & df['WindDir [°]'].between(0, 360)]
+        df.index = _nanoseconds(df.index)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        df['ObservedAt'] = df.index
+        aligned = pd.merge_asof(grid, df, left_index=True, right_index=True, direction='backward', tolerance=TOLERANCE)
+        aligned['Origin'] = np.where(aligned['ObservedAt'].notna(), origin, None)
+        if best is None:
+            best = aligned
+            continue
+        # a later origin only takes over with a recent reading where we have none, or a fresher one where neither is
+        recent = grid.index - aligned['ObservedAt'] <= pd.Timedelta(GRID)
+        bestRecent = grid.index - best['ObservedAt'] <= pd.Timedelta(GRID)
+        takeOver = aligned['ObservedAt'].notna() & (best['ObservedAt'].isna() | (recent & ~bestRecent) |
+                                                    (~recent & ~bestRecent & (aligned['ObservedAt'] > best['ObservedAt'])))
+        best[takeOver.to_numpy()] = aligned[takeOver.to_numpy()]
+    if best is None:
+        return pd.DataFrame(columns=COLUMNS + ['Origin', 'ObservedAt'], index=grid.index[:0])
+    return best[best['Origin'].notna()]
+
+def updateComposite(windHistory, compositeFile=COMPOSITE_FILE, panelsChanged=True):
+    """
+    Rebuild the composite wind series after a capture. If no wind panel had anything new and the NDBC says Kings
+    Point hasn't changed (a 304) there's nothing new to put in it and it's left as it is.
+    :param windHistory: the wind store's records (DataBuffer.get_data()), or a function returning them (only called
+                        if the series is rebuilt)
+    :param compositeFile: where the series is kept
+    :param panelsChanged: False if none of the wind panels changed this capture
+    :return: the composite series, None if it was left as it was
+    """
+    compositeFile = Path(compositeFile)
+    kingsPoint, kingsPointChanged = _fetchNDBC()
+    if not panelsChanged and not kingsPointChanged and compositeFile.exists():
+        logging.info("Nothing new for the composite wind series, leaving it as it is")
+        return None
+    if callable(windHistory):
+        windHistory = windHistory()
+    readings = {}
+    for origin, station in ORIGINS.items():
+        if station is None:
+            readings[origin] = kingsPoint
+        elif 'Source' in windHistory:
+            readings[origin] = windHistory[windHistory['Source'] == station]
+    composite = fuse(readings, pd.Timestamp.now(tz=NY_TZ))
+    # the direction components, so the graph can average directions
+    composite['WdirSin'] = np.sin(np.radians(composite['WindDir [°]'].astype(np.float64)))
+    composite['WdirCos'] = np.cos(np.radians(composite['WindDir [°]'].astype(np.float64)))
+    used = composite['Origin'].value_counts()
+    logging.info(f"Composite wind series: {len(composite)} readings, " + ", ".join(f"{o}: {n}" for o, n in used.items()))
+
+    tmpFile = compositeFile.with_suffix('.tmp')
+    composite.to_csv(tmpFile, float_format='%.7g')
+    os.replace(tmpFile, compositeFile)
+    return composite
+
+def readComposite(compositeFile=COMPOSITE_FILE, start=None):
+    """
+    The composite wind series as updateComposite left it.
+    :param start: tz aware time, only after this
+    :return: dataframe indexed by grid time (New York)
+    """
+    df = pd.read_csv(compositeFile, index_col=0)
+    df.index = pd.to_datetime(df.index, utc=True).tz_convert(NY_TZ)
+    df.index.name = INDEX
+    df['ObservedAt'] = pd.to_datetime(df['ObservedAt'], utc=True).dt.tz_convert(NY_TZ)
+    if start is not None:
+        df = df[df.index > start]
+    return df
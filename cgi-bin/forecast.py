@@ -3,6 +3,7 @@ import os
 import sys
 
 from html.parser import HTMLParser
+from renderCache import RenderCache, inputKey, HIT_MISS
 
 import logging
 from pathlib import Path
@@ -210,67 +211,75 @@ if __name__ == '__main__':
     # url of marine forecast in our area
     url = 'https://www.ndbc.noaa.gov/data/Forecasts/FZUS51.KOKX.html'
 
-    # creating HTTP response object from given url
-    parser = MarineHTMLParser()
-
     import urllib.request
     with urllib.request.urlopen(url) as resp:
-        parser.feed(resp.read().decode("utf-8"))
-
-    """
-    The first record is special, it contains general information about the region
-    """
-    # 'ANZ335': 'Long Island Sound West of New Haven CT/Port Jefferson NY'
-    logging.info(parser.forecasts.keys())
-    ourForcasts = parser.forecasts['ANZ335']
-    logging.info(ourForcasts['locale']) # Official designation for covered area
-    logging.info(ourForcasts['datetime']) # Short version of location
-    if 'warning' in ourForcasts:
-      logging.info(ourForcasts['warning']) # Reason for following forecasts
-
-    """
-    The subsequent records follow the pattern of REGION and a sequence of
-    Times and Advisories
-    """
-    # To
-#    for j in range(len(parser.forecasts)):
-
-    try:
-        specialWarning = ourForcasts['warning']
-    except:
-        specialWarning = ""
-
-    # Off. designation for covered area
-    titleArea = f'''
-        <p class="where">{ourForcasts['locale']}</p>
-        <p class="when">{ourForcasts['datetime']}</p>
-        '''
-    forecastBox = []
-    for i in range(min([6, len(ourForcasts['days'])-1])):
-        logging.info(ourForcasts['days']) # Short version of location
-
-        # tmeidx = f"TIME{i+1:02d}"
-        # advidx = f"ADVISORY{i+1:02d}"
-        forecastBox.append(f'''
-                <p class="what">{ourForcasts['days'][i][0]}</h3>
-                <p class="how" >{ourForcasts['days'][i][1]}</p>
-            ''')
+        payload = resp.read()
 
     #open and read the template file
     with open(pathToResources / templateFile, "r") as template:
         templateHtml = template.readlines()
 
-    # Title Information
-    templateHtml = ("".join(templateHtml)).replace('<!--Forecast Title-->', titleArea)
-    # Forecast Boxes
-    for i in range(len(forecastBox)):
-        templateHtml = templateHtml.replace(f'<!--Forecast Box_{i}-->', forecastBox[i])
-
-    templateHtml = templateHtml.replace('<!--Special Warning-->', specialWarning)
-
-    # copy the html table into the text and write out a new file
-    with open(pathToImages / forecastFile, "w") as htmlFile:
-        htmlFile.write(templateHtml)
-
+    def writeForecast():
+        # creating HTTP response object from given url
+        parser = MarineHTMLParser()
+        parser.feed(payload.decode("utf-8"))
+
+        """
+        The first record is special, it contains general information about the region
+        """
+        # 'ANZ335': 'Long Island Sound West of New Haven CT/Port Jefferson NY'
+        logging.info(parser.forecasts.keys())
+        ourForcasts = parser.forecasts['ANZ335']
+        logging.info(ourForcasts['locale']) # Official designation for covered area
+        logging.info(ourForcasts['datetime']) # Short version of location
+        if 'warning' in ourForcasts:
+          logging.info(ourForcasts['warning']) # Reason for following forecasts
+
+        """
+        The subsequent records follow the pattern of REGION and a sequence of
+        Times and Advisories
+        """
+        # To
+    #    for j in range(len(parser.forecasts)):
+
+        try:
+            specialWarning = ourForcasts['warning']
+        except:
+            specialWarning = ""
+
+        # Off. designation for covered area
+        titleArea = f'''
+            <p class="where">{ourForcasts['locale']}</p>
+            <p class="when">{ourForcasts['datetime']}</p>
+            '''
+        forecastBox = []
+        for i in range(min([6, len(ourForcasts['days'])-1])):
+            logging.info(ourForcasts['days']) # Short version of location
+
+            # tmeidx = f"TIME{i+1:02d}"
+            # advidx = f"ADVISORY{i+1:02d}"
+            forecastBox.append(f'''
+                    <p class="what">{ourForcasts['days'][i][0]}</h3>
+                    <p class="how" >{ourForcasts['days'][i][1]}</p>
+                ''')
+
+        # Title Information
+        html = ("".join(templateHtml)).replace('<!--Forecast Title-->', titleArea)
+        # Forecast Boxes
+        for i in range(len(forecastBox)):
+            html = html.replace(f'<!--Forecast Box_{i}-->', forecastBox[i])
+
+        html = html.replace('<!--Special Warning-->', specialWarning)
+
+        # copy the html table into the text and write out a new file
+        with open(pathToImages / forecastFile, "w") as htmlFile:
+            htmlFile.write(html)
+
+    # The forecast is only issued a few times a day, most calls get the same page back from the NWS. The key is that
+    # page as it came (and the template) so a hit skips the parsing as well as the fill.
+    key = inputKey(payload, templateHtml)
+    hit = RenderCache('forecast').render(key, pathToImages / forecastFile, writeForecast)
+
+    print(f"X-Render-Cache: {HIT_MISS[hit]}")
     print("Content-Type: text/plain\n")
-    print("forecast done.")
+    print(f"forecast done (render cache {HIT_MISS[hit]}).")
@@ -0,0 +1,121 @@
+"""
+Don't draw what has already been drawn.
+
+coreScript.js polls the generators (windGraph, tidesCartoon and forecast) on fixed intervals
+and every call used to rebuild its graph or table from scratch, even when nothing it's drawn from had changed since
+the last time. On the pi the drawing costs as much again as loading pandas and matplotlib.
+
+Now each generator hashes exactly what goes into its artifact (the slice of data it shows, the units, the clock
+style, the template, ...) and asks the cache for that key. On a hit the artifact drawn from those same inputs is put
+back in place, on a miss it's drawn and a copy is kept. The copies live in resources/tmp/renderCache named by the
+key and are evicted by age (MAX_AGE) and count (MAX_ENTRIES).
+(The tide graph and table don't use it. They're made in both units at once whenever the tides change, so the unit
+toggle has nothing left to draw, see tidesGraph.py and tidesTable.py. They report hit or miss the same way.)
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR.parent / 'resources' / 'tmp' / 'renderCache'
+MAX_AGE = 2 * 24 * 3600  # seconds since an entry was last used, the tides only go 2 days ahead anyway
+MAX_ENTRIES = 64         # for all the generators together
+
+HIT_MISS = ('miss', 'hit')  # for the CGI responses: HIT_MISS[hit]
+
+
+def inputKey(*parts):
+    """
+    Content hash of everything an artifact is drawn from.
+    :param parts: pandas DataFrames or Series (values, index, column names and dtypes all count), numpy arrays,
+                  bytes, or anything json can write (datetimes and the like go in as str)
+    :return: hex digest
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if type(part).__module__.startswith('pandas'):
+            # (pandas is only loaded by the generators that hand us its objects, forecast.py doesn't need it)
+            import pandas as pd
+            if isinstance(part, pd.DataFrame):
+                h.update(repr([(str(c), str(t)) for c, t in part.dtypes.items()]).encode())
+            else:
+                h.update(repr((str(part.name), str(part.dtype))).encode())
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif type(part).__module__ == 'numpy':
+            h.update(str(part.dtype).encode())
+            h.update(part.tobytes())
+        elif isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        h.update(b'\x00')  # so ('ab', 'c') and ('a', 'bc') don't collide
+    return h.hexdigest()
+
+def _copy(src, dest):
+    # A copy the kiosk (or another generator) can never catch half written.
+    dest = Path(dest)
+    tmpFile = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+    shutil.copyfile(src, tmpFile)
+    os.replace(tmpFile, dest)
+
+
+class RenderCache:
+    """
+    The artifacts one generator has drawn, by input key.
+    :param name: the generator (prefixes its entries)
+    :param cacheDir: where the copies are kept
+    :param maxAge: seconds an entry is kept after it was last used
+    :param maxEntries: the most entries kept in cacheDir, least recently used go first
+    """
+    def __init__(self, name, cacheDir=CACHE_DIR, maxAge=MAX_AGE, maxEntries=MAX_ENTRIES):
+        self.name = name
+        self.cacheDir = Path(cacheDir)
+        self.maxAge = maxAge
+        self.maxEntries = maxEntries
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+
+    def entry(self, key, dest):
+        return self.cacheDir / f"{self.name}_{key}{Path(dest).suffix}"
+
+    def render(self, key, dest, draw):
+        """
+        Put the artifact for key at dest, drawing it only if it isn't cached.
+        :param key: inputKey of everything draw depends on
+        :param dest: the file draw writes
+        :param draw: function (no arguments) that draws the artifact to dest
+        :return: True on a hit (draw wasn't called)
+        """
+        entry = self.entry(key, dest)
+        try:
+            _copy(entry, dest)
+            os.utime(entry)  # recently used
+            logging.info(f"\t...render cache hit {entry.name}")
+            return True
+        except FileNotFoundError:
+            pass
+        logging.info(f"\t...render cache miss {entry.name}")
+        draw()
+        _copy(dest, entry)
+        self.evict()
+        return False
+
+    def evict(self):
+        """Delete the entries not used for maxAge and the least recently used past maxEntries."""
+        now = time.time()
+        entries = []
+        for path in self.cacheDir.iterdir():
+            if path.suffix == '.tmp':
+                continue  # a copy on its way in
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass  # another generator got to it first
+        entries.sort(reverse=True)
+        for n, (mtime, path) in enumerate(entries):
+            if n >= self.maxEntries or now - mtime > self.maxAge:
+                path.unlink(missing_ok=True)
+                logging.debug(f"\t...render cache evicted {path.name}")
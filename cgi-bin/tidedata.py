@@ -2,10 +2,11 @@
 
 """
 Essential libraries we need.  This is a library shared between 3 different generators.
+pandas is only loaded by the functions that need it, tidesGraph.py can check on the saved tides without it.
 """
-import pandas as pd
+# import pandas as pd
 # This may not be needed as pandas probably brings in everything we need but just in case.
-import numpy as np
+# import numpy as np
 # matplotlib is the tool that will create the graphs
 # import matplotlib.pyplot as plt
 import os
@@ -30,6 +31,13 @@ TZ_NY = ZoneInfo('America/New_York')
 UTC = ZoneInfo('UTC')
 EST = TZ_NY
 
+# Local store
+DETAIL_TIDES_FILE = pathToImages / 'DetailTides.zip'  # 15 minute intervals (for smooth graph)
+EXTREM_TIDES_FILE = pathToImages / 'ExtremTides.zip'  # Just the hi and low values for extrema
+
+# The tide columns and the suffixes of the artifacts made in each, tidesGraph and tidesTable make both at once
+TIDE_UNITS = {'Tide [ft]': 'ft', 'Tide [m]': 'm'}
+
 # # values for REST call
 # measureUnits = ('english', 'metric')
 # stationsNearUs = {  'NewRochelleNY':  '8518490',
@@ -47,6 +55,23 @@ EST = TZ_NY
 # tideStation = stationsNearUs['RyePlaylandNY']  # Closest one to us with reliable data
 # Visual check at [Mamaroneck Web Cam](https://www.weatherbug.com/weather-camera/?cam=MMBPC) for checking the tides?
 
+def matplotlibFont(name='DejaVuSans.ttf'):
+  """
+  Path of one of the fonts that come with matplotlib (the one it draws with by default), so PIL can draw text that
+  matches a matplotlib graph without loading matplotlib.
+  """
+  import importlib.util
+  return Path(importlib.util.find_spec('matplotlib').origin).parent / 'mpl-data' / 'fonts' / 'ttf' / name
+
+def tidesStamp():
+  """
+  What the saved tides are, without loading them: the day (they're re-fetched daily) and the size and mtime of the
+  files. The generators that render ahead keep this with what they made to tell when it needs doing again.
+  """
+  return {'date': datetime.now(tz=EST).date().isoformat(),
+          'tides': [[f.stat().st_size, f.stat().st_mtime_ns] if f.exists() else None
+                    for f in (DETAIL_TIDES_FILE, EXTREM_TIDES_FILE)]}
+
 ###
 # fetchTideData
 # Get raw data from the NOAA tide database/calculator. Tide information is generated based on a harmonic analysis of
@@ -74,6 +99,8 @@ def fetchTideData(station, begDate, endDate, datum='MLLW', interval=15, timezone
     that much over a 24 hour period.
 
   """
+  import pandas as pd
+
   noaaSite = [f"https://tidesandcurrents.noaa.gov/api/datagetter?product=predictions&application=NOS.COOPS.TAC.WL",
               f"&begin_date={begDate.strftime('%Y%m%d')}&end_date={endDate.strftime('%Y%m%d')}",
               f"&datum={datum}",
@@ -120,17 +147,20 @@ def fetchTideData(station, begDate, endDate, datum='MLLW', interval=15, timezone
 # The entry point for the getting of regular pieces of information about tides.  This routine checks the local
 # store and if it is under 24 hours old uses the local cache. Otherwise it refreshes the cache.
 #
-def fetchDailyTides(fromTideStation):
+def fetchDailyTides(fromTideStation, wholeDays=False):
     """
     fetchDailyTides
     Fetch daily tide predictions to get the tide data for a few days ahead -> (detailDF, extremaDF)
     This method checks for the existance and timelyness of a local store before going to the web.
     before fetchcing from the NOAA site.
     fromTideStation -- NOAA tide station code
+    wholeDays -- everything up to the end of the last day rather than just the next 48 hours
     """
+    import pandas as pd
+
     # Local store
-    detailTidesFile = pathToImages / 'DetailTides.zip'  # 15 minute intervals (for smooth graph)
-    extremTidesFile = pathToImages / 'ExtremTides.zip'  # Just the hi and low values for extrema
+    detailTidesFile = DETAIL_TIDES_FILE
+    extremTidesFile = EXTREM_TIDES_FILE
 
     # Fetch this data once per day.  And run all the subsequent graphics from the local store.
     now       = datetime.now(tz=EST)
@@ -165,6 +195,9 @@ def fetchDailyTides(fromTideStation):
 
     # The REST Call always returns at least 3 days of information (can't just return the next 24 hours)
     # so we have to truncate the list.
+    if wholeDays:
+        # (for the tide graph's base image, it shouldn't change until the data does)
+        tomorrow = datetime.combine(tomorrow.date() + timedelta(days=1), datetime.min.time(), tzinfo=EST)
     selDet = tideDetailDF['DateTime']<tomorrow
     selExt = tideExtremDF['DateTime']<tomorrow
 
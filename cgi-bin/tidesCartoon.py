@@ -28,12 +28,10 @@ probably break if the sources changed a lot.  I'll take my chances.
 
 """
 Essential libraries we need.
+matplotlib only draws the sprites the graphic is made from (TideCartoonAtlas), once. PIL puts them together.
 """
-import pandas as pd
-# This may not be needed as pandas probably brings in everything we need but just in case.
-import numpy as np
-# matplotlib is the tool that will create the graphs
-import matplotlib.pyplot as plt
+import json
+import os
 
 ###
 # Time libraries we are very dependant on 'aware' times. Most bugs have been traced back
@@ -78,53 +76,174 @@ tideStation = stationsNearUs['RyePlaylandNY']  # Closest one to us with reliable
 
 ###
 # import common library
-from tidedata import fetchDailyTides
+from tidedata import fetchDailyTides, matplotlibFont
+from renderCache import RenderCache, inputKey, HIT_MISS
+
+# The sprites the 'next tide' graphic is put together from
+ATLAS_DIR = pathToImages / 'tideCartoonAtlas'
+DEPTH_STEP = 2     # background pixels between water level sprites
+OCEAN_FLOOR = 20   # bottom in pixel coordinates
+CLOCK_SIZE = 26.0  # points
+
+class TideCartoonAtlas:
+    """
+    The 'next tide' graphic only has so many states: high or low, the water level (in whole pixels of the
+    background) and the time. So matplotlib draws each part once, in place, as a transparent sprite of the whole
+    graphic: the background with its title, the arrow and the HIGH/LOW label for either tide and the water at every
+    DEPTH_STEP of the background. A call just stacks the sprites it needs and writes the time on top with PIL.
+    The sprites are redrawn if the background changes.
+    imageRef -- the background
+    atlasDir -- where the sprites are kept
+    """
+    def __init__(self, imageRef, atlasDir=ATLAS_DIR):
+        self.imageRef = Path(imageRef)
+        self.atlasDir = Path(atlasDir)
+        self.sprites = {}
+        self._font = None
+        try:
+            with open(self.atlasDir / 'atlas.json') as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = None
+        if self.index is None or self.index['stamp'] != self.stamp():
+            self.index = self.build()
+
+    def stamp(self):
+        background = self.imageRef.stat()
+        return [background.st_size, background.st_mtime_ns, DEPTH_STEP]
+
+    def build(self):
+        """Draw all the sprites (a second or two, once)"""
+        import shutil
+        import numpy as np
+        import matplotlib.pyplot as plt
+        logging.info(f"\t...drawing the sprites in {self.atlasDir}")
+
+        lbl = {'H': 'HIGH', 'L': 'LOW'}
+
+        imageOverlay = plt.imread(self.imageRef)
+        (hgt,wdt,cols) = imageOverlay.shape
+
+        fig = plt.figure(figsize=(3, 3))
+
+        implot = plt.imshow(imageOverlay)
+        implot.axes.get_xaxis().set_visible(False)
+        implot.axes.get_yaxis().set_visible(False)
+        ax = implot.axes
+        plt.title('Next Tide At...')
+        plt.axis('off')
+        # (the water would stretch the axes past the picture when it's over the top)
+        ax.set_xlim(ax.get_xlim())
+        ax.set_ylim(ax.get_ylim())
+        sprites = {'frame': [implot, ax.title]}
+
+        for tideType in lbl:
+            if tideType == 'H':
+                len = -50
+            else:
+                len = 50
+            sprites[f'arrow_{tideType}'] = [plt.arrow(wdt/6, 65-len/4, 0, len, width=6., color='cyan',
+                                                      length_includes_head=True, alpha=0.6, fill=False, linewidth=2.0)]
+            sprites[f'label_{tideType}'] = [plt.text(wdt/2, 80, lbl[tideType], fontweight='heavy', color='blue',
+                                                     fontsize=20.0, ha='center')]
+
+        t = np.linspace(0, wdt-2, 50)
+        depths = hgt // DEPTH_STEP + 1
+        for depth in range(depths):
+            y = (hgt-OCEAN_FLOOR) - (depth*DEPTH_STEP + 2 * np.cos(t/4)**2)
+            sprites[f'water_{depth}'] = [plt.fill_between(t, hgt-OCEAN_FLOOR, y, color='SkyBlue', alpha=0.50)]
+
+        # The bounding box of the lot, with the widest times there'll be
+        clocks = [plt.text(wdt/2, 40, sample, fontsize=CLOCK_SIZE, ha='center') for sample in ('00:00 AM', '00:00 PM')]
+        fig.canvas.draw()
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+        for clock in clocks:
+            clock.remove()
+        dpi = fig.dpi
+        (x, y) = ax.transData.transform((wdt/2, 40))
+
+        # one sprite at a time, into a fresh directory that replaces the old one when it's done
+        tmpDir = self.atlasDir.with_name(f"{self.atlasDir.name}.{os.getpid()}.tmp")
+        tmpDir.mkdir(parents=True, exist_ok=True)
+        everything = [artist for artists in sprites.values() for artist in artists]
+        for name, artists in sprites.items():
+            for artist in everything:
+                artist.set_visible(any(artist is a for a in artists))
+            fig.savefig(tmpDir / f'{name}.png', bbox_inches=bbox, transparent=True)
+        plt.close(fig)
+
+        index = {
+            'stamp': self.stamp(),
+            'hgt': hgt,
+            'depths': depths,
+            'clock': [x - bbox.x0 * dpi, bbox.y1 * dpi - y],  # where the time goes (the middle of its baseline)
+            'clockSize': CLOCK_SIZE * dpi / 72.,             # pixels
+        }
+        with open(tmpDir / 'atlas.json', 'w') as f:
+            json.dump(index, f)
+        oldDir = self.atlasDir.with_name(f"{self.atlasDir.name}.{os.getpid()}.old")
+        if self.atlasDir.exists():
+            os.replace(self.atlasDir, oldDir)
+        os.replace(tmpDir, self.atlasDir)
+        shutil.rmtree(oldDir, ignore_errors=True)
+        return index
+
+    def depth(self, level):
+        """The water sprite for a level [ft]"""
+        # arbitrary scaling so we fit tides in our area range from -1ft to +10ft
+        sclDepth = (level + 1.5) / 12.0
+        scaledTideHeight = int(self.index['hgt']*sclDepth)
+        return min(max(round(scaledTideHeight / DEPTH_STEP), 0), self.index['depths'] - 1)
+
+    def sprite(self, name):
+        from PIL import Image
+        if name not in self.sprites:
+            self.sprites[name] = Image.open(self.atlasDir / f'{name}.png').convert('RGBA')
+        return self.sprites[name]
+
+    def font(self):
+        from PIL import ImageFont
+        if self._font is None:
+            self._font = ImageFont.truetype(matplotlibFont(), round(self.index['clockSize']))
+        return self._font
+
+    def compose(self, tideTime, tideType, depth, dest):
+        """
+        Put the graphic together and save it.
+        tideTime -- when the next tide is (as it's shown)
+        tideType -- 'H' | 'L'
+        depth -- the water sprite (see depth())
+        dest -- where it's saved
+        """
+        from PIL import ImageDraw
+        graphic = self.sprite('frame').copy()
+        for name in (f'arrow_{tideType}', f'water_{depth}', f'label_{tideType}'):
+            graphic.alpha_composite(self.sprite(name))
+        ImageDraw.Draw(graphic).text(tuple(self.index['clock']), tideTime, font=self.font(), fill='black', anchor='ms')
+        tmpFile = dest.with_suffix('.tmp')
+        graphic.save(tmpFile, format='PNG')
+        os.replace(tmpFile, dest)
 
 #@markdown Make the fancy image with next tide
 def makeTideGraphic(extremaDF, detailDF=None):
-    # make up for image import deprecation
-    # import PIL
-    # import urllib.request
     """
     Make tide ala NOAA from two sets of pandas DataFrames:
     detailDF -- Detailed predicted water levels for complete graph
     extremeDF -- The extrema (highs and lows)
+    returns True if the graphic came from the render cache
     """
     global gTime
 
-    lbl = {'H': 'HIGH', 'L': 'LOW'}
-
-    # imageURL = 'https://docs.google.com/drawings/d/e/2PACX-1vRPpyCKk834LQUUwoEWDiopLKIcRscn3AoUPynXzNe6jPRLXWt9TBS90Wwm_MjxVoqezD09hbx_0Sw8/pub?w=225&h=159'
-    # imageRef = PIL.Image.open(urllib.request.urlopen(imageURL))
-    imageRef = pathToResources / 'TideBackground.png' # fetch locally (way faster on a pi)
-    imageOverlay = plt.imread(imageRef)
-    (hgt,wdt,cols) = imageOverlay.shape
-
-    plt.figure(figsize=(3, 3))
-
-    implot = plt.imshow(imageOverlay)
-    implot.axes.get_xaxis().set_visible(False)
-    implot.axes.get_yaxis().set_visible(False)
-
     upcoming = extremaDF[extremaDF['DateTime']>datetime.now(tz=EST)]
     nxtTide = upcoming.iloc[0]
 
     logging.debug(f"next Tide: '{nxtTide['DateTime'].strftime('%H:%M')}' '{nxtTide['DateTime'].strftime('%I:%M %p')}'")
 
     if gTime == '24':
-        plt.text(wdt/2, 40, nxtTide['DateTime'].strftime('%H:%M'), fontsize=26.0, ha='center' )
-    else:
-        plt.text(wdt/2, 40, nxtTide['DateTime'].strftime('%I:%M %p'), fontsize=26.0, ha='center' )
-    plt.text(wdt/2, 80, lbl[nxtTide['Type']], fontweight='heavy', color='blue', fontsize=20.0, ha='center')
-
-    if nxtTide['Type'] == 'H':
-        len = -50
+        tideTime = nxtTide['DateTime'].strftime('%H:%M')
     else:
-        len = 50
-    plt.arrow(wdt/6, 65-len/4, 0, len, width=6., color='cyan',
-                length_includes_head=True, alpha=0.6, fill=False, linewidth=2.0)
-
-    logging.debug(f"next Tide: '{nxtTide['Type']}' len: '{len}'")
+        tideTime = nxtTide['DateTime'].strftime('%I:%M %p')
+    tideType = nxtTide['Type']
 
     # Somehwat kludgy since we know the range is between -1 and 10ft
     try:
@@ -132,23 +251,14 @@ def makeTideGraphic(extremaDF, detailDF=None):
         nxtTide = current.iloc[0]
     finally:
         level = nxtTide['Tide [ft]']
+    logging.debug(f"time: {current.iloc[0]['DateTime'].strftime('%I:%M %p')}, level: {level:6.2f}")
 
-    # arbitrary scaling so we fit tides in our area range from -1ft to +10ft
-    sclDepth = (level + 1.5) / 12.0
-    scaledTideHeight = int(hgt*sclDepth)
-
-    logging.debug(f"time: {current.iloc[0]['DateTime'].strftime('%I:%M %p')}, hgt: {hgt}, level: {level:6.2f}, scaleDepth: {sclDepth:6.3f}, scaledHeight: {scaledTideHeight:6d}")
-
-    plt.title('Next Tide At...')
-    plt.axis('off')
-    oceanFloor = 20  # bottom in pixel coordinates
-    t = np.linspace(0, wdt-2, 50)
-    y = (hgt-oceanFloor) - (scaledTideHeight + 2 * np.cos(t/4)**2)
-    plt.fill_between(t, hgt-oceanFloor, y, color='SkyBlue', alpha=0.50)
-
-    #plt.show()
-    plt.savefig(pathToImages / 'tideCartoon.png', bbox_inches='tight', transparent=True)
-    plt.close()
+    # That's all there is to it (and the background), it changes when the water rises or falls past a sprite
+    atlas = TideCartoonAtlas(pathToResources / 'TideBackground.png')
+    depth = atlas.depth(level)
+    key = inputKey(tideTime, tideType, depth, atlas.index['stamp'])
+    return RenderCache('tideCartoon').render(key, pathToImages / 'tideCartoon.png',
+                                             lambda: atlas.compose(tideTime, tideType, depth, pathToImages / 'tideCartoon.png'))
 
 # Should run this every 5 minutes to keep the screen up to date.
 def refresh(time):
@@ -159,7 +269,7 @@ def refresh(time):
     (ryePlayDetailDF, ryePlayExtremDF) = fetchDailyTides(tideStation)
 
     # make the pseudo 'next tide' graphic
-    makeTideGraphic(ryePlayExtremDF, ryePlayDetailDF)
+    return makeTideGraphic(ryePlayExtremDF, ryePlayDetailDF)
 
 """
     Entrypoint for the call. The expected optional parameters for cgi-call:
@@ -179,9 +289,10 @@ if __name__ == '__main__':
 
     logging.info(f"\t...clock format {time}")
 
-    refresh(time)
+    hit = refresh(time)
 
     logging.info('\t...done')
 
+    print(f'X-Render-Cache: {HIT_MISS[hit]}')
     print('Content-Type: text/plain\n')
-    print('tidesGraphic done.')
+    print(f'tidesGraphic done (render cache {HIT_MISS[hit]}).')
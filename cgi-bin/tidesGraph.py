@@ -28,12 +28,10 @@ probably break if the sources changed a lot.  I'll take my chances.
 
 """
 Essential libraries we need.
+pandas and matplotlib are only loaded when the base images are (re)drawn, once a day in both units. The rest of the time
+the call just puts the current time marker on the saved base, PIL is enough for that.
 """
-import pandas as pd
-# This may not be needed as pandas probably brings in everything we need but just in case.
-import numpy as np
-# matplotlib is the tool that will create the graphs
-import matplotlib.pyplot as plt
+import json
 
 ###
 # Time libraries we are very dependant on 'aware' times. Most bugs have been traced back
@@ -85,24 +83,33 @@ pathToResources = 'resources/'
 
 ###
 # import common library
-from tidedata import fetchDailyTides
+from tidedata import fetchDailyTides, matplotlibFont, tidesStamp, TIDE_UNITS
+from renderCache import HIT_MISS
+
+# The current time marker, as matplotlib drew it
+MARKER_COLOR = (0, 128, 0)  # 'green'
+MARKER_WIDTH = 4            # points
+MARKER_DASH = (3.7, 1.6)    # matplotlib's 'dashed', in line widths
+LABEL_SIZE = 10             # points
+LABEL_OFFSET = (-15, -60)   # points from the middle of the line
 
 ###
 # makeTideGraph
 # The business end that makes the fancy graphic that includes a moing line that shows out current time
 # against a graph of the tide height.
 #
-def makeTideGraph(detailDF, extremaDF):
+def makeTideGraph(detailDF, extremaDF, graphFile, tideUnit):
     """
     makeTideGraph
-    Make tide ala NOAA from two sets of pandas DataFrames:
+    Make tide ala NOAA from two sets of pandas DataFrames, everything but the current time marker (see addNowMarker):
     detailDF -- Detailed predicted water levels for complete graph
     extremeDF -- The extrema (highs and lows)
+    graphFile -- where the base image goes
+    tideUnit -- 'Tide [ft]' | 'Tide [m]'
+    returns the pixel mapping addNowMarker needs to put the marker on it
     """
-    global gTideUnit # unit switch flag
-
-    graphFile = pathToImages / 'tideGraph.png'
 
+    import matplotlib.pyplot as plt
     import matplotlib.transforms
     import matplotlib.dates as mdates
 
@@ -112,13 +119,13 @@ def makeTideGraph(detailDF, extremaDF):
     # px = 1/plt.rcParams['figure.dpi']  # pixel in inches (doesn't work if bbox is 'tight')
     fig, ax = plt.subplots(figsize=(2*11.5/3, 4))
 
-    ax.plot(detailDF['DateTime'], detailDF[gTideUnit], color='blue', alpha=0.8)
+    ax.plot(detailDF['DateTime'], detailDF[tideUnit], color='blue', alpha=0.8)
 
     # Markers at extrema with square marks
-    ax.scatter(extremaDF['DateTime'], extremaDF[gTideUnit], color='blue', marker='s')
+    ax.scatter(extremaDF['DateTime'], extremaDF[tideUnit], color='blue', marker='s')
     for index, row in extremaDF.iterrows():
-        xy = (row['DateTime'], row[gTideUnit])
-        u = gTideUnit.split('[')[1].split(']')[0]   # row['Units']
+        xy = (row['DateTime'], row[tideUnit])
+        u = tideUnit.split('[')[1].split(']')[0]   # row['Units']
         ax.annotate(f'{xy[1]:5.1f} {u[:2]}', xy=xy, xytext=(8,0), textcoords='offset points', color='blue')
 
     # Set the axis labels
@@ -126,12 +133,6 @@ def makeTideGraph(detailDF, extremaDF):
     ax.set_ylabel(f"Tide Level [{u}]", fontsize=14, fontstyle='italic', color='SlateGray')
     # ~put an alternate axis in meters~ Alternate between meters and feet in 5min intervals
 
-    # Put a vetical bar that marks right now.
-    now = datetime.now(tz=EST)
-    (ymin, ymax) = ax.get_ylim()
-    ax.annotate(f"Current Time   {now.time().strftime('%I:%M %p')}", xy=(now, (ymin+ymax)/2), xytext=(-15,-60), textcoords='offset points', color='green', rotation=90.0, alpha=0.6 )
-    ax.vlines(now, ymin=0.1, ymax=0.9, transform=ax.get_xaxis_transform(), colors='green', linestyles='dashed', linewidth=4, alpha=0.7)
-
     #Fix the time axis
     ax.xaxis.set_major_locator(mdates.DayLocator(tz=EST))
     ax.xaxis.set_minor_locator(mdates.HourLocator(interval=4, tz=EST))
@@ -152,17 +153,108 @@ def makeTideGraph(detailDF, extremaDF):
     ax.grid(True, which='major', linewidth=2, axis='both', alpha=0.7)
     ax.grid(True, which='minor', linestyle='--', axis='both', alpha = 0.5)
 
-    # fig.show()
-    fig.savefig(graphFile, bbox_inches='tight', transparent=True)
+    # Save it with the tight bounding box worked out here, so we know where the axes ended up in the picture
+    fig.canvas.draw()
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+    fig.savefig(graphFile, bbox_inches=bbox, transparent=True)
+
+    # Where times and the marker's ends land in the saved picture (pixels from the top left)
+    dpi = fig.dpi
+    (xmin, xmax) = ax.get_xlim()
+    (ymin, ymax) = ax.get_ylim()
+    def pixel(point, transform):
+        (x, y) = transform.transform(point)
+        return (x - bbox.x0 * dpi, bbox.y1 * dpi - y)
+    (left, top) = pixel((0, 0.9), ax.transAxes)
+    (right, bottom) = pixel((1, 0.1), ax.transAxes)
+    (x0, middle) = pixel((xmin, (ymin+ymax)/2), ax.transData)
+    (x1, _) = pixel((xmax, (ymin+ymax)/2), ax.transData)
     plt.close(fig)
+    return {
+        'dpi': dpi,
+        't0': mdates.num2date(xmin).timestamp(), 'x0': x0,   # the left edge of the axes
+        'pxPerSecond': (x1 - x0) / ((xmax - xmin) * 24 * 3600),
+        'left': left, 'right': right,                        # the marker is only drawn between these
+        'top': top, 'bottom': bottom,                        # the line goes from 10% to 90% of the axes' height
+        'middle': middle,                                    # where the label hangs from
+    }
+
+def addNowMarker(baseFile, mapping, graphFile, now=None):
+    """
+    Put the vertical bar that marks right now (and its label) on the base image.
+    baseFile -- the image makeTideGraph made
+    mapping -- what makeTideGraph returned for it
+    graphFile -- where the graph goes
+    now -- the time to mark (default: right now)
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    if now is None:
+        now = datetime.now(tz=EST)
+    graph = Image.open(baseFile).convert('RGBA')
+    x = mapping['x0'] + (now.timestamp() - mapping['t0']) * mapping['pxPerSecond']
+    if mapping['left'] <= x <= mapping['right']:
+        pt = mapping['dpi'] / 72.
+        marker = Image.new('RGBA', graph.size)
+        draw = ImageDraw.Draw(marker)
+
+        # the dashed line, from the bottom up like matplotlib draws it
+        width = MARKER_WIDTH * pt
+        (dash, gap) = (MARKER_DASH[0] * width, MARKER_DASH[1] * width)
+        y = mapping['bottom']
+        while y > mapping['top']:
+            draw.line([(x, y), (x, max(y - dash, mapping['top']))], fill=MARKER_COLOR + (int(0.7*255),), width=round(width))
+            y -= dash + gap
+
+        # the label runs up from below the middle of the line, just to the left of it
+        font = ImageFont.truetype(matplotlibFont(), round(LABEL_SIZE * pt))
+        text = f"Current Time   {now.time().strftime('%I:%M %p')}"
+        (l, t, r, b) = font.getbbox(text)
+        label = Image.new('RGBA', (r, b - t))
+        ImageDraw.Draw(label).text((0, -t), text, font=font, fill=MARKER_COLOR + (int(0.6*255),))
+        label = label.rotate(90, expand=True)
+        (left, base) = (x + LABEL_OFFSET[0] * pt, mapping['middle'] - LABEL_OFFSET[1] * pt)
+        marker.alpha_composite(label, (max(round(left), 0), max(round(base) - label.height, 0)))
+
+        graph.alpha_composite(marker)
+    tmpFile = graphFile.with_suffix('.tmp')
+    graph.save(tmpFile, format='PNG')
+    os.replace(tmpFile, graphFile)
 
 # Should run this every 5 minutes to keep the screen up to date.
 def refresh():
-    # Get the data this method tries to fetch from local store first
-    (ryePlayDetailDF, ryePlayExtremDF) = fetchDailyTides(tideStation)
-
-    # make the pseudo NOAA tide graph
-    makeTideGraph(ryePlayDetailDF, ryePlayExtremDF)
+    """:return: True if the base images were already drawn (only the marker was added)"""
+    mappingFile = pathToImages / 'tideGraphBase.json'
+    baseFiles = {suffix: pathToImages / f'tideGraphBase_{suffix}.png' for suffix in TIDE_UNITS.values()}
+
+    mappings = None
+    try:
+        with open(mappingFile) as f:
+            mappings = json.load(f)
+        if mappings.get('stamp') != tidesStamp() or not all(base.exists() for base in baseFiles.values()):
+            mappings = None
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    hit = mappings is not None
+    if not hit:
+        # Get the data this method tries to fetch from local store first
+        (ryePlayDetailDF, ryePlayExtremDF) = fetchDailyTides(tideStation, wholeDays=True)
+
+        # make the pseudo NOAA tide graph, less the marker, in both units while we have everything loaded.
+        # coreScript.js asks for them in turn.
+        mappings = {'units': {}}
+        for tideUnit, suffix in TIDE_UNITS.items():
+            mappings['units'][suffix] = makeTideGraph(ryePlayDetailDF, ryePlayExtremDF, baseFiles[suffix], tideUnit)
+        mappings['stamp'] = tidesStamp()  # (after the fetch, it may have just saved new tides)
+        tmpFile = mappingFile.with_suffix('.tmp')
+        with open(tmpFile, 'w') as f:
+            json.dump(mappings, f)
+        os.replace(tmpFile, mappingFile)
+
+    suffix = TIDE_UNITS[gTideUnit]
+    addNowMarker(baseFiles[suffix], mappings['units'][suffix], pathToImages / f'tideGraph_{suffix}.png')
+    return hit
 
 
 """
@@ -188,7 +280,8 @@ if __name__ == '__main__':
     gTideUnit = ('Tide [ft]', 'Tide [m]')[idx]
     logging.info(f"\t...using {gTideUnit}")
 
-    refresh()
+    hit = refresh()
 
+    print(f'X-Render-Cache: {HIT_MISS[hit]}')
     print('Content-Type: text/plain\n')
-    print('tidesGraph done.')
+    print(f'tidesGraph done (render cache {HIT_MISS[hit]}).')
@@ -28,12 +28,12 @@ probably break if the sources changed a lot.  I'll take my chances.
 
 """
 Essential libraries we need.
+pandas is only loaded (by tidedata) when the tables are rewritten, once a tide goes by. Both units are written then,
+so the calls in between just say the tables are there.
 """
-import pandas as pd
-# This may not be needed as pandas probably brings in everything we need but just in case.
-import numpy as np
-# matplotlib is the tool that will create the graphs
-import matplotlib.pyplot as plt
+import json
+import os
+import time
 
 ###
 # Time libraries we are very dependant on 'aware' times. Most bugs have been traced back
@@ -77,56 +77,92 @@ tideStation = stationsNearUs['RyePlaylandNY']  # Closest one to us with reliable
 
 ###
 # import common library
-from tidedata import fetchDailyTides
+from tidedata import fetchDailyTides, tidesStamp, TIDE_UNITS
+from renderCache import HIT_MISS
+
+TEMPLATE_FILE = pathToResources / '_tideTable.html'
+STAMP_FILE = pathToImages / 'tideTable.json'  # what the tables were made from and until when they're good
 
 #@markdown Make the summary table for the next four tide extrema
-def makeTideTable(extremaDF):
+def makeTideTables(extremaDF):
     """
-    Make the html table of the next 4 tide extrema
+    Make the html tables of the next 4 tide extrema, one for each unit
     extremeDF -- The extrema (highs and lows)
+    returns the time (epoch) the first tide listed goes by, the tables need redoing then
     """
-    global gTideUnit
-    lbl = {'H': 'HIGH', 'L': 'LOW'}
-
     now = datetime.now(tz=EST)
 
-    tideFile = 'tideTable.html'
-    templateFile = '_' + tideFile
+    sel = extremaDF['DateTime'] > now
+    futureTides = extremaDF[sel][:4]
 
-    # pick the units based on gTideUnit
+    #open the template file
+    with open(TEMPLATE_FILE, 'r') as template:
+        templateHTML = template.readlines()
 
-    sel = extremaDF['DateTime'] > now
-    futureTides = extremaDF[sel]
+    for tideUnit, suffix in TIDE_UNITS.items():
+        writeTideTable(futureTides, templateHTML, f'tideTable_{suffix}.html', tideUnit)
 
-    htmlText = futureTides[:4].to_html(
-#                           columns=['DateTime', 'Time', 'Type', gTideUnit],
-                            columns=['DateTime', 'Type', gTideUnit],
+    # (with nothing ahead of us in the saved tides try again next time)
+    return futureTides['DateTime'].iloc[0].timestamp() if len(futureTides) else time.time()
+
+def writeTideTable(futureTides, templateHTML, tideFile, tideUnit):
+    """
+    Fill the table into the template and write it out
+    futureTides -- the extrema to list
+    templateHTML -- lines of the template
+    tideFile -- the file name it's written to
+    tideUnit -- 'Tide [ft]' | 'Tide [m]'
+    """
+    lbl = {'H': 'HIGH', 'L': 'LOW'}
+
+    htmlText = futureTides.to_html(
+#                           columns=['DateTime', 'Time', 'Type', tideUnit],
+                            columns=['DateTime', 'Type', tideUnit],
                             index=False,
                             border=0,
                             formatters={
-                                gTideUnit: lambda x:f"{x:6.1f}",
+                                tideUnit: lambda x:f"{x:6.1f}",
                                 'Type': lambda l: lbl[l],
                                 'DateTime': lambda dt: dt.strftime('%a %I:%M %p')
                                 },
 #                           table_id = 'tideTable'
                             )
 
-    #open the template file
-    with open(pathToResources / templateFile, 'r') as template:
-        templateHTML = template.readlines()
- #   templateFile.close()
-
-    # copy the html table into the text and write out a new file   '../' +
-    with open(pathToImages / tideFile, 'w') as html:
+    # copy the html table into the text and write out a new file (the kiosk may be reading the old one)
+    tmpFile = pathToImages / f'{tideFile}.tmp'
+    with open(tmpFile, 'w') as html:
         html.write( ("".join(templateHTML)).replace('<!--Table Place-->', htmlText) )
+    os.replace(tmpFile, pathToImages / tideFile)
+
+def _stamp():
+    # the saved tides and the template, the tables change with either
+    template = TEMPLATE_FILE.stat()
+    return {**tidesStamp(), 'template': [template.st_size, template.st_mtime_ns]}
 
 # Should run this every 5 minutes to keep the screen up to date.
 def refresh():
+    """:return: True if the tables were still good (nothing was loaded or written)"""
+    tableFiles = [pathToImages / f'tideTable_{suffix}.html' for suffix in TIDE_UNITS.values()]
+    try:
+        with open(STAMP_FILE) as f:
+            saved = json.load(f)
+        if (saved['stamp'] == _stamp() and time.time() < saved['validUntil']
+                and all(table.exists() for table in tableFiles)):
+            logging.info(f"\t...tables good until {datetime.fromtimestamp(saved['validUntil'], tz=EST):%a %I:%M %p}")
+            return True
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        pass
+
     # Get the data this method tries to fetch from local store first
     (ryePlayDetailDF, ryePlayExtremDF) = fetchDailyTides(tideStation)
 
-    # make the pseudo NOAA tide graph
-    makeTideTable(ryePlayExtremDF)
+    # make the tables in both units
+    validUntil = makeTideTables(ryePlayExtremDF)
+    tmpFile = STAMP_FILE.with_suffix('.tmp')
+    with open(tmpFile, 'w') as f:
+        json.dump({'stamp': _stamp(), 'validUntil': validUntil}, f)
+    os.replace(tmpFile, STAMP_FILE)
+    return False
 
 
 """
@@ -149,12 +185,13 @@ if __name__ == '__main__':
         elif (fs['units'].value == 'imperial') or (fs['units'].value == '0'):
             idx = 0
 
-    gTideUnit = ('Tide [ft]', 'Tide [m]')[idx]
-    logging.info(f"\t...using {gTideUnit} [{idx}]")
+    # (both units are written together, coreScript.js picks the one it shows)
+    logging.info(f"\t...asked for {('Tide [ft]', 'Tide [m]')[idx]} [{idx}]")
 
-    refresh()
+    hit = refresh()
 
     logging.info('\t...done')
 
+    print(f'X-Render-Cache: {HIT_MISS[hit]}')
     print('Content-Type: text/plain\n')
-    print('tidesTable done.')
+    print(f'tidesTable done (render cache {HIT_MISS[hit]}).')
@@ -6,10 +6,6 @@ import numpy as np
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-import matplotlib.pyplot as plt
-import matplotlib.transforms
-import matplotlib.dates as mdates
-
 ### Global Structures and Configurations
 # 03/04/26 now supports ZoneInfo so we can remove the pytz dependency.
 TZ_NY = ZoneInfo('America/New_York')
@@ -25,6 +21,8 @@ pathToResources = BASE_DIR.parent / 'resources'       # where the data cache and
 pathToImages = BASE_DIR.parent / 'resources' / 'tmp'  # where the generated graphs and tables are stored. aka "mutable content"
 pathToLogs = BASE_DIR.parent / 'resources' / 'logs'   # where the logs are stored.
 
+from windGraphOCR import getRenderer
+
 # Getting Weather Data from execution rocks (station 44022)  Only needs to run every 15 minutes.
 def fetchWindData(source):
     now = datetime.now(tz=EST)
@@ -56,61 +54,11 @@ def makeWindGraph(windDF, whereFrom=""):
     if len(windDF) < 16:
       raise BaseException('Not enough points')
 
-    imageRef = pathToImages / 'windGraph.png' # fetch locally (way faster on a pi)
-    fig, ax = plt.subplots(figsize=(8, 4))
-
     # determine how old the data is...
     last = windDF.index[-1].to_pydatetime()
     now = datetime.now(TZ_NY)
     delta = now-last
 
-    tme = windDF.index
-    wspd = windDF['WSPD'] # windDF['WSPD']
-    mxsp = windDF['GST'] # windDF['GST']
-
-    # convert m/s to mph: 0.447, m/s to knot: 0.5144
-    ax.plot(tme, wspd/0.5144, 'bo-', alpha=0.8)
-    ax.plot(tme, mxsp/0.5144, 'ro-', alpha=0.8)
-
-
-    # Plot direction arrows
-    yloc = 3.0 * np.ones(windDF.shape[0])
-    # we stored the direction components so the averages would be modulo 360 (or 2pi)
-    #    The average between 10 and 350 should be 0 (or 360) NOT 180.
-    # An arrow every other step
-    (cosines, sines) = (windDF['WdirCos'], windDF['WdirSin'])
-    ax.quiver(tme[::2], yloc[::2], sines[::2], cosines[::2],
-              angles='uv', color='DodgerBlue', alpha=0.6, pivot='middle')
-    # Set the axis labels
-    # ax.set_xlabel('Date and Time', fontsize=10, fontstyle='italic', color='SlateGray')  #obvious don't need it.
-    ax.set_ylabel('Wind Speed [knots]', fontsize=12, fontstyle='italic', color='SlateGray')
-
-    #Fix the time axis
-    ax.xaxis.set_major_locator(mdates.DayLocator(tz=EST))
-    ax.xaxis.set_minor_locator(mdates.HourLocator(interval=4, tz=EST))
-
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%a, %b %d', tz=EST))
-    ax.xaxis.set_minor_formatter(mdates.DateFormatter('%H:%M', tz=EST))
-
-    dx = 0.; dy = -10/72.
-    offset = matplotlib.transforms.ScaledTranslation(dx, dy, fig.dpi_scale_trans)
-    # Create offset transform by 5 points in x direction
-    for label in ax.xaxis.get_majorticklabels():
-        label.set(horizontalalignment='center', color='darkred', fontweight='bold')
-        label.set_transform(label.get_transform() + offset)
-
-    for label in ax.xaxis.get_minorticklabels():
-        label.set(horizontalalignment='center', color='darkred')
-
-    ax.grid(True, which='major', linewidth=2, axis='both', alpha=0.7)
-    ax.grid(True, which='minor', linestyle='--', axis='both', alpha = 0.5)
-    ax.set_ylim(bottom=0.0)
-
-    # where did this come from?
-    plt.text(0.99, 0.96, f"{whereFrom}",
-         horizontalalignment='right', verticalalignment='center',
-          transform=ax.transAxes, color='gray', alpha=0.6 )
-
     ##
     # Put a current conditions slug at the top
     tme = windDF.index[-1]
@@ -128,17 +76,13 @@ def makeWindGraph(windDF, whereFrom=""):
     DATA_AGE_HOURS = oldhrs + oldmin/60.0
     logging.debug(f"{tme}, {oldhrs}:{oldmin} old, {wspd} mph, {mxsp} mph, {wdir:4.0f}°T, {temp}°C")
 
-    plt.text(0.99, 0.90, f"Last readings spd:{wspd}, max:{mxsp}, dir:{windDirection(wdir)}",
-            horizontalalignment='right', verticalalignment='center',
-            transform=ax.transAxes, color='blue', alpha=0.6 )
-    if oldhrs > 1 or oldmin > 40:
-        plt.text(0.99, 0.84, f"Warning {oldhrs}:{oldmin} old",
-                horizontalalignment='right', verticalalignment='center',
-                transform=ax.transAxes, color='darkred', alpha=0.6 )
-
-    #   fig.show()
-    fig.savefig(imageRef, bbox_inches='tight', transparent=True)
-    plt.close(fig)
+    # The same graph windGraphOCR draws, the figure is kept in its renderer.
+    # convert m/s to mph: 0.447, m/s to knot: 0.5144
+    warning = f"Warning {oldhrs}:{oldmin} old" if oldhrs > 1 or oldmin > 40 else None
+    getRenderer().render(windDF.index, windDF['WSPD']/0.5144, windDF['GST']/0.5144,
+                         windDF['WdirSin'], windDF['WdirCos'], whereFrom=whereFrom,
+                         slug=f"Last readings spd:{wspd}, max:{mxsp}, dir:{windDirection(wdir)}",
+                         warning=warning, imageRef=pathToImages / 'windGraph.png')
 
 # direction indexer
 def windDirection(ang):
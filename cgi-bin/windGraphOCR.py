@@ -17,9 +17,10 @@ from zoneinfo import ZoneInfo
 import pandas as pd
 import numpy as np
 
-import matplotlib.pyplot as plt
-import matplotlib.transforms
+import matplotlib
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 ### Global Structures and Configurations
 # 03/04/26 now supports ZoneInfo so we can remove the pytz dependency.
@@ -27,6 +28,8 @@ TZ_NY = ZoneInfo('America/New_York')
 UTC = ZoneInfo('UTC')
 EST = TZ_NY
 DATA_AGE_HOURS = 99.9  # Optimism, the data should be no more than 1 hour old. We will warn if it's older than that.
+GRAPH_HOURS = 32           # how much history the graph shows
+GRAPH_RESOLUTION = '45min' # one point per (a ROLLUP_TIERS name)
 
 # The data is stored locally in a csv file that is updated by a separate process that fetches the data from the buoys.
 # This is much faster than fetching the data from the buoys every time we want to generate a graph, especially on a Raspberry Pi.
@@ -41,6 +44,13 @@ pathToResources = BASE_DIR.parent / 'resources'  # where the data cache and the
 pathToImages = BASE_DIR.parent / 'resources' / 'tmp'  # where the generated graphs and tables are stored. aka "mutable content"
 pathToLogs = BASE_DIR.parent / 'resources' / 'logs'  # where the logs are stored.
 
+# The data store code is shared with the capture process in bin/
+import sys
+sys.path.append(str(BASE_DIR.parent / 'bin'))
+from dataBuffer import RingBufferStore, SqliteStore, RollupStore, rollupPath, storePath
+from windComposite import readComposite, COMPOSITE_FILE, ORIGIN_NAMES
+from renderCache import RenderCache, inputKey, HIT_MISS
+
 def fetchWindData(source):
     """
     This gathers the accumulated data from an asynchronous populated datastore by
@@ -52,126 +62,233 @@ def fetchWindData(source):
     :return pandas dataframe containing the data.
     """
     logging.info(f"\t...getting from {source}")
+    windColumns = ['WindSpeedAvg [kts]', 'WindSpeedGst [kts]', 'AirTemp [°F]', 'WindDir [°]']
     # Getting Weather Data from execution rocks (station 44022)  Only needs to run every 15 minutes.
-    windDF = pd.read_csv(source, index_col=0, parse_dates=True)
-    # windDF.dropna(inplace=True)  # we don't do this globally, some data isn't relevant to what we want.                                     # wind data has glitches
+    if rollupPath(source).exists():
+        # The capture keeps the averages up to date as it stores the data, nothing to resample here.
+        rollups = RollupStore(rollupPath(source))
+        last = rollups.latest(source=44022)
+        start = None if last is None else last - pd.Timedelta(hours=GRAPH_HOURS)
+        windDF = rollups.window(44022, start=start, resolution=GRAPH_RESOLUTION, columns=windColumns)
+        logging.info(f"\t...got {len(windDF)} {GRAPH_RESOLUTION} averages")
+        windDF = windDF.rename(columns={'WindDir [°] sin': 'WdirSin', 'WindDir [°] cos': 'WdirCos'})
+        windDF.attrs = {'resolution': GRAPH_RESOLUTION, 'last': last}
+        return windDF.filter(items=windColumns + ['WdirSin', 'WdirCos'])
+    elif Path(source).suffix == '.ring':
+        # The ring buffer is mapped, not parsed. Only execution rocks' rows (and the columns we graph) are copied out.
+        windDF = RingBufferStore(source, readOnly=True).select(source=44022, columns=windColumns)
+    elif Path(source).suffix == '.sqlite':
+        # The database hands back execution rocks' last 32 hours (what the graph shows) through its index.
+        store = SqliteStore(source)
+        last = store.latest(source=44022)
+        start = None if last is None else last - pd.Timedelta(hours=GRAPH_HOURS)
+        windDF = store.select(source=44022, start=start, columns=windColumns)
+    else:
+        windDF = pd.read_csv(source, index_col=0, parse_dates=True)
+        # windDF.dropna(inplace=True)  # we don't do this globally, some data isn't relevant to what we want.                                     # wind data has glitches
+        sel = windDF['Source'] == 44022
+        # we have data from multiple buoys, but we only want one for the graph. The others are for the table.
+        windDF = windDF[sel].copy()
     logging.info(f"\t...got {len(windDF)} data values")
 
     # We need to average the components rather than the angles when re-sampling.
     windDF['WdirSin'] = np.sin(np.radians(windDF['WindDir [°]']))
     windDF['WdirCos'] = np.cos(np.radians(windDF['WindDir [°]']))
 
-    sel = windDF['Source'] == 44022
-    # we have data from multiple buoys, but we only want one for the graph. The others are for the table.
-    return windDF[sel].filter(items=['WindSpeedAvg [kts]', 'WindSpeedGst [kts]', 'AirTemp [°F]', 'WindDir [°]', 'WdirSin', 'WdirCos'])
+    return windDF.filter(items=windColumns + ['WdirSin', 'WdirCos'])
     # return windDF.filter(items=['WindSpeedAvg [kts]', 'WindSpeedGst [kts]', 'AirTemp [°F]', 'WindDir [°]', 'WdirSin', 'WdirCos'])
 
-def makeWindGraph(windDF, whereFrom=""):
+def fetchCompositeData(compositeFile=COMPOSITE_FILE):
+    """
+    The best available wind series the capture puts together from all the buoys (see bin/windComposite.py).
+    :return: (pandas dataframe of the last GRAPH_HOURS of it, where it came from)
+    """
+    logging.info(f"\t...getting from {compositeFile}")
+    windDF = readComposite(compositeFile)
+    last = windDF['ObservedAt'].max()
+    windDF = windDF[windDF.index > last - pd.Timedelta(hours=GRAPH_HOURS)]
+    logging.info(f"\t...got {len(windDF)} data values")
+    # newest first: "Execution Rocks / Kings Point (NDBC)" when we had to fill in
+    origins = windDF['Origin'].iloc[::-1].unique()
+    whereFrom = " / ".join(ORIGIN_NAMES.get(origin, origin) for origin in origins)
+    windDF = windDF.drop(columns=['Origin', 'ObservedAt'])
+    windDF.attrs = {'last': last}
+    return windDF, whereFrom
+
+class WindGraphRenderer:
+    """
+    The wind graph's figure, built once: the axes, the locators and formatters, the tick styling, the grid and the
+    text artists stay put and a refresh only hands the lines, the arrows and the texts their new values before it's
+    saved. Building all that (and the extra draw bbox_inches='tight' does to measure it) was most of the time the
+    old makeWindGraph took on the pi. Keep one (getRenderer) in a long running process and call render as the data
+    changes.
+    :param imageRef: where the graph is saved
+    :param tight: measure the tight bounding box on every save (what plt's bbox_inches='tight' does) rather than on
+                  the first one only
+    """
+    def __init__(self, imageRef=None, tight=False):
+        self.imageRef = imageRef or pathToImages / "windGraph.png"
+        self.tight = tight
+        self.bbox = None
+        self.fig = Figure(figsize=(8, 4))
+        FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot()
+        ax.xaxis_date(TZ_NY)
+
+        self.speedLine, = ax.plot([], [], 'bo-', alpha=0.8)
+        self.gustLine, = ax.plot([], [], 'ro-', alpha=0.8)
+        self.arrows = None  # the quiver, made on the first render (it has a fixed number of arrows)
+
+        # Set the axis labels
+        ax.set_ylabel('Wind Speed [knots]', fontsize=12, fontstyle='italic', color='SlateGray')
+
+        #Fix the time axis
+        ax.xaxis.set_major_locator(mdates.DayLocator(tz=TZ_NY))
+        ax.xaxis.set_minor_locator(mdates.HourLocator(interval=4, tz=TZ_NY))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%a, %b %d', tz=TZ_NY))
+        ax.xaxis.set_minor_formatter(mdates.DateFormatter('%H:%M', tz=TZ_NY))
+
+        # The days go 10 points below the hours. The axis copies the first tick's label to the ticks it adds as the
+        # dates move along so styling it (and the pad) once is enough.
+        ax.tick_params(axis='x', which='both', labelcolor='darkred')
+        ax.tick_params(axis='x', which='major', pad=matplotlib.rcParams['xtick.major.pad'] + 10)
+        ax.xaxis.get_major_ticks()[0].label1.set_fontweight('bold')
+
+        ax.grid(True, which='major', linewidth=2, axis='both', alpha=0.7)
+        ax.grid(True, which='minor', linestyle='--', axis='both', alpha = 0.5)
+
+        # where did this come from, the current conditions slug and the warning when it's old
+        self.whereFromText = ax.text(0.99, 0.96, "", horizontalalignment='right', verticalalignment='center',
+                                     transform=ax.transAxes, color='gray', alpha=0.6 )
+        self.slugText = ax.text(0.99, 0.90, "", horizontalalignment='right', verticalalignment='center',
+                                transform=ax.transAxes, color='blue', alpha=0.6 )
+        self.warningText = ax.text(0.99, 0.84, "", horizontalalignment='right', verticalalignment='center',
+                                   transform=ax.transAxes, color='darkred', alpha=0.6 )
+
+    def render(self, tme, wspd, mxsp, sines, cosines, whereFrom="", slug="", warning=None, imageRef=None):
+        """
+        Redraw the graph with new data and save it.
+        :param tme: the times (tz aware DatetimeIndex)
+        :param wspd: wind speed [kts] at each time
+        :param mxsp: gusts [kts] at each time
+        :param sines: sine of the wind direction at each time
+        :param cosines: cosine of the wind direction at each time
+        :param whereFrom: where the data came from
+        :param slug: the current conditions line
+        :param warning: the warning line, None for no warning
+        :param imageRef: where to save it, None for the renderer's imageRef
+        """
+        x = mdates.date2num(tme)
+        wspd, mxsp = np.asarray(wspd, dtype=np.float64), np.asarray(mxsp, dtype=np.float64)
+        self.speedLine.set_data(x, wspd)
+        self.gustLine.set_data(x, mxsp)
+
+        # Plot direction arrows
+        # we stored the direction components so the averages would be modulo 360 (or 2pi)
+        #    The average between 10 and 350 should be 0 (or 360) NOT 180.
+        # An arrow every other step
+        offsets = np.column_stack([x[::2], np.full(len(x[::2]), 3.0)])
+        u, v = np.asarray(sines, dtype=np.float64)[::2], np.asarray(cosines, dtype=np.float64)[::2]
+        if self.arrows is None or self.arrows.N != len(offsets):
+            # the quiver can't change how many arrows it has, a new one when the number of points does
+            if self.arrows is not None:
+                self.arrows.remove()
+            self.arrows = self.ax.quiver(offsets[:, 0], offsets[:, 1], u, v,
+                                         angles='uv', color='DodgerBlue', alpha=0.6, pivot='middle')
+        else:
+            self.arrows.set_offsets(offsets)
+            self.arrows.set_UVC(u, v)
+
+        # The limits autoscaling would give (with its 5% margins) straight from the data. relim() would count the
+        # quiver too, where it is after set_offsets isn't in data coordinates.
+        margin = 0.05 * (x[-1] - x[0])
+        self.ax.set_xlim(x[0] - margin, x[-1] + margin)
+        top = np.nanmax(np.concatenate([wspd, mxsp, [3.0]]))
+        self.ax.set_ylim(bottom=0.0, top=1.05 * top)
+
+        self.whereFromText.set_text(f"{whereFrom}")
+        self.slugText.set_text(slug)
+        self.warningText.set_text(warning or "")
+        self.warningText.set_visible(warning is not None)
+
+        self.fig.savefig(imageRef or self.imageRef, bbox_inches=self._bbox(), transparent=True)
+
+    def _bbox(self):
+        if self.tight:
+            return 'tight'
+        if self.bbox is None:
+            # Measured once, with the 0.1" pad savefig would add. The labels only change by a digit or so after that.
+            self.fig.canvas.draw()
+            self.bbox = self.fig.get_tightbbox(self.fig.canvas.get_renderer()).padded(0.1)
+        return self.bbox
+
+_renderer = None
+def getRenderer():
+    """The renderer kept for the life of the process."""
+    global _renderer
+    if _renderer is None:
+        _renderer = WindGraphRenderer()
+    return _renderer
+
+def makeWindGraph(windDF, whereFrom="", renderer=None, cache=None):
     """
     makeWindGraph builds the wind graph from the recorded data.
 
-    :param windDF:  pandas DataFrame with wind data.
+    :param windDF:  pandas DataFrame with wind data (the readings, or the averages if windDF.attrs says so).
     :param whereFrom: Description
+    :param renderer: the WindGraphRenderer to draw it with, None for the one kept for the process (getRenderer)
+    :param cache: RenderCache to take the graph from if it's been drawn from the same data, None to always draw it
+    :return: True if the graph came from the cache
     """
     if len(windDF) < 16:
       raise BaseException('Not enough points')
 
     # determine how old the data is...
-    last = windDF.index[-1].to_pydatetime()
+    last = windDF.attrs.get('last')
+    last = (windDF.index[-1] if last is None else last).to_pydatetime()
     now = datetime.now(TZ_NY)
     delta = now-last
 
-    # Work with data from the last 2 days
-    cutoff_time = last - timedelta(hours=32)
-    windDF = windDF[windDF.index >= cutoff_time]
+    if windDF.attrs.get('resolution') != GRAPH_RESOLUTION:
+        # Work with data from the last 2 days
+        cutoff_time = last - timedelta(hours=GRAPH_HOURS)
+        windDF = windDF[windDF.index >= cutoff_time]
 
-    # Resample to 1 hour intervals, averaging the components
-    windDF = windDF.select_dtypes('number').resample('45min').mean()
+        # Resample to 45 minute intervals, averaging the components
+        windDF = windDF.select_dtypes('number').resample(GRAPH_RESOLUTION).mean()
 
     logging.debug(windDF.head())
     logging.debug(f'..{len(windDF)}..')
     logging.debug(windDF.tail())
 
-    imageRef = pathToImages / "windGraph.png" # fetch locally (way faster on a pi)
-    fig, ax = plt.subplots(figsize=(8, 4))
-
-    tme = windDF.index
-    wspd = windDF['WindSpeedAvg [kts]'] # windDF['WSPD']
-    mxsp = windDF['WindSpeedGst [kts]'] # windDF['GST']
-
-    # convert m/s to mph: 0.447, m/s to knot: 0.5144
-    ax.plot(tme, wspd, 'bo-', alpha=0.8)
-    ax.plot(tme, mxsp, 'ro-', alpha=0.8)
-
-    # Plot direction arrows
-    yloc = 3.0 * np.ones(windDF.shape[0])
-    # we stored the direction components so the averages would be modulo 360 (or 2pi)
-    #    The average between 10 and 350 should be 0 (or 360) NOT 180.
-    # An arrow every other step
-    (cosines, sines) = (windDF['WdirCos'], windDF['WdirSin'])
-    ax.quiver(tme[::2], yloc[::2], sines[::2], cosines[::2],
-              angles='uv', color='DodgerBlue', alpha=0.6, pivot='middle')
-    # Set the axis labels
-    # ax.set_xlabel('Date and Time', fontsize=10, fontstyle='italic', color='SlateGray')  #obvious don't need it.
-    ax.set_ylabel('Wind Speed [knots]', fontsize=12, fontstyle='italic', color='SlateGray')
-
-    #Fix the time axis
-    ax.xaxis.set_major_locator(mdates.DayLocator(tz=TZ_NY))
-    ax.xaxis.set_minor_locator(mdates.HourLocator(interval=4, tz=TZ_NY))
-
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%a, %b %d', tz=TZ_NY))
-    ax.xaxis.set_minor_formatter(mdates.DateFormatter('%H:%M', tz=TZ_NY))
-
-    dx = 0.; dy = -10/72.
-    offset = matplotlib.transforms.ScaledTranslation(dx, dy, fig.dpi_scale_trans)
-    # Create offset transform by 5 points in x direction
-    for label in ax.xaxis.get_majorticklabels():
-        label.set(horizontalalignment='center', color='darkred', fontweight='bold')
-        label.set_transform(label.get_transform() + offset)
-
-    for label in ax.xaxis.get_minorticklabels():
-        label.set(horizontalalignment='center', color='darkred')
-
-    ax.grid(True, which='major', linewidth=2, axis='both', alpha=0.7)
-    ax.grid(True, which='minor', linestyle='--', axis='both', alpha = 0.5)
-    ax.set_ylim(bottom=0.0)
-
-    # where did this come from?
-    plt.text(0.99, 0.96, f"{whereFrom}",
-          horizontalalignment='right', verticalalignment='center',
-          transform=ax.transAxes, color='gray', alpha=0.6 )
-
     ##
     # Put a current conditions slug at the top
     tme = windDF.index[-1]
     wspd = np.round(windDF['WindSpeedAvg [kts]'].to_numpy()[-1],1)
     mxsp = np.round(windDF['WindSpeedGst [kts]'].to_numpy()[-1],1)
-    # wspd = np.round(2.23694 * windDF['WSPD'].to_numpy()[-1][0],1)
-    # mxsp = np.round(2.23694 * windDF['GST'].to_numpy()[-1][0],1)
     if mxsp != mxsp:
       mxsp = '-'
     temp = windDF['AirTemp [°F]'].to_numpy()[-1]
     wdir = windDF['WindDir [°]'].to_numpy()[-1]
-    # wdir = windDF['WindSpeedAvg [m/s]'].to_numpy()[-1][0]
 
     oldmin = np.int32(delta.total_seconds()%60)
     oldhrs = np.int32(delta.total_seconds()/3600)
     global DATA_AGE_HOURS
     DATA_AGE_HOURS = oldhrs + oldmin/60.0
     logging.info(f"{tme}, {oldhrs}:{oldmin} old, {wspd} kts, {mxsp} kts, {wdir:4.0f}°T, {windDirection(wdir)}, {temp}°F")
-    # print(f"{tme}, {oldhrs}:{oldmin} old, {wspd} kts, {mxsp} kts, {wdir:4.0f}°T, {windDirection(wdir)}, {temp}°F")
-
-    plt.text(0.99, 0.90, f"Last readings spd:{wspd}, max:{mxsp}, dir:{windDirection(wdir)}",
-          horizontalalignment='right', verticalalignment='center',
-          transform=ax.transAxes, color='blue', alpha=0.6 )
-    if oldhrs > 1 and oldmin > 30:
-      plt.text(0.99, 0.84, f"Warning {oldhrs}:{oldmin} old",
-            horizontalalignment='right', verticalalignment='center',
-            transform=ax.transAxes, color='darkred', alpha=0.6 )
 
-    #   fig.show()
-    fig.savefig(imageRef, bbox_inches='tight', transparent=True)
-    plt.close(fig)
+    warning = f"Warning {oldhrs}:{oldmin} old" if oldhrs > 1 and oldmin > 30 else None
+    slug = f"Last readings spd:{wspd}, max:{mxsp}, dir:{windDirection(wdir)}"
+    renderer = renderer or getRenderer()
+    def draw():
+        renderer.render(windDF.index, windDF['WindSpeedAvg [kts]'], windDF['WindSpeedGst [kts]'],
+                        windDF['WdirSin'], windDF['WdirCos'], whereFrom=whereFrom, slug=slug, warning=warning)
+    if cache is None:
+        draw()
+        return False
+    # the graph is the lines, the arrows and the texts, nothing else
+    drawn = windDF[['WindSpeedAvg [kts]', 'WindSpeedGst [kts]', 'WdirSin', 'WdirCos']]
+    return cache.render(inputKey(drawn, whereFrom, slug, warning), renderer.imageRef, draw)
 
 def windDirection(ang):
     # direction indexer
@@ -190,36 +307,94 @@ def windDirection(ang):
                 return tag
     return '-?-'
 
+def bench(frames=20):
+    """
+    Time a graph refresh: a new figure for every frame, measured with bbox_inches='tight' (the way makeWindGraph used
+    to do it) against the one renderer kept between frames. It draws made up data to a scratch file, the kiosk's graph
+    isn't touched.
+    :param frames: how many refreshes to time each way
+    """
+    import tempfile
+    import time
+    rng = np.random.default_rng(0)
+    periods = GRAPH_HOURS * 60 // 45
+    def frame(i):
+        # the data moves along a step every frame, like it does between captures
+        index = pd.date_range(end=pd.Timestamp.now(tz=TZ_NY).floor(GRAPH_RESOLUTION) + i * pd.Timedelta(GRAPH_RESOLUTION),
+                              periods=periods, freq=GRAPH_RESOLUTION)
+        speed = np.clip(10 + np.cumsum(rng.normal(0, 1, periods)), 0, None)
+        direction = (200 + np.cumsum(rng.normal(0, 10, periods))) % 360
+        windDF = pd.DataFrame({'WindSpeedAvg [kts]': speed, 'WindSpeedGst [kts]': speed * 1.4,
+                               'AirTemp [°F]': 60.0, 'WindDir [°]': direction,
+                               'WdirSin': np.sin(np.radians(direction)), 'WdirCos': np.cos(np.radians(direction))},
+                              index=index)
+        windDF.attrs = {'resolution': GRAPH_RESOLUTION, 'last': index[-1]}
+        return windDF
+
+    data = [frame(i) for i in range(frames)]
+    with tempfile.TemporaryDirectory() as scratch:
+        dest = Path(scratch) / "windGraph.png"
+        kept = {}
+        ways = {
+            'new figure per frame': lambda: WindGraphRenderer(dest, tight=True),
+            'kept renderer':        lambda: kept.setdefault('renderer', WindGraphRenderer(dest)),
+        }
+        for way, renderer in ways.items():
+            times = []
+            for windDF in data:
+                t0 = time.perf_counter()
+                makeWindGraph(windDF, "Execution Rocks", renderer=renderer())
+                times.append(time.perf_counter() - t0)
+            times = np.array(times) * 1000
+            print(f"{way:>22}: first {times[0]:6.1f} ms, then median {np.median(times[1:]):6.1f} ms, "
+                  f"mean {times[1:].mean():6.1f} ms per frame ({frames} frames)")
+
 def main():
     now = datetime.now().astimezone(TZ_NY)
 
     # Retrieve the OCR data for execution rocks.
-    source = pathToResources / "wind_data.csv"
+    source = storePath('wind')  # wind_data.csv or wind_data.ring depending on how the capture stores it
     # source = pathToResources + "wind_data.csv"
     # dest   = pathToImages + "windGraph.png" # desitnation for the graph, but also the source of the data (since it's generated locally from the csv)
     dest = pathToImages / "windGraph.png"
 
     logging.info(f"\t...source: {source}")
 
-    windDF = fetchWindData(source)
+    # The capture keeps a series of the best available readings from every buoy, fall back on Execution Rocks'
+    # readings alone if there isn't one.
+    windDF = None
+    if COMPOSITE_FILE.exists():
+        windDF, whereFrom = fetchCompositeData()
+    if windDF is None or windDF.empty:
+        windDF, whereFrom = fetchWindData(source), "Execution Rocks"
 
     logging.debug(windDF.head())
     logging.debug(f'..{len(windDF)}..')
     logging.debug(windDF.tail())
 
     logging.info(f"\t...destination: {dest}")
-    makeWindGraph(windDF, "Execution Rocks" )
+    hit = makeWindGraph(windDF, whereFrom, cache=RenderCache('windGraph'))
 
     logging.info('\t...done')
 
     # This is a CGI script, so we need to print the content type header and a blank line before the output.
+    print(f'X-Render-Cache: {HIT_MISS[hit]}')
     print('Content-Type: text/plain\n')
     print(f"SUCCESS: Wind graph generated from data captured '{DATA_AGE_HOURS:0.2f}' hours ago.\n")
-    print('windGraphOCR done.')
+    print(f'windGraphOCR done (render cache {HIT_MISS[hit]}).')
 
 if __name__ == '__main__':
     prog = 'WindGraphOCR '
     logFile = pathToLogs / 'WeatherKiosk.log'
     logging.basicConfig(filename=logFile, format=f'%(levelname)s:\t%(asctime)s\t{prog}\t%(message)s', level=logging.INFO)
-    logging.info('Build wind graph...')
-    main()
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Draw the wind graph (run as the CGI without arguments)")
+    parser.add_argument('--bench', action='store_true', help="time the graph refresh, a new figure vs the kept renderer")
+    parser.add_argument('-n', '--frames', type=int, default=20, help="frames to time with --bench")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.frames)
+    else:
+        logging.info('Build wind graph...')
+        main()
@@ -57,9 +57,10 @@ function runClock(start) {
  * update the graphs, tables and other media is less disruptive than refreshing the whole screen.
  * A different script updates the resources on a different schedule.
  * @param {'all' | 'tides' | 'tidecartoon' | 'windgraph' | 'forecast' | 'radar' | 'boats' | 'porch' }
+ * @param {'ft' | 'm'} the tide graph and table are made in both units, this picks the pair to show.
 
  */
-function updateResources(what) {
+function updateResources(what, tideUnit = 'ft') {
     if (!what) what = 'timed';
 
     //console.log(`${new Date().toTimeString}-${what}`);
@@ -67,9 +68,9 @@ function updateResources(what) {
     if (what === 'tides' || what === 'all') {
         // these guys work together.
         // clock graph
-        document.getElementById('tidegraph').src = 'resources/tmp/tideGraph.png' + randomSuffix();
+        document.getElementById('tidegraph').src = `resources/tmp/tideGraph_${tideUnit}.png` + randomSuffix();
         // tide table
-        document.getElementById('tideTable').src = 'resources/tmp/tideTable.html' + randomSuffix();
+        document.getElementById('tideTable').src = `resources/tmp/tideTable_${tideUnit}.html` + randomSuffix();
     }
 
     if (what === 'tidecartoon' || what === 'all') {
@@ -253,6 +254,7 @@ async function fetchMoonImage(when) {
  *      setTimeout(() => {fp(1, 'one'); fp(2, 'two');}, s*sec);
  * another tricky part: tide graph and tide table need to get the same units when running
  *      looks funny if one is in metric and the other imperial. So we run them together.
+ *      (both write both units when the tides change, the units only pick which files are shown.)
  */
 let lastUnit = 0;
 async function fetchResources(what, units) {
@@ -260,13 +262,15 @@ async function fetchResources(what, units) {
     if (!units) units = lastUnit % 2 > 0 ? 'metric' : 'imperial';
 
     if (what === 'tides' || what === 'all') {
+        // (this call's units, lastUnit moves on before the table comes back and other fetches may run meanwhile)
+        const tideUnit = units === 'metric' ? 'm' : 'ft';
         let url = `http://localhost:8000/cgi-bin/tidesGraph.py?units=${units}`;
         toastStatus('↣tides', 'add');
         await fetch(url)
             .then((response) => response.text())
             .then((text) => {
                 console.log(text);
-                updateResources('tides');
+                updateResources('tides', tideUnit);
                 lastUnit++;
             })
             .catch((error) => {
@@ -278,7 +282,7 @@ async function fetchResources(what, units) {
             .then((response) => response.text())
             .then((text) => {
                 console.log(text);
-                updateResources('tides');
+                updateResources('tides', tideUnit);
                 toastStatus('↣tides', 'rem');
             })
             .catch((error) => {
@@ -304,7 +308,7 @@ async function fetchResources(what, units) {
     }
 
     if (what === 'windgraph' || what === 'all') {
-        let url = `http://localhost:8000/cgi-bin/windGraphNWS.py`;
+        let url = `http://localhost:8000/cgi-bin/windGraph.py`;
         toastStatus('↣wind', 'add');
 
         const timeout = 20000; // Default to 20 seconds
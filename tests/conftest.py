@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the capture scripts import each other as top level modules (they're run from bin/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'bin'))
@@ -0,0 +1,65 @@
+"""
+The rolling 24 hour maxima (bin/aggregates.py) carried from one run to the next.
+"""
+import pandas as pd
+import pytest
+
+import aggregates
+from dataBuffer import INDEX, NY_TZ
+
+PERIOD = pd.Timedelta(minutes=15)
+KEY = ('wind_data.csv', 44022.0, 'WindSpeedGst [kts]')
+
+
+@pytest.fixture
+def history():
+    times = pd.date_range(end=pd.Timestamp.now(tz=NY_TZ).floor('15min'), periods=100, freq=PERIOD, name=INDEX)
+    gusts = [float(i % 37) for i in range(len(times))]
+    return pd.DataFrame({'WindSpeedGst [kts]': gusts, 'WindDir [°]': [float(i) for i in range(len(times))]}, index=times)
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    # a new process: nothing built, nothing read from the file yet
+    monkeypatch.setattr(aggregates, '_rolling', {})
+    monkeypatch.setattr(aggregates, '_saved', None)
+
+
+def _get(history, rollingFile, loads, newest=None):
+    def loader():
+        loads.append(1)
+        return history
+    return aggregates.getRollingMax(KEY, loader, 'WindSpeedGst [kts]', ['WindDir [°]', INDEX],
+                                    newest=newest, rollingFile=rollingFile)
+
+
+def test_saved_state_is_picked_up(history, tmp_path, monkeypatch):
+    rollingFile = tmp_path / 'rollingMax.json'
+    loads = []
+    built = _get(history, rollingFile, loads)
+    aggregates.saveRollingMax(rollingFile)
+    assert loads == [1]
+
+    monkeypatch.setattr(aggregates, '_rolling', {})
+    monkeypatch.setattr(aggregates, '_saved', None)
+    restored = _get(history, rollingFile, loads, newest=lambda: history.index[-1])
+    assert loads == [1]  # the history wasn't read again
+    assert restored.peak() == built.peak()
+    assert list(restored.times) == list(built.times) and restored.first == built.first
+    now = history.index[-1]
+    assert restored.covers(now, PERIOD) == built.covers(now, PERIOD)
+    assert restored.peak()[2][INDEX].tzinfo is not None
+
+
+def test_stale_state_is_rebuilt(history, tmp_path, monkeypatch):
+    rollingFile = tmp_path / 'rollingMax.json'
+    loads = []
+    _get(history.iloc[:-1], rollingFile, loads)
+    aggregates.saveRollingMax(rollingFile)
+
+    # another run stored a record the saved maximum never saw
+    monkeypatch.setattr(aggregates, '_rolling', {})
+    monkeypatch.setattr(aggregates, '_saved', None)
+    rebuilt = _get(history, rollingFile, loads, newest=lambda: history.index[-1])
+    assert loads == [1, 1]
+    assert rebuilt.last() == history.index[-1]
@@ -0,0 +1,78 @@
+"""
+Conditional GETs (bin/captureCache.py) against the stand-in panel server (bin/panelServer.py).
+"""
+import shutil
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import captureCache
+from panelServer import PanelRequestHandler
+
+PANEL = Path(__file__).resolve().parent.parent / 'resources' / 'fixtures' / 'panels' / 'exrx_wx.png'
+
+
+@pytest.fixture
+def server(tmp_path):
+    served = tmp_path / 'served'
+    served.mkdir()
+    shutil.copy(PANEL, served / 'exrx_wx.png')
+    statuses = []
+
+    class Handler(PanelRequestHandler):
+        def log_request(self, code='-', size='-'):
+            statuses.append(int(code))
+
+    httpd = ThreadingHTTPServer(('localhost', 0), partial(Handler, directory=str(served)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{httpd.server_address[1]}/exrx_wx.png", served / 'exrx_wx.png', statuses
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_not_modified_reuses_local_copy(server, tmp_path):
+    url, served, statuses = server
+    fetcher = captureCache.ConditionalFetcher(validatorFile=tmp_path / 'validators.json')
+    localCopy = tmp_path / 'exrx_wx.png'
+
+    content, modified = fetcher.fetch(url, localCopy)
+    assert modified and content == PANEL.read_bytes() and localCopy.read_bytes() == content
+    assert statuses == [200]
+
+    # the second answer is a 304 and what we hand back is the copy we kept (marked so we can tell)
+    localCopy.write_bytes(b'kept copy')
+    content, modified = fetcher.fetch(url, localCopy)
+    assert not modified and content == b'kept copy'
+    assert statuses == [200, 304]
+
+    # the validators survive to the next run
+    fetcher.save()
+    content, modified = captureCache.ConditionalFetcher(validatorFile=tmp_path / 'validators.json').fetch(url, localCopy)
+    assert not modified and statuses[-1] == 304
+
+    # a new panel is published
+    served.write_bytes(served.read_bytes() + b'\0')
+    content, modified = fetcher.fetch(url, localCopy)
+    assert modified and statuses[-1] == 200 and localCopy.read_bytes() == served.read_bytes()
+
+
+def test_one_fetcher_per_process(monkeypatch, tmp_path):
+    monkeypatch.setattr(captureCache, '_fetcher', None)
+    monkeypatch.setattr(captureCache, '_session', None)
+    # every fetch thread of a capture asks at once
+    start = threading.Barrier(8)
+    got = []
+    def ask():
+        start.wait()
+        got.append((captureCache.getFetcher(), captureCache.getSession()))
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(fetcher) for fetcher, _ in got}) == 1
+    assert len({id(session) for _, session in got}) == 1
@@ -0,0 +1,72 @@
+"""
+The OCR accuracy/latency runner (bin/ocrBenchmark.py).
+The synthetic panels in resources/fixtures/panels are a smoke test (the runner, the engines and the layouts fit
+together). The accuracy gate is the recorded panels in resources/fixtures/recorded, skipped until there are some
+(see ocrBenchmark.py on how to record them).
+"""
+import shutil
+
+import pytest
+
+import captureBuoyData
+import ocrBenchmark
+import ocrEngines
+
+MIN_ACCURACY = 0.95
+ENGINES = ['pytesseract', 'tesserocr']
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return ocrBenchmark.loadCorpus(ocrBenchmark.FIXTURES)
+
+
+@pytest.fixture(scope='module')
+def recorded():
+    if not ocrBenchmark.RECORDED.exists():
+        pytest.skip(f"no recorded panels at {ocrBenchmark.RECORDED}")
+    corpus = ocrBenchmark.loadCorpus(ocrBenchmark.RECORDED)
+    if not corpus:
+        pytest.skip(f"none of the recorded panels at {ocrBenchmark.RECORDED} is checked yet")
+    return corpus
+
+
+def _needs(engine):
+    # pytesseract runs the tesseract program, tesserocr has libtesseract built in
+    if engine == 'tesserocr':
+        pytest.importorskip('tesserocr')
+        if ocrEngines.getOCREngine('tesserocr').name != 'tesserocr':
+            pytest.skip("tesserocr couldn't load its language data")
+        ocrEngines.closeOCREngines()
+    elif shutil.which('tesseract') is None:
+        pytest.skip("the tesseract-ocr engine isn't installed")
+
+
+def test_glyph_numbers(corpus, tmp_path, monkeypatch):
+    # an atlas learned from other panels than the ones scored (not the one in resources, if there is one)
+    monkeypatch.setattr(ocrEngines, 'GLYPH_ATLAS', tmp_path / 'glyphAtlas.npz')
+    captureBuoyData.learnGlyphs(ocrBenchmark.synthPanels(tmp_path / 'training', seed=1))
+    # the runner pins the derived field verification for the run, and only for the run
+    monkeypatch.setattr(captureBuoyData, 'DERIVE_VERIFY', 'sample')
+
+    result = ocrBenchmark.benchOCR(corpus, ['glyph'], kinds={'numberlike'})['glyph']
+    assert captureBuoyData.DERIVE_VERIFY == 'sample'
+    assert result is not None
+    assert len(result['panel']) == len(corpus) and (result['field'] > 0).all()
+    assert result['accuracy'] >= MIN_ACCURACY, result['wrong']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_tesseract(corpus, engine):
+    _needs(engine)
+    result = ocrBenchmark.benchOCR(corpus, [engine])[engine]
+    assert result is not None
+    assert result['accuracy'] >= MIN_ACCURACY, result['wrong']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_recorded(recorded, engine):
+    _needs(engine)
+    result = ocrBenchmark.benchOCR(recorded, [engine])[engine]
+    assert result is not None
+    assert result['accuracy'] >= MIN_ACCURACY, result['wrong']
@@ -0,0 +1,62 @@
+"""
+The two tier OCR (captureBuoyData.read_tiered) over the labelled panels in resources/fixtures/panels.
+"""
+import pytest
+
+import captureBuoyData
+import ocrBenchmark
+import ocrEngines
+from captureBuoyData import BuoyDataCapture
+
+MIN_ACCURACY = 0.95
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return ocrBenchmark.loadCorpus(ocrBenchmark.FIXTURES)
+
+
+@pytest.fixture
+def tiers(monkeypatch):
+    pytest.importorskip('tesserocr')
+    if ocrEngines.getOCREngine('tesserocr').name != 'tesserocr':
+        pytest.skip("tesserocr couldn't load its language data")
+    ocrEngines.closeOCREngines()
+    monkeypatch.setattr(captureBuoyData, 'OCR_TIERS', True)
+    captureBuoyData.reportTierStats()  # start the counts from nothing
+    yield captureBuoyData.tierStats
+    captureBuoyData.reportTierStats()
+
+
+def test_tiers(corpus, tiers):
+    result = ocrBenchmark.benchOCR(corpus, ['tesserocr'])['tesserocr']
+    assert result is not None
+    assert result['accuracy'] >= MIN_ACCURACY, result['wrong']
+    assert tiers['tier1'][0] > 0
+
+
+def test_unsure_reads_go_to_tier2(corpus, tiers, monkeypatch):
+    # every tier 1 read comes back empty and unsure, so the values have to come from tier 2
+    rawImages = {}
+    rawRegions = BuoyDataCapture.raw_regions
+    ocrWithConfidence = BuoyDataCapture._ocr_with_confidence
+
+    def raw_regions(self, keys):
+        regions = rawRegions(self, keys)
+        rawImages.update((id(image), image) for image in regions.values())
+        return regions
+
+    def _ocr_with_confidence(self, image, config):
+        if id(image) in rawImages:
+            return '', 0
+        return ocrWithConfidence(self, image, config)
+
+    monkeypatch.setattr(BuoyDataCapture, 'raw_regions', raw_regions)
+    monkeypatch.setattr(BuoyDataCapture, '_ocr_with_confidence', _ocr_with_confidence)
+
+    result = ocrBenchmark.benchOCR(corpus, ['tesserocr'])['tesserocr']
+    assert rawImages
+    tried, accepted, _ = tiers['tier1']
+    assert tried > 0 and accepted == 0
+    assert tiers['tier2'][0] == tried and tiers['tier2'][1] >= MIN_ACCURACY * tried
+    assert result['accuracy'] >= MIN_ACCURACY, result['wrong']
@@ -0,0 +1,48 @@
+"""
+When the composite wind series (bin/windComposite.py) is rebuilt after a capture.
+"""
+import pandas as pd
+import pytest
+
+import windComposite
+from dataBuffer import INDEX, NY_TZ
+
+
+@pytest.fixture
+def history():
+    times = pd.date_range(end=pd.Timestamp.now(tz=NY_TZ).floor('15min'), periods=8, freq='15min', name=INDEX)
+    return pd.DataFrame({'Source': 44022, 'WindSpeedAvg [kts]': 10.0, 'WindSpeedGst [kts]': 14.0,
+                         'WindDir [°]': 200.0, 'AirTemp [°F]': 60.0}, index=times)
+
+
+def _kingsPoint(monkeypatch, modified):
+    # the NDBC answers with nothing new (a 304) or a new feed we couldn't use, no network either way
+    monkeypatch.setattr(windComposite, '_fetchNDBC', lambda: (None, modified))
+
+
+def test_nothing_new_leaves_it(history, tmp_path, monkeypatch):
+    compositeFile = tmp_path / 'wind_composite.csv'
+    _kingsPoint(monkeypatch, False)
+    reads = []
+    def loader():
+        reads.append(1)
+        return history
+
+    # the first time there's no series yet, it's built whatever changed
+    assert len(windComposite.updateComposite(loader, compositeFile, panelsChanged=False)) == len(history)
+    assert reads == [1]
+    before = compositeFile.stat().st_mtime_ns
+
+    assert windComposite.updateComposite(loader, compositeFile, panelsChanged=False) is None
+    assert reads == [1] and compositeFile.stat().st_mtime_ns == before
+    assert len(windComposite.readComposite(compositeFile)) == len(history)
+
+
+@pytest.mark.parametrize('panelsChanged, kingsPointChanged', [(True, False), (False, True)])
+def test_something_new_rebuilds(history, tmp_path, monkeypatch, panelsChanged, kingsPointChanged):
+    compositeFile = tmp_path / 'wind_composite.csv'
+    compositeFile.write_text('stale')
+    _kingsPoint(monkeypatch, kingsPointChanged)
+    composite = windComposite.updateComposite(history, compositeFile, panelsChanged=panelsChanged)
+    assert composite is not None and set(composite['Origin']) == {'exrx'}
+    assert len(windComposite.readComposite(compositeFile)) == len(history)